@@ -1,9 +1,9 @@
 import logging
 from pyramid.config import Configurator
-from pyramid_beaker import session_factory_from_settings
 
 from ringo.resources import get_resource_factory
 from ringo.lib.i18n import locale_negotiator
+from ringo.lib.session import get_session_factory
 from ringo.lib.sql.db import setup_db_session, setup_db_engine
 from ringo.model import Base
 from ringo.model.user import User, Usergroup
@@ -21,7 +21,7 @@ def main(global_config, **settings):
     Base.metadata.bind = engine
     config = Configurator(settings=settings,
                           locale_negotiator=locale_negotiator)
-    config.set_session_factory(session_factory_from_settings(settings))
+    config.set_session_factory(get_session_factory(settings))
     config.include('ringo')
     return config.make_wsgi_app()
 
@@ -29,7 +29,7 @@ def main(global_config, **settings):
 def includeme(config):
     log.info('Setup of Ringo...')
     # Configure pyramid modules
-    config.include('pyramid_beaker')
+    config.include('ringo.lib.session')
     config.include('pyramid_mako')
     config.include('ringo.config.setup')
     config = setup_static_views(config)
@@ -91,4 +91,7 @@ def setup_routes(config):
     config.add_route('rules-evaluate', 'rest/rule/evaluate')
     config.add_route('form-render', 'rest/form/render')
     config.add_route('keepalive', 'rest/keepalive')
+    config.add_route('jobs-status', 'rest/jobs/{id}')
+    config.add_route('jobs-download', 'jobs/{id}/download')
+    config.add_route('instrumentation', 'rest/instrumentation')
     return config
@@ -0,0 +1,39 @@
+"""Add index on item and version id to the versions link tables
+
+Revision ID: 9c41e7d2b5a8
+Revises: 3d8b1e6f2a47
+Create Date: 2026-10-19 18:42:15.508231
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9c41e7d2b5a8'
+down_revision = '3d8b1e6f2a47'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def iter_versions_tables():
+    """Yields the names of the link tables of all versioned moduls.
+    The moduls are defined in the application so the tables are looked
+    up in the database."""
+    inspector = sa.inspect(op.get_bind())
+    for table in inspector.get_table_names():
+        if table.startswith("nm_") and table.endswith("_versions"):
+            indexes = [ix["name"] for ix in inspector.get_indexes(table)]
+            yield table, indexes
+
+
+def upgrade():
+    for table, indexes in iter_versions_tables():
+        name = "ix_%s_iid_vid" % table
+        if name not in indexes:
+            op.create_index(name, table, ['iid', 'vid'], unique=False)
+
+
+def downgrade():
+    for table, indexes in iter_versions_tables():
+        name = "ix_%s_iid_vid" % table
+        if name in indexes:
+            op.drop_index(name, table_name=table)
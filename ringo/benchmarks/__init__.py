@@ -0,0 +1,270 @@
+"""Benchmarks for the performance critical paths of ringo. The
+benchmarks run against the database configured in the given
+configuration file (or the database given with `--db-url`). The
+database must be initialised (`ringo-admin db init`) before. Data
+needed for the benchmarks is seeded into the database and can be
+removed afterwards with the `--cleanup` option of the benchmarks.
+
+Each benchmark measures a number of stages. For every stage the
+fastest and mean time of several runs, the number of SQL queries and
+the peak memory usage of the process are reported. The report can be
+written as JSON to compare the results of different versions.
+
+The benchmarks can be run using invoke::
+
+    invoke bench_lists --config=test.ini --rows=10000,100000
+"""
+import os
+import gc
+import sys
+import json
+import time
+import datetime
+import resource
+import argparse
+import transaction
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+from pyramid.events import NewRequest
+from pyramid.paster import bootstrap
+from pyramid.request import Request
+from pyramid.security import remember
+from pyramid.scripting import prepare
+from ringo.lib.instrumentation import (
+    setup_engine_events,
+    start_recording,
+    stop_recording
+)
+from ringo.resources import get_resource_factory
+
+PREFIX = "bench_"
+"""Prefix of names and logins of the items created by the
+benchmarks."""
+
+
+def get_peak_rss():
+    """Returns the peak resident memory of the process in KB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # Reported in bytes on Mac OS.
+        rss = rss / 1024
+    return rss
+
+
+def add_arguments(parser):
+    """Adds the arguments common to all benchmarks to the given
+    parser."""
+    parser.add_argument('--db-url',
+                        help=("Database used for the benchmark. Overwrites "
+                              "the database in the configuration"))
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=3,
+                        help="Number of runs per stage")
+    parser.add_argument('--report',
+                        help="Write the results as JSON into this file")
+    parser.add_argument('--cleanup',
+                        action="store_true",
+                        help="Remove the seeded data after the benchmark")
+    return parser
+
+
+def get_argument_parser(description):
+    """Returns a argument parser with the arguments common to all
+    benchmarks."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--config',
+                        default="development.ini",
+                        help="Configuration file of the application")
+    return add_arguments(parser)
+
+
+def parse_sizes(value):
+    """Parses a comma separated list of sizes like "10000,100000" or
+    "10k,1M"."""
+    sizes = []
+    for size in value.split(","):
+        size = size.strip().lower()
+        factor = 1
+        if size.endswith("k"):
+            factor, size = 1000, size[:-1]
+        elif size.endswith("m"):
+            factor, size = 1000000, size[:-1]
+        sizes.append(int(size) * factor)
+    return sizes
+
+
+def setup_app(config_file, db_url=None):
+    """Loads the application from the given configuration file and
+    enables recording of the SQL queries.
+
+    :returns: Environment of the application (see
+    :func:`pyramid.paster.bootstrap`)
+    """
+    if db_url:
+        os.environ['DATABASE_URL'] = db_url
+    env = bootstrap(config_file)
+    setup_engine_events()
+    return env
+
+
+def get_request(registry, user=None, clazz=None, path="/"):
+    """Returns a new request which is set up in the same way as the
+    requests of the application. The caller must call the returned
+    closer when finished.
+
+    :registry: Registry of the application
+    :user: User of the request
+    :clazz: If given the context of the request is set to a resource
+    of this class.
+    :path: Path including the query string of the request
+    :returns: Tuple of request and closer
+    """
+    env = prepare(request=Request.blank(path), registry=registry)
+    request = env["request"]
+    registry.notify(NewRequest(request))
+    request.user = user
+    if user is not None:
+        # Set the auth cookie to make the request authenticated. The
+        # permission checks get the principals of the user only for
+        # authenticated requests.
+        for name, value in remember(request, user.id):
+            if name == "Set-Cookie":
+                request.headers["Cookie"] = value.split(";")[0]
+                break
+    if clazz is not None:
+        request.context = get_resource_factory(clazz)(request)
+    return request, env["closer"]
+
+
+def measure_allocations(func):
+    """Calls the given function and returns a dictionary with the number
+    of objects tracked by the garbage collector which have been created
+    and not freed during the call. If :mod:`tracemalloc` is available
+    (Python 3) the peak of the allocated memory in bytes is returned
+    too."""
+    gc.collect()
+    gc.disable()
+    try:
+        if tracemalloc is not None:
+            tracemalloc.start()
+        before = len(gc.get_objects())
+        func()
+        result = {"objects": len(gc.get_objects()) - before}
+        if tracemalloc is not None:
+            result["allocated"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        gc.enable()
+    return result
+
+
+class Benchmark(object):
+    """Runs the stages of a benchmark and collects the results."""
+
+    def __init__(self, name, repeat=3, n_plus_one=10):
+        self.name = name
+        self.repeat = repeat
+        self.n_plus_one = n_plus_one
+        self.results = []
+        self.info = {}
+
+    def run(self, stage, func, repeat=None, calls=None, unit="calls",
+            allocations=False, **info):
+        """Runs the given function `repeat` times and records the
+        results of the stage. Errors are recorded but do not stop the
+        benchmark.
+
+        :stage: Name of the stage
+        :func: Callable without arguments
+        :repeat: Number of runs. Defaults to the repeat of the
+        benchmark.
+        :calls: Number of calls of the measured function within a run.
+        If given the calls per second are reported.
+        :unit: Name of the unit of the calls, e.g "rows".
+        :allocations: If True the allocations of an additional run are
+        reported (see :func:`measure_allocations`).
+        :info: Additional values added to the result, e.g the size of
+        the data.
+        :returns: Return value of the last successful run
+        """
+        if repeat is None:
+            repeat = self.repeat
+        if repeat < 1:
+            raise ValueError("Benchmark needs at least one run per stage")
+        times = []
+        stats = None
+        value = None
+        result = {"stage": stage}
+        result.update(info)
+        for run in range(repeat):
+            gc.collect()
+            recording = start_recording()
+            start = time.time()
+            try:
+                value = func()
+            except Exception as e:
+                result["error"] = "%s: %s" % (e.__class__.__name__, e)
+                break
+            finally:
+                duration = time.time() - start
+                stop_recording()
+            times.append(duration)
+            stats = recording
+        result["peak_rss"] = get_peak_rss()
+        if times:
+            # Only successful runs are measured.
+            result["min"] = min(times)
+            result["mean"] = sum(times) / len(times)
+            result["queries"] = stats.queries
+            result["db_time"] = stats.duration
+            result["repeated_queries"] = len(
+                stats.get_repeated(self.n_plus_one))
+            if calls:
+                result[unit] = calls
+                result["%s_per_second" % unit] = int(
+                    calls / max(result["min"], 1e-9))
+        if allocations and "error" not in result:
+            for key, amount in measure_allocations(func).items():
+                result[key] = amount
+                if calls:
+                    result["%s_per_call" % key] = float(amount) / calls
+        self.results.append(result)
+        self._print(result)
+        return value
+
+    def _print(self, result):
+        extra = ", ".join("%s=%s" % (k, v) for k, v in sorted(result.items())
+                          if k not in ["stage", "min", "mean", "queries",
+                                       "db_time", "repeated_queries",
+                                       "peak_rss", "error"])
+        if "min" in result:
+            line = ("%-32s %9.4fs %9.4fs %7s queries %9.4fs db %4s repeated"
+                    "  %s" % (result["stage"], result["min"], result["mean"],
+                              result["queries"], result["db_time"],
+                              result["repeated_queries"], extra))
+        else:
+            line = "%-32s %9s  %s" % (result["stage"], "no run", extra)
+        if "error" in result:
+            line += "  ERROR: %s" % result["error"]
+        print line
+
+    def report(self, filename=None):
+        """Writes the results of the benchmark as JSON into the given
+        file."""
+        if not filename:
+            return
+        data = {"benchmark": self.name,
+                "created": datetime.datetime.utcnow().isoformat(),
+                "info": self.info,
+                "results": self.results}
+        with open(filename, "w") as f:
+            json.dump(data, f, indent=2)
+        print "Report written to %s" % filename
+
+
+def commit():
+    transaction.commit()
+    transaction.begin()
@@ -0,0 +1,290 @@
+"""Helpers to seed the database with data for the benchmarks. All
+data is created with bulk inserts. Names and logins of the created
+items start with :data:`ringo.benchmarks.PREFIX` so the data can be
+removed again with :func:`cleanup`."""
+import uuid
+import random
+import datetime
+import sqlalchemy as sa
+from ringo.benchmarks import PREFIX
+from ringo.lib.security import encrypt_password
+from ringo.model.form import Form
+from ringo.model.user import (
+    User,
+    Usergroup,
+    Role,
+    Profile,
+    nm_user_roles,
+    nm_user_usergroups,
+    nm_action_roles
+)
+
+CHUNKSIZE = 10000
+
+FIRST_NAMES = [u"Anna", u"Ben", u"Clara", u"David", u"Emma", u"Felix",
+               u"Greta", u"Hans", u"Ida", u"Jonas", u"Klara", u"Lukas"]
+LAST_NAMES = [u"Albers", u"Becker", u"Claasen", u"Dietrich", u"Engel",
+              u"Fischer", u"Gerdes", u"Hoffmann", u"Janssen", u"Koch",
+              u"Lange", u"Meyer", u"Neumann", u"Otten", u"Peters"]
+
+
+def _insert(db, table, rows):
+    for start in range(0, len(rows), CHUNKSIZE):
+        db.execute(table.insert(), rows[start:start + CHUNKSIZE])
+
+
+def _get_ids(db, clazz, column):
+    return [id for id, in db.query(clazz.id)
+            .filter(column.like(PREFIX + "%")).order_by(clazz.id)]
+
+
+def seed_principals(db, users, groups, roles, groups_per_user=3,
+                    roles_per_user=2, seed=0):
+    """Creates the given number of users, groups and roles. Every user
+    is member of `groups_per_user` random groups and has
+    `roles_per_user` random roles. Existing users, groups and roles of
+    a previous run are reused.
+
+    :returns: Tuple with lists of the user, group and role ids.
+    """
+    rnd = random.Random(seed)
+    group_ids = _get_ids(db, Usergroup, Usergroup.name)
+    if len(group_ids) < groups:
+        _insert(db, Usergroup.__table__,
+                [{"name": "%sgroup_%s" % (PREFIX, i), "description": ""}
+                 for i in range(len(group_ids), groups)])
+        group_ids = _get_ids(db, Usergroup, Usergroup.name)
+
+    role_ids = _get_ids(db, Role, Role.name)
+    if len(role_ids) < roles:
+        _insert(db, Role.__table__,
+                [{"name": "%srole_%s" % (PREFIX, i),
+                  "label": "%srole_%s" % (PREFIX, i),
+                  "description": "", "admin": False}
+                 for i in range(len(role_ids), roles)])
+        role_ids = _get_ids(db, Role, Role.name)
+
+    user_ids = _get_ids(db, User, User.login)
+    if len(user_ids) < users:
+        start = len(user_ids)
+        password = encrypt_password("secret")
+        _insert(db, User.__table__,
+                [{"login": "%suser_%s" % (PREFIX, i),
+                  "password": password, "activated": True,
+                  "activation_token": ""}
+                 for i in range(start, users)])
+        user_ids = _get_ids(db, User, User.login)
+        new_ids = user_ids[start:]
+        memberships = []
+        for uid in new_ids:
+            for gid in rnd.sample(group_ids, min(groups_per_user,
+                                                 len(group_ids))):
+                memberships.append({"uid": uid, "gid": gid})
+        _insert(db, nm_user_usergroups, memberships)
+        user_roles = []
+        for uid in new_ids:
+            for rid in rnd.sample(role_ids, min(roles_per_user,
+                                                len(role_ids))):
+                user_roles.append({"uid": uid, "rid": rid})
+        _insert(db, nm_user_roles, user_roles)
+    return user_ids[:users], group_ids[:groups], role_ids[:roles]
+
+
+def grant(db, modul, role_ids, actions):
+    """Grants the given actions of the modul to the given roles.
+
+    :modul: :class:`.ModulItem`
+    :role_ids: List of role ids
+    :actions: List of lowercase names of the actions
+    """
+    existing = set(db.execute(nm_action_roles.select()
+                              .where(nm_action_roles.c.rid.in_(role_ids)))
+                   .fetchall())
+    rows = []
+    for action in modul.actions:
+        if action.name.lower() not in actions:
+            continue
+        for rid in role_ids:
+            if (action.id, rid) not in existing:
+                rows.append({"aid": action.id, "rid": rid})
+    _insert(db, nm_action_roles, rows)
+
+
+def count_items(db, clazz, user_ids):
+    """Returns the number of items of the given class owned by the
+    given users."""
+    return db.query(clazz).filter(clazz.uid.in_(user_ids)).count()
+
+
+def _seed_owned(db, clazz, size, user_ids, group_ids, get_values, seed):
+    rnd = random.Random(seed + size)
+    count = count_items(db, clazz, user_ids)
+    rows = []
+    for i in range(count, size):
+        values = get_values(rnd, i)
+        values["uid"] = rnd.choice(user_ids)
+        values["gid"] = rnd.choice(group_ids)
+        rows.append(values)
+    _insert(db, clazz.__table__, rows)
+    return len(rows)
+
+
+def seed_profiles(db, size, user_ids, group_ids, seed=0):
+    """Creates profiles owned by random users and groups until the
+    seeded users own `size` profiles.
+
+    :returns: Number of created profiles
+    """
+    def get_values(rnd, i):
+        return {"first_name": rnd.choice(FIRST_NAMES),
+                "last_name": rnd.choice(LAST_NAMES),
+                "email": "%s%s@example.com" % (PREFIX, i),
+                "phone": "%06d" % rnd.randint(0, 999999),
+                "address": u"", "web": u""}
+    return _seed_owned(db, Profile, size, user_ids, group_ids,
+                       get_values, seed)
+
+
+def seed_forms(db, size, user_ids, group_ids, seed=0):
+    """Creates forms in random review states owned by random users and
+    groups until the seeded users own `size` forms. Forms are used as
+    items with a statemachine.
+
+    :returns: Number of created forms
+    """
+    def get_values(rnd, i):
+        return {"title": u"%sform_%s" % (PREFIX, i),
+                "description": u"", "definition": u"",
+                "review_state_id": rnd.choice([1, 2])}
+    return _seed_owned(db, Form, size, user_ids, group_ids,
+                       get_values, seed)
+
+
+def _get_marker_column(clazz):
+    """Returns the first string column of the class. All generated
+    strings start with the prefix so the column is used to find the
+    generated items of classes which are not owned by an user."""
+    for column in clazz.__table__.columns:
+        if (isinstance(column.type, sa.String)
+           and not column.primary_key and not column.foreign_keys
+           and column.name != "uuid"):
+            return column
+    return None
+
+
+def _generate_value(column, rnd, i):
+    coltype = column.type
+    if isinstance(coltype, sa.types.TypeDecorator):
+        coltype = coltype.impl
+    if isinstance(coltype, sa.Boolean):
+        return rnd.random() > 0.5
+    elif isinstance(coltype, sa.Integer):
+        return rnd.randint(0, 1000)
+    elif isinstance(coltype, (sa.Float, sa.Numeric)):
+        return round(rnd.uniform(0, 1000), 2)
+    elif isinstance(coltype, sa.DateTime):
+        return (datetime.datetime(2000, 1, 1)
+                + datetime.timedelta(seconds=rnd.randint(0, 5e8)))
+    elif isinstance(coltype, sa.Date):
+        return (datetime.date(2000, 1, 1)
+                + datetime.timedelta(days=rnd.randint(0, 6000)))
+    elif isinstance(coltype, sa.String):
+        if column.name == "uuid":
+            return str(uuid.UUID(int=rnd.getrandbits(128)))
+        value = u"%s%s %s" % (PREFIX, i, rnd.choice(LAST_NAMES))
+        if coltype.length:
+            value = value[:coltype.length]
+        return value
+    return None
+
+
+def generate_values(clazz, rnd, i):
+    """Returns a dictionary with synthetic values for a new item of the
+    given class. The values are generated based on the types of the
+    columns of the class. Primary keys, foreign keys and the states of
+    statemachines are not set. Strings start with :data:`ringo.benchmarks.PREFIX` and include
+    the given number to be unique.
+
+    :clazz: Class of the item
+    :rnd: Instance of `random.Random`
+    :i: Number of the item
+    :returns: Dictionary with the values
+    """
+    values = {}
+    states = getattr(clazz, "_statemachines", {})
+    for column in clazz.__table__.columns:
+        if column.primary_key or column.foreign_keys or column.name in states:
+            continue
+        value = _generate_value(column, rnd, i)
+        if value is not None:
+            values[column.name] = value
+    return values
+
+
+def query_items(db, clazz, user_ids):
+    """Returns a query for the generated items of the given class."""
+    q = db.query(clazz)
+    if hasattr(clazz, "uid"):
+        return q.filter(clazz.uid.in_(user_ids))
+    column = _get_marker_column(clazz)
+    if column is None:
+        raise ValueError("Can not generate items of %s. The class must "
+                         "have a uid or a string column." % clazz)
+    return q.filter(column.like(PREFIX + "%"))
+
+
+def seed_items(db, clazz, size, user_ids, group_ids, seed=0):
+    """Creates items of the given class with synthetic values (see
+    :func:`generate_values`) until there are `size` generated items.
+    Items of owned classes are owned by random users and groups.
+
+    :returns: Number of created items
+    """
+    rnd = random.Random(seed + size)
+    count = query_items(db, clazz, user_ids).count()
+    owned = hasattr(clazz, "uid")
+    rows = []
+    for i in range(count, size):
+        values = generate_values(clazz, rnd, i)
+        if owned:
+            values["uid"] = rnd.choice(user_ids)
+            values["gid"] = rnd.choice(group_ids)
+        rows.append(values)
+    _insert(db, clazz.__table__, rows)
+    return len(rows)
+
+
+def cleanup(db, classes=None):
+    """Removes all data created by the benchmarks.
+
+    :classes: List of additional classes for which items have been
+    created with :func:`seed_items`.
+    """
+    user_ids = _get_ids(db, User, User.login)
+    group_ids = _get_ids(db, Usergroup, Usergroup.name)
+    role_ids = _get_ids(db, Role, Role.name)
+    for clazz in classes or []:
+        if not hasattr(clazz, "uid"):
+            query_items(db, clazz, user_ids)\
+                .delete(synchronize_session=False)
+    for start in range(0, max(len(user_ids), 1), 500):
+        chunk = user_ids[start:start + 500]
+        for clazz in set([Profile, Form] + (classes or [])):
+            if not hasattr(clazz, "uid"):
+                continue
+            db.query(clazz).filter(clazz.uid.in_(chunk))\
+                .delete(synchronize_session=False)
+        db.execute(nm_user_usergroups.delete()
+                   .where(nm_user_usergroups.c.uid.in_(chunk)))
+        db.execute(nm_user_roles.delete()
+                   .where(nm_user_roles.c.uid.in_(chunk)))
+        db.query(User).filter(User.id.in_(chunk))\
+            .delete(synchronize_session=False)
+    if role_ids:
+        db.execute(nm_action_roles.delete()
+                   .where(nm_action_roles.c.rid.in_(role_ids)))
+        db.query(Role).filter(Role.id.in_(role_ids))\
+            .delete(synchronize_session=False)
+    if group_ids:
+        db.query(Usergroup).filter(Usergroup.id.in_(group_ids))\
+            .delete(synchronize_session=False)
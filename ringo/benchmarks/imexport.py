@@ -0,0 +1,181 @@
+"""Benchmark of the import and export of items. The benchmark generates
+synthetic items of the given modul based on the types of the columns
+(see :func:`.generate_values`) and measures the exporters and
+importers at increasing sizes:
+
+ * Export to JSON, CSV and XLSX. Both complete (`perform`) and
+   streaming (`dump`).
+ * Import of JSON and CSV. Both updating the existing items and
+   creating new items. Imports are rolled back after each run.
+ * Bulk import (`perform_bulk`) of new items from JSON.
+
+Rows per second, queries and the peak memory are reported.
+
+Example::
+
+    python -m ringo.benchmarks.imexport --config test.ini --modul profiles \\
+           --rows 1k,10k,100k
+
+The benchmark is also available as `ringo-admin benchmark imexport`.
+"""
+import sys
+import json
+import transaction
+import sqlalchemy as sa
+from ringo.benchmarks import (
+    Benchmark,
+    get_argument_parser,
+    parse_sizes,
+    setup_app,
+    commit
+)
+from ringo.benchmarks.data import (
+    seed_principals,
+    seed_items,
+    query_items,
+    cleanup
+)
+from ringo.lib.helpers import dynamic_import
+from ringo.lib.imexport import (
+    JSONExporter,
+    CSVExporter,
+    XLSXExporter,
+    JSONImporter,
+    CSVImporter
+)
+from ringo.model.modul import ModulItem
+from ringo.model.user import User
+
+EXPORTERS = [("json", JSONExporter),
+             ("csv", CSVExporter),
+             ("xlsx", XLSXExporter)]
+
+
+class NullWriter(object):
+    """File like object which only counts the written bytes."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def add_imexport_arguments(parser):
+    parser.add_argument('--modul',
+                        default="profiles",
+                        help="Name of the modul")
+    parser.add_argument('--rows',
+                        default="1k,10k",
+                        help=("Comma separated list of the number of items "
+                              "e.g 1k,10k,100k"))
+    parser.add_argument('--users', type=int, default=10,
+                        help="Number of users owning the items")
+    parser.add_argument('--groups', type=int, default=5,
+                        help="Number of groups owning the items")
+    parser.add_argument('--chunksize', type=int, default=1000,
+                        help="Chunksize of streaming exports and imports")
+    return parser
+
+
+def get_parser():
+    parser = get_argument_parser("Benchmark of the import and export")
+    return add_imexport_arguments(parser)
+
+
+def _without_keys(rows):
+    for row in rows:
+        row.pop("id", None)
+        row.pop("uuid", None)
+    return rows
+
+
+def run_exports(bench, clazz, items, query, size, chunksize):
+    data = {}
+    for name, exporter in EXPORTERS:
+        data[name] = bench.run("export %s" % name,
+                               lambda: exporter(clazz).perform(items),
+                               calls=size, unit="rows", size=size)
+
+        def dump():
+            out = NullWriter()
+            exporter(clazz).dump(query, out, chunksize)
+            return out.size
+        bench.run("export %s stream" % name, dump,
+                  calls=size, unit="rows", size=size)
+    return data
+
+
+def run_imports(bench, clazz, db, user_id, items, data, size, chunksize):
+    # Exports without id and uuid. Importing them creates new items.
+    fields = [prop.key for prop in sa.orm.class_mapper(clazz).column_attrs
+              if prop.key not in ["id", "uuid"]]
+    new_data = {"json": json.dumps(_without_keys(json.loads(data["json"]))),
+                "csv": CSVExporter(clazz, fields=fields).perform(items)}
+    importers = [("json", JSONImporter), ("csv", CSVImporter)]
+
+    def do_import(importer, importdata, bulk=False):
+        def run():
+            try:
+                user = db.query(User).get(user_id)
+                importer_ = importer(clazz, db, chunksize=chunksize)
+                if bulk:
+                    importer_.perform_bulk(importdata, user=user)
+                else:
+                    importer_.perform(importdata, user=user)
+                db.flush()
+            finally:
+                transaction.abort()
+        return run
+
+    for name, importer in importers:
+        bench.run("import %s update" % name,
+                  do_import(importer, data[name]),
+                  calls=size, unit="rows", size=size)
+        bench.run("import %s create" % name,
+                  do_import(importer, new_data[name]),
+                  calls=size, unit="rows", size=size)
+    bench.run("import json bulk create",
+              do_import(JSONImporter, new_data["json"], bulk=True),
+              calls=size, unit="rows", size=size)
+
+
+def run(args):
+    env = setup_app(args.config, args.db_url)
+    db = env["request"].db
+    modul = db.query(ModulItem).filter(ModulItem.name == args.modul).one()
+    clazz = dynamic_import(modul.clazzpath)
+    bench = Benchmark("imexport", args.repeat)
+    bench.info = {"modul": args.modul,
+                  "chunksize": args.chunksize,
+                  "database": db.bind.dialect.name}
+    try:
+        user_ids, group_ids, role_ids = seed_principals(db, args.users,
+                                                        args.groups, 1)
+        commit()
+        for size in parse_sizes(args.rows):
+            seed_items(db, clazz, size, user_ids, group_ids)
+            commit()
+            query = (query_items(db, clazz, user_ids)
+                     .order_by(clazz.id).limit(size))
+            items = bench.run("load", query.all, repeat=1,
+                              calls=size, unit="rows", size=size)
+            data = run_exports(bench, clazz, items, query, size,
+                               args.chunksize)
+            run_imports(bench, clazz, db, user_ids[0], items, data, size,
+                        args.chunksize)
+        bench.report(args.report)
+    finally:
+        transaction.abort()
+        if args.cleanup:
+            cleanup(db, [clazz])
+            commit()
+        env["closer"]()
+
+
+def main(argv=None):
+    run(get_parser().parse_args(argv))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
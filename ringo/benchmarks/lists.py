@@ -0,0 +1,184 @@
+"""Benchmark of the pipeline to build the overview of items. The
+benchmark seeds profiles owned by a configurable number of users,
+groups and roles and measures the single stages of the pipeline for a
+non admin user:
+
+ * Loading all items (:class:`.BaseList`)
+ * Filtering the items for the user (:func:`.filter_itemlist_for_user`)
+ * :func:`.get_item_list`
+ * Sorting, filtering and paginating the list (:class:`.BaseList`)
+ * Rendering the list (:class:`.DTListRenderer`)
+ * Optimized loading of the items in the database (:func:`.load_items`)
+ * The complete pipeline (:func:`.get_base_list`) with and without
+   the `feature.dev_optimized_list_load` toggle.
+
+Example::
+
+    python -m ringo.benchmarks.lists --config test.ini --rows 10k,100k
+"""
+import sys
+from ringo.benchmarks import (
+    PREFIX,
+    Benchmark,
+    get_argument_parser,
+    parse_sizes,
+    setup_app,
+    get_request,
+    commit
+)
+from ringo.benchmarks.data import (
+    seed_principals,
+    seed_profiles,
+    grant,
+    cleanup
+)
+from ringo.lib.renderer.lists import DTListRenderer
+from ringo.model.base import BaseList, get_item_list, filter_itemlist_for_user
+from ringo.model.modul import ModulItem
+from ringo.model.user import User, Profile
+from ringo.views.base.list_ import load_items, get_base_list
+
+OPTIMIZED = "feature.dev_optimized_list_load"
+
+
+def get_parser():
+    parser = get_argument_parser("Benchmark of the overview pipeline")
+    parser.add_argument('--rows',
+                        default="10k",
+                        help=("Comma separated list of the number of items "
+                              "e.g 10k,100k,1M"))
+    parser.add_argument('--users', type=int, default=100,
+                        help="Number of users")
+    parser.add_argument('--groups', type=int, default=20,
+                        help="Number of groups")
+    parser.add_argument('--roles', type=int, default=5,
+                        help="Number of roles")
+    parser.add_argument('--pagesize', type=int, default=50,
+                        help="Size of a page in the paginated stages")
+    return parser
+
+
+def run_pipeline(bench, registry, user, size, optimized, path):
+    """Runs the complete pipeline of the overview like the list view
+    with the optimized loading of the items enabled or disabled."""
+    settings = registry.settings
+    old = settings.get(OPTIMIZED)
+    settings[OPTIMIZED] = "true" if optimized else "false"
+    try:
+        def pipeline():
+            request, closer = get_request(registry, user, Profile, path)
+            try:
+                listing = get_base_list(Profile, request, user, "overview")
+                return DTListRenderer(listing).render(request)
+            finally:
+                closer()
+        name = "pipeline optimized" if optimized else "pipeline legacy"
+        bench.run(name, pipeline, size=size)
+    finally:
+        if old is None:
+            del settings[OPTIMIZED]
+        else:
+            settings[OPTIMIZED] = old
+
+
+def run_stages(bench, registry, user, size, pagesize):
+    request, closer = get_request(registry, user, Profile)
+    db = request.db
+    try:
+        baselist = bench.run("BaseList", lambda: BaseList(Profile, db),
+                             size=size)
+
+        def filter_for_user():
+            listing = BaseList(Profile, db, items=list(baselist.items))
+            return filter_itemlist_for_user(request, listing)
+        listing = bench.run("filter_itemlist_for_user", filter_for_user,
+                            size=size)
+        visible = len(listing.items)
+
+        def item_list():
+            request.cache_item_list.clear()
+            return get_item_list(request, Profile, user=user)
+        bench.run("get_item_list", item_list, size=size, visible=visible)
+
+        def sort():
+            listing = BaseList(Profile, db, items=list(baselist.items))
+            listing.sort("last_name", "asc")
+            return listing
+        bench.run("BaseList.sort", sort, size=size)
+
+        search = [(u"Becker", "last_name", False)]
+
+        def filter_():
+            listing = BaseList(Profile, db, items=list(baselist.items))
+            listing.filter(search, request, "overview")
+            return listing
+        bench.run("BaseList.filter", filter_, size=size)
+
+        def paginate():
+            listing = BaseList(Profile, db, items=list(baselist.items))
+            listing.paginate(len(listing.items), 0, pagesize)
+            return listing
+        bench.run("BaseList.paginate", paginate, size=size)
+
+        visible_items = listing.items
+
+        def render():
+            listing = BaseList(Profile, db, items=list(visible_items))
+            listing.paginate(len(listing.items), 0, pagesize)
+            return DTListRenderer(listing).render(request)
+        bench.run("DTListRenderer.render", render, size=size,
+                  visible=visible)
+
+        list_params = {"search": [],
+                       "sorting": ("last_name", "asc"),
+                       "pagination": (0, pagesize),
+                       "table": "overview"}
+        bench.run("load_items", lambda: load_items(request, Profile,
+                                                   list_params),
+                  size=size, pagesize=pagesize)
+        list_params = dict(list_params, pagination=(0, None))
+        bench.run("load_items unpaginated",
+                  lambda: load_items(request, Profile, list_params),
+                  size=size)
+    finally:
+        closer()
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    env = setup_app(args.config, args.db_url)
+    registry = env["registry"]
+    request = env["request"]
+    db = request.db
+    bench = Benchmark("lists", args.repeat)
+    bench.info = {"users": args.users, "groups": args.groups,
+                  "roles": args.roles, "pagesize": args.pagesize,
+                  "database": db.bind.dialect.name}
+    try:
+        user_ids, group_ids, role_ids = seed_principals(db, args.users,
+                                                        args.groups,
+                                                        args.roles)
+        modul = db.query(ModulItem).get(Profile._modul_id)
+        grant(db, modul, role_ids, ["list", "read"])
+        commit()
+        path = ("/profiles/list?sort_field=last_name&sort_order=asc"
+                "&pagination_size=%s" % args.pagesize)
+        for size in parse_sizes(args.rows):
+            created = seed_profiles(db, size, user_ids, group_ids)
+            commit()
+            print "%s: %s items (%s created)" % (PREFIX + "profiles", size,
+                                                 created)
+            user = db.query(User).get(user_ids[0])
+            run_stages(bench, registry, user, size, args.pagesize)
+            run_pipeline(bench, registry, user, size, False, path)
+            run_pipeline(bench, registry, user, size, True, path)
+        bench.report(args.report)
+    finally:
+        if args.cleanup:
+            cleanup(db)
+            commit()
+        env["closer"]()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,174 @@
+"""Benchmark of the permission checks. The benchmark seeds users which
+are member of many groups and have many roles. The roles are granted
+the actions of modules with and without statemachines and modules with
+a custom implementation of `_get_permissions`:
+
+ * Profiles (plain owned items)
+ * Forms (items with a statemachine)
+ * Usergroups (custom `_get_permissions`)
+
+The benchmark measures :func:`.get_principals`,
+:func:`.get_permissions`, `_get_permissions`, :func:`.has_permission`
+and :meth:`.ValueChecker.check` for a non admin user. Micro benchmarks
+call the functions for a sample of items; the macro benchmark checks
+all actions of all items of a page like the overview does. Calls per
+second and allocations per call are reported.
+
+Example::
+
+    python -m ringo.benchmarks.security --config test.ini --roles 50
+"""
+import sys
+from ringo.benchmarks import (
+    Benchmark,
+    get_argument_parser,
+    setup_app,
+    get_request,
+    commit
+)
+from ringo.benchmarks.data import (
+    seed_principals,
+    seed_profiles,
+    seed_forms,
+    grant,
+    cleanup
+)
+from ringo.lib.helpers import get_item_modul
+from ringo.lib.security import (
+    ValueChecker,
+    get_permissions,
+    get_principals,
+    has_permission
+)
+from ringo.model.form import Form
+from ringo.model.modul import ModulItem
+from ringo.model.user import User, Usergroup, Profile
+
+ACTIONS = ["list", "create", "read", "update", "delete"]
+
+
+def get_parser():
+    parser = get_argument_parser("Benchmark of the permission checks")
+    parser.add_argument('--items', type=int, default=200,
+                        help="Number of items per modul")
+    parser.add_argument('--users', type=int, default=100,
+                        help="Number of users")
+    parser.add_argument('--groups', type=int, default=50,
+                        help="Number of groups")
+    parser.add_argument('--roles', type=int, default=20,
+                        help="Number of roles")
+    parser.add_argument('--groups-per-user', type=int, default=10,
+                        help="Number of groups a user is member of")
+    parser.add_argument('--roles-per-user', type=int, default=5,
+                        help="Number of roles a user has")
+    parser.add_argument('--calls', type=int, default=1000,
+                        help="Number of calls in the micro benchmarks")
+    return parser
+
+
+def _loop(func, items, calls):
+    """Returns a function calling `func` `calls` times with the given
+    items in turn."""
+    def run():
+        num = len(items)
+        for i in xrange(calls):
+            func(items[i % num])
+    return run
+
+
+def run_micro(bench, request, user, items, calls):
+    run = bench.run
+    run("get_principals",
+        _loop(lambda x: get_principals(user.id, request), [None], calls),
+        calls=calls, allocations=True)
+
+    for clazz in [Profile, Form, Usergroup]:
+        modul = get_item_modul(request, clazz)
+        name = clazz.__name__
+        run("get_permissions %s class" % name,
+            _loop(lambda x: get_permissions(modul, clazz), [None], calls),
+            calls=calls, allocations=True)
+        run("get_permissions %s" % name,
+            _loop(lambda x: get_permissions(modul, x), items[clazz], calls),
+            calls=calls, allocations=True)
+        run("_get_permissions %s" % name,
+            _loop(lambda x: x._get_permissions(modul, x, request),
+                  items[clazz], calls),
+            calls=calls, allocations=True)
+        run("has_permission read %s" % name,
+            _loop(lambda x: has_permission("read", x, request),
+                  items[clazz], calls),
+            calls=calls, allocations=True)
+
+    # The user is allowed to link the groups he is member of.
+    values = {"groups": list(user.groups)}
+    checker = ValueChecker()
+    run("ValueChecker.check",
+        _loop(lambda x: checker.check(User, values, request),
+              [None], calls),
+        calls=calls * len(values["groups"]), allocations=True,
+        values=len(values["groups"]))
+
+
+def run_macro(bench, request, items, pagesize):
+    for clazz in [Profile, Form, Usergroup]:
+        page = items[clazz][:pagesize]
+
+        def check_page():
+            for item in page:
+                for action in ACTIONS:
+                    has_permission(action, item, request)
+        bench.run("page %s" % clazz.__name__, check_page,
+                  calls=len(page) * len(ACTIONS), items=len(page))
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    env = setup_app(args.config, args.db_url)
+    registry = env["registry"]
+    db = env["request"].db
+    bench = Benchmark("security", args.repeat)
+    bench.info = {"users": args.users, "groups": args.groups,
+                  "roles": args.roles,
+                  "groups_per_user": args.groups_per_user,
+                  "roles_per_user": args.roles_per_user,
+                  "items": args.items,
+                  "database": db.bind.dialect.name}
+    try:
+        user_ids, group_ids, role_ids = seed_principals(
+            db, args.users, args.groups, args.roles,
+            groups_per_user=args.groups_per_user,
+            roles_per_user=args.roles_per_user)
+        for clazz in [Profile, Form, Usergroup]:
+            modul = db.query(ModulItem).get(clazz._modul_id)
+            grant(db, modul, role_ids, ACTIONS)
+        seed_profiles(db, args.items, user_ids, group_ids)
+        seed_forms(db, args.items, user_ids, group_ids)
+        commit()
+
+        user = db.query(User).get(user_ids[0])
+        request, closer = get_request(registry, user, Profile)
+        try:
+            items = {}
+            for clazz in [Profile, Form]:
+                items[clazz] = (db.query(clazz)
+                                .filter(clazz.uid.in_(user_ids))
+                                .order_by(clazz.id)
+                                .limit(args.items).all())
+            items[Usergroup] = (db.query(Usergroup)
+                                .filter(Usergroup.id.in_(group_ids))
+                                .order_by(Usergroup.id).all())
+            run_micro(bench, request, user, items, args.calls)
+            run_macro(bench, request, items, 50)
+        finally:
+            closer()
+        bench.report(args.report)
+    finally:
+        if args.cleanup:
+            cleanup(db)
+            commit()
+        env["closer"]()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
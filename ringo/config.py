@@ -64,6 +64,8 @@ def setup(config):
     config.include('ringo.lib.security.setup_ringo_security')
     config.include('ringo.lib.cache.setup_cache')
     config.include('ringo.lib.request.app')
+    config.include('ringo.lib.instrumentation.setup_instrumentation')
+    config.include('ringo.lib.profiling.setup_profiling')
     config.add_subscriber(preload_modules, NewRequest, ignore_static_urls="")
 
 
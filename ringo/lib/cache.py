@@ -2,6 +2,7 @@
 import logging
 import datetime
 from pyramid.events import NewRequest
+from ringo.lib.instrumentation import record_cache_access
 
 log = logging.getLogger(__name__)
 
@@ -59,7 +60,9 @@ class Cache(object):
         :returns: The cached value
 
         """
-        return self._data.get(key)
+        value = self._data.get(key)
+        record_cache_access(value is not None)
+        return value
 
     def delete(self, key):
         """Will delete the cache value for the key.
@@ -89,6 +92,11 @@ def init_cache(request):
         request.cache_item_list.clear()
     else:
         request.cache_item_list = Cache()
+    db = getattr(request, "db", None)
+    if hasattr(db, "on_write"):
+        # Lists may have been loaded from a read replica. Reload them
+        # after the request has written something.
+        db.on_write(lambda: request.cache_item_list.clear(force=True))
 
     if hasattr(request, "cache_item_modul"):
         request.cache_item_modul.clear()
@@ -25,6 +25,7 @@ from ringo.lib.helpers.format import (
 from ringo.lib.helpers.misc import (
     serialize,
     deserialize,
+    get_deserializer,
     safestring,
     age,
     get_raw_value,
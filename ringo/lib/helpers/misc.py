@@ -2,7 +2,7 @@ import logging
 import re
 import string
 import base64
-from datetime import datetime
+from datetime import datetime, timedelta
 from pyramid.threadlocal import get_current_request
 import formbar.converters as converters
 from ringo.lib.sql import DBSession
@@ -13,42 +13,81 @@ log = logging.getLogger(__name__)
 re_char_match = re.compile("(var){0,1}char\([0-9]+\)")
 
 
+re_interval_match = re.compile(u"^\d{1,2}:\d{1,2}:\d{1,2}")
+
+_deserializers = {}
+"""Cache for the deserializer functions of the datatypes. See
+:func:`get_deserializer`"""
+
+
+def _to_datetime(value):
+    # Interval fields are implemented as DATETIME
+    # See http://docs.sqlalchemy.org/en/latest/core/type_basics.html#sqlalchemy.types.Interval
+    # Check if we have a interval here
+    if re_interval_match.match(value):
+        t = datetime.strptime(value, "%H:%M:%S")
+        return timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
+    return converters.to_datetime(value)
+
+
+def _to_boolean(value):
+    # In case of imports from a JSON file the value is already of
+    # type boolean.
+    if isinstance(value, bool):
+        return value
+    return converters.to_boolean(value)
+
+
+def _unsupported(datatype):
+    def convert(value):
+        raise TypeError("{} is not supported".format(datatype))
+    return convert
+
+
+def _none_if_empty(convert):
+    def deserialize(value):
+        if value in ["", None]:
+            return None
+        return convert(value)
+    return deserialize
+
+
+def get_deserializer(datatype):
+    """Returns a function which converts a serialized value into a
+    python value of the given datatype. The functions are build once
+    per datatype.
+
+    :datatype: Lowercased name of the datatype of the column.
+    :returns: Function which takes the serialized value
+    """
+    if datatype not in _deserializers:
+        if datatype in ["varchar", "text"]:
+            convert = lambda value: value
+        elif datatype == "integer":
+            convert = _none_if_empty(converters.to_integer)
+        elif datatype == "float":
+            convert = _none_if_empty(converters.to_float)
+        elif datatype == "datetime":
+            convert = _none_if_empty(_to_datetime)
+        elif datatype == "date":
+            convert = _none_if_empty(converters.to_date)
+        elif re_char_match.match(datatype):
+            # UUID
+            convert = _none_if_empty(lambda value: value)
+        elif datatype == "blob":
+            convert = _none_if_empty(base64.b64decode)
+        elif datatype == "boolean":
+            convert = _none_if_empty(_to_boolean)
+        else:
+            convert = _none_if_empty(_unsupported(datatype))
+        _deserializers[datatype] = convert
+    return _deserializers[datatype]
+
+
 def deserialize(value, datatype):
     """Very simple helper function which returns a python version
     of the given serialized value."""
-    if datatype in ["varchar", "text"]:
-        return value
-    elif value in ["", None]:
-        return None
-    elif datatype == "integer":
-        return converters.to_integer(value)
-    elif datatype == "float":
-        return converters.to_float(value)
-    elif datatype == "datetime":
-        # Interval fields are implemented as DATETIME
-        # See http://docs.sqlalchemy.org/en/latest/core/type_basics.html#sqlalchemy.types.Interval
-        # Check if we have a interval here
-        iv = re.compile(u"^\d{1,2}:\d{1,2}:\d{1,2}")
-        if iv.match(value):
-            t = datetime.datetime.strptime(value, "%H:%M:%S")
-            return datetime.timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
-        return converters.to_datetime(value)
-    elif datatype == "date":
-        return converters.to_date(value)
-    elif re_char_match.match(datatype):
-        # UUID
-        return value
-    elif datatype == "blob":
-        return base64.b64decode(value)
-    elif datatype == "boolean":
-        # In case of imports from a JSON file the value is already of
-        # type boolean.
-        if isinstance(value, bool):
-            return value
-        else:
-            converters.to_boolean(value)
-    else:
-        raise TypeError("{} is not supported".format(datatype))
+    return get_deserializer(datatype)(value)
 
 
 def serialize(value):
@@ -1,20 +1,69 @@
 import urlparse
 import re
 
-DOWNLOAD_URL = re.compile(".*\/download\/[0-9]+")
-STATIC_URL = re.compile(".*\/\w+-static\/.*")
-SET_CURRENT_FORM = re.compile(".*\/set_current_form_page.*")
-REST_URLS = re.compile(".*\/rest\/.*")
-FAVICON = re.compile(".*\/favicon\.ico")
-
-
-def handle_history(event):
-    """Is called per subscriber on NewResponse event."""
-    request = event.request
-    history = request.ringo.history
-    history.push(request)
-    request.session["history"] = history
-    request.session.save()
+IGNORED_URLS = [".*\/download\/[0-9]+",
+                ".*\/\w+-static\/.*",
+                ".*\/set_current_form_page.*",
+                ".*\/rest\/.*",
+                ".*\/favicon\.ico"]
+"""Patterns of URLs which are never part of the history. Download,
+static, REST and AJAX helper URLs."""
+
+
+def get_ignore_matcher(settings):
+    """Returns a compiled regular expression matching all URLs which
+    are ignored in the history. The expression combines the
+    :data:`IGNORED_URLS` and the prefixes configured in
+    `app.history.ignore`."""
+    patterns = list(IGNORED_URLS)
+    for ignore in settings.get("app.history.ignore", "").split(","):
+        if ignore:
+            patterns.append(re.escape(ignore))
+    return re.compile("|".join("(?:%s)" % p for p in patterns))
+
+
+def _get_ignore_matcher(request):
+    matcher = getattr(request.registry, "history_ignore_matcher", None)
+    if matcher is None:
+        matcher = get_ignore_matcher(request.registry.settings)
+    return matcher
+
+
+def is_html_response(request, response):
+    """Returns True if the response is a HTML page which should be
+    part of the history. AJAX requests and redirects are not."""
+    return (response.status_int == 200
+            and response.content_type == "text/html"
+            and not request.is_xhr)
+
+
+def handle_history(request, response):
+    """Writes the history into the session if it has changed. Is called
+    by the history tween (see :mod:`ringo.tweens.history`) after the
+    response has been created but before the response callbacks run.
+    The session is persisted in a response callback, so writing the
+    history later (e.g on the NewResponse event) has no effect.
+
+    The history is only loaded if it has been used while processing
+    the request or the response is a HTML page. Requests returning
+    other content (JSON, files, redirects) and not using the history do
+    not touch the session at all. The history of those requests is only
+    written if it has been changed by the view beside adding the URL of
+    the current request."""
+    ringo = getattr(request, "ringo", None)
+    if ringo is None:
+        return
+    if is_html_response(request, response):
+        history = ringo.history
+        unchanged = ringo.history_loaded
+    elif "history" in ringo.__dict__:
+        history = ringo.history
+        unchanged = ringo.history_pushed
+    else:
+        return
+    if history.history != unchanged:
+        request.session["history"] = history
+        request.session.save()
 
 
 class History:
@@ -30,13 +79,11 @@ class History:
         oldes entry will be removed.
 
         Please note, that the most recent entry in the history is always
-        the url of the current request. This is because the history is
-        is filled at the very beginnin of the request on the NewRequest
-        event. It is **not** possible to handle the history at response
-        time because the history can not be saved in the session. The
-        reason for this is unknown.  Howwver this special behaviour is
-        relevant if you want to access the history list directly for
-        some reasone and not want to use the pop and last methods.
+        the url of the current request. This is because the url is
+        pushed when the history is loaded on first access in the
+        request. This special behaviour is relevant if you want to
+        access the history list directly for some reasone and not want
+        to use the pop and last methods.
         """
         url = request.url
 
@@ -46,19 +93,10 @@ class History:
         split = urlparse.urlsplit(url)
         normalized_url = urlparse.urlunsplit(("", "") + split[2:])
 
-        # Ignore Download URLs and Favicon
-        if (DOWNLOAD_URL.match(normalized_url) or
-           STATIC_URL.match(normalized_url) or
-           SET_CURRENT_FORM.match(normalized_url) or
-           REST_URLS.match(normalized_url) or
-           FAVICON.match(normalized_url)):
+        # Ignore Download URLs, Favicon and URLs defined in the settings
+        if _get_ignore_matcher(request).match(normalized_url):
             return
 
-        # Ignore URL defined from settings if configured
-        for ignore in request.registry.settings.get("app.history.ignore", "").split(","):
-            if ignore and normalized_url.startswith(ignore):
-                return
-
         if not self.history or normalized_url != self.history[-1]:
             self.history.append(normalized_url)
         if len(self.history) > 10:
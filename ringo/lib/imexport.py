@@ -1,22 +1,36 @@
 """Modul for the messanging system in ringo"""
 import logging
 import datetime
+import decimal
 import json
+import re
 import csv
 import codecs
 import cStringIO
 import sets
+import tempfile
+import hashlib
+import multiprocessing
 try:
         import cStringIO as StringIO
 except ImportError:
         import StringIO
 import xlsxwriter
 import sqlalchemy as sa
+try:
+    from sqlalchemy.orm import selectinload
+    _eager_yield_per = True
+except ImportError:
+    # Older versions of SQLAlchemy. The subqueryload can not be combined
+    # with yield_per.
+    from sqlalchemy.orm import subqueryload as selectinload
+    _eager_yield_per = False
 
 from ringo.model.base import BaseItem
+from ringo.model.mixins import Blob
 from ringo.model.user import UserSetting
-from ringo.lib.helpers import serialize, deserialize
-from ringo.lib.alchemy import get_props_from_instance
+from ringo.lib.helpers import serialize, get_deserializer, get_item_modul
+from ringo.lib.alchemy import get_props_from_clazz
 
 log = logging.getLogger(__name__)
 
@@ -80,6 +94,34 @@ class ExportConfiguration(object):
     def includes_wildcard(self):
         return "*" in self.config
 
+    def get_load_options(self, clazz):
+        """Returns a list of loader options for a query of items of the
+        given clazz. The options will eager load all relations
+        included in the configuration with one additional query per
+        relation.
+
+        :clazz: Clazz of the exported items
+        :returns: List of loader options
+        """
+        return self._get_load_options(clazz, self.config)
+
+    def _get_load_options(self, clazz, config, parent=None):
+        options = []
+        for field in config:
+            if not isinstance(field, dict):
+                continue
+            for relation in field:
+                attr = getattr(clazz, relation)
+                if parent is None:
+                    option = selectinload(attr)
+                else:
+                    option = getattr(parent, selectinload.__name__)(attr)
+                options.append(option)
+                options.extend(self._get_load_options(attr.mapper.class_,
+                                                      field[relation],
+                                                      option))
+        return options
+
     def get_relation_fields(self):
         fields = []
         for f in self.config:
@@ -146,6 +188,37 @@ class UnicodeCSVWriter:
             self.writerow(row)
 
 
+_worker_session = None
+"""DB session of the worker processes used in
+:meth:`Exporter.stream_parallel`"""
+
+
+def _init_export_worker(session_factory):
+    global _worker_session
+    _worker_session = session_factory()
+
+
+def _export_chunk(task):
+    """Exports the items with the given ids in a worker process. Returns
+    either the set of keys of the exported rows or the serialized
+    rows."""
+    mode, exporter, ids, keys = task
+    clazz = exporter._clazz
+    try:
+        query = _worker_session.query(clazz).filter(clazz.id.in_(ids))
+        loaded = dict((item.id, item) for item in query)
+        items = [loaded[id] for id in ids if id in loaded]
+        rows = exporter._iter_rows(items, len(ids))
+        if mode == "keys":
+            keys = sets.Set()
+            for row in rows:
+                keys = keys.union(row.keys())
+            return keys
+        return exporter.serialize_chunk(rows, keys)
+    finally:
+        _worker_session.close()
+
+
 class Exporter(object):
 
     """Base exporter to export items of the given class. The
@@ -181,6 +254,9 @@ class Exporter(object):
     are exported.
     """
 
+    _needs_keys = False
+    """Flag if the keys of all rows must be known to serialize a row"""
+
     def __init__(self, clazz, fields=None, serialized=True, relations=False, config=None):
         """
         :clazz: Clazz of the items which will be exported.
@@ -194,6 +270,9 @@ class Exporter(object):
         self._serialized = serialized
         self._relations = relations
         self._config = config
+        self._relation_exporters = {}
+        """Exporters of the related items. Shared for all items."""
+        self._field_names = None
 
     def serialize(self, data):
         """Method to convert the given python listing with the exported
@@ -223,6 +302,98 @@ class Exporter(object):
                 values[key] = data[key]
         return values
 
+    def export_item(self, item):
+        """Will export a single item. Returns a flat dictionary with
+        the exported values of the item.
+
+        :item: Item which will be exported.
+        :returns: Dictionary with the exported values.
+        """
+        # Ensure that every item has a UUID. Set missing UUID here
+        # if the item has no uuid set yet.
+        if not item.uuid:
+            item.reset_uuid()
+
+        # Check if a configuration is provided.
+
+        #  FIXME: Read support for deprecated "relations" argument?
+        #  Is missing here. (ti) <2017-05-23 14:02>
+        if not self._config or len(self._config.config) == 0:
+            # No configuration is provided. Export all fields
+            # exluding relations.
+            values = item.get_values(serialized=self._serialized)
+        else:
+            # Configuration is provided. Export fields and relations
+            # based on the given configuration.
+            values = {}
+            for field in self._get_field_names():
+                if isinstance(field, dict):
+                    for relation in field:
+                        exporter = self._get_relation_exporter(relation,
+                                                               field[relation])
+                        value = item.get_value(relation)
+                        value = exporter.perform(value)
+                        values[relation] = value
+                else:
+                    value = serialize(item.get_value(field))
+                    values[field] = value
+        return self.flatten(values)
+
+    def _get_field_names(self):
+        if self._field_names is None:
+            if self._config.includes_wildcard():
+                fields = [p.key for p in get_props_from_clazz(self._clazz)]
+                fields.extend(self._config.get_relation_fields())
+            else:
+                fields = self._config.config
+            self._field_names = fields
+        return self._field_names
+
+    def _get_relation_exporter(self, relation, config):
+        if relation not in self._relation_exporters:
+            clazz = getattr(self._clazz, relation).mapper.class_
+            exporter = Exporter(clazz,
+                                serialized=self._serialized,
+                                config=ExportConfiguration(config))
+            self._relation_exporters[relation] = exporter
+        return self._relation_exporters[relation]
+
+    def get_load_options(self):
+        """Returns a list of loader options to eager load all relations
+        which are included in the export."""
+        if not self._config:
+            return []
+        return self._config.get_load_options(self._clazz)
+
+    def preload(self, items):
+        """Will eager load all relations of the given items which are
+        included in the export. The relations are loaded with a few
+        queries for all items instead of lazy loading them item by item
+        on export.
+
+        :items: List of items of the same session.
+        """
+        options = self.get_load_options()
+        if not options:
+            return
+        relations = set()
+        for field in self._config.config:
+            if isinstance(field, dict):
+                relations.update(field.keys())
+        # Only load items where the relations are not already loaded.
+        # This is the case e.g for related items which has been eager
+        # loaded together with their parent.
+        ids = [item.id for item in items
+               if item.id is not None
+               and relations & sa.inspect(item).unloaded]
+        if not ids:
+            return
+        session = sa.orm.object_session(items[0])
+        if session is None:
+            return
+        session.query(self._clazz).options(*options) \
+            .filter(self._clazz.id.in_(ids)).all()
+
     def perform(self, items):
         """Will export the given items. Depending if the Exporter has
         been initialised with the `serialized` parameter the export will
@@ -233,50 +404,15 @@ class Exporter(object):
         :returns: Exported items. (Format Depends on the export configuration).
 
         """
-        data = []
         # Check if the given item(s) is a list. If not we put it into a
         # temporary list.
         if not isinstance(items, list):
             _items = [items]
         else:
             _items = items
-        for item in _items:
-            # Ensure that every item has a UUID. Set missing UUID here
-            # if the item has no uuid set yet.
-            if not item.uuid:
-                item.reset_uuid()
-
-            # Check if a configuration is provided.
-
-            #  FIXME: Read support for deprecated "relations" argument?
-            #  Is missing here. (ti) <2017-05-23 14:02>
-            if not self._config or len(self._config.config) == 0:
-                # No configuration is provided. Export all fields
-                # exluding relations.
-                values = item.get_values(serialized=self._serialized)
-            else:
-                # Configuration is provided. Export fields and relations
-                # based on the given configuration.
-                values = {}
-                if self._config.includes_wildcard():
-                    fields = [p.key for p in get_props_from_instance(item)]
-                    fields.extend(self._config.get_relation_fields())
-                else:
-                    fields = self._config.config
-                for field in fields:
-                    if isinstance(field, dict):
-                        for relation in field:
-                            clazz = getattr(self._clazz, relation).mapper.class_
-                            exporter = Exporter(clazz,
-                                                serialized=self._serialized,
-                                                config=ExportConfiguration(field[relation]))
-                            value = item.get_value(relation)
-                            value = exporter.perform(value)
-                            values[relation] = value
-                    else:
-                        value = serialize(item.get_value(field))
-                        values[field] = value
-            data.append(self.flatten(values))
+        if len(_items) > 1:
+            self.preload(_items)
+        data = [self.export_item(item) for item in _items]
 
         # If the input to the method was a single item we will return a
         # single exported item.
@@ -287,6 +423,146 @@ class Exporter(object):
                 data = None
         return self.serialize(data)
 
+    def _iter_items(self, items, chunksize):
+        """Iterates over the given items. Queries are fetched in chunks
+        of the given size to keep the number of items in memory
+        small."""
+        if isinstance(items, sa.orm.Query):
+            # Joined eager loading can not be combined with yield_per.
+            items = items.options(sa.orm.lazyload("*"))
+            options = self.get_load_options()
+            if options and not _eager_yield_per:
+                # Relations are preloaded for each chunk below.
+                items = items.yield_per(chunksize)
+            else:
+                if options:
+                    items = items.options(*options)
+                for item in items.yield_per(chunksize):
+                    yield item
+                return
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunksize:
+                self.preload(chunk)
+                for item in chunk:
+                    yield item
+                chunk = []
+        self.preload(chunk)
+        for item in chunk:
+            yield item
+
+    def _iter_rows(self, items, chunksize):
+        for item in self._iter_items(items, chunksize):
+            yield self.export_item(item)
+
+    def _get_keys(self, items, chunksize):
+        """Returns the sorted list of keys of the exported rows. Rows of
+        blobform items may have different keys. In this case all items
+        are exported once to collect the keys. Therefor the items must
+        be a list or a query. See :func:`_reiterable`."""
+        keys = sets.Set()
+        for row in self._iter_rows(items, chunksize):
+            keys = keys.union(row.keys())
+            if not issubclass(self._clazz, Blob):
+                break
+        return sorted(keys)
+
+    def stream(self, items, chunksize=1000):
+        """Will export the given items in a streaming way. In contrast
+        to :meth:`perform` the items are exported and serialized one by
+        one. The method returns a generator yielding the serialized
+        export in chunks. The memory usage is independent from the
+        number of exported items. The generator can be used as
+        `app_iter` of a response.
+
+        This default implementation yields the exported dictionaries.
+
+        :items: List or query of items which will be exported. Other
+        iterables are read into a list by exporters which need the keys
+        of all rows before writing the first row (e.g CSV).
+        :chunksize: Number of items fetched at once from the database
+        if items is a query.
+        :returns: Generator
+        """
+        return self._iter_rows(items, chunksize)
+
+    def serialize_chunk(self, rows, keys=None):
+        """Will serialize the given exported rows. The returned string
+        is a part of the whole export. The parts are combined by
+        :meth:`_join_chunks`. This default implementation serializes
+        the rows as JSON objects which are joined into a JSON list.
+
+        :rows: Exported rows
+        :keys: Sorted list of the keys of all exported rows
+        :returns: String
+        """
+        return ", ".join(json.dumps(row, cls=ExtendedJSONEncoder)
+                         for row in rows)
+
+    def _join_chunks(self, chunks, keys=None):
+        yield "["
+        first = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if not first:
+                yield ", "
+            first = False
+            yield chunk
+        yield "]"
+
+    def stream_parallel(self, ids, session_factory, processes=None,
+                        chunksize=1000):
+        """Will export the items with the given ids in parallel. The ids
+        are split into chunks. Each chunk is loaded and serialized in
+        one of the worker processes. The serialized chunks are yielded
+        in the order of the given ids.
+
+        :ids: List of ids of the items which will be exported.
+        :session_factory: Callable returning a new database session.
+        The callable is called once in every worker process.
+        :processes: Number of worker processes. Defaults to the number
+        of CPUs.
+        :chunksize: Number of items exported in a single chunk.
+        :returns: Generator
+        """
+        chunks = list(_chunks(ids, chunksize))
+        pool = multiprocessing.Pool(processes, _init_export_worker,
+                                    (session_factory,))
+        try:
+            keys = None
+            if self._needs_keys:
+                # Only rows of blobform items may have different keys.
+                if not issubclass(self._clazz, Blob):
+                    key_chunks = chunks[:1]
+                else:
+                    key_chunks = chunks
+                keys = sets.Set()
+                tasks = [("keys", self, c, None) for c in key_chunks]
+                for chunk_keys in pool.imap(_export_chunk, tasks):
+                    keys = keys.union(chunk_keys)
+                keys = sorted(keys)
+            tasks = [("rows", self, c, keys) for c in chunks]
+            for part in self._join_chunks(pool.imap(_export_chunk, tasks),
+                                          keys):
+                yield part
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def dump(self, items, outfile, chunksize=1000):
+        """Will stream the export of the given items into the given
+        file.
+
+        :items: List or query of items which will be exported.
+        :outfile: File like object.
+        :chunksize: See :meth:`stream`
+        """
+        for chunk in self.stream(items, chunksize):
+            outfile.write(chunk)
+
 
 class XLSXExporter(Exporter):
     """Docstring for XLSXExporter. """
@@ -316,6 +592,30 @@ class XLSXExporter(Exporter):
         output.seek(0)
         return output.read()
 
+    def stream(self, items, chunksize=1000):
+        # Workbooks can not be written in chunks. Rows are written in
+        # constant memory mode into a temporary file which is streamed
+        # afterwards.
+        output = tempfile.TemporaryFile()
+        book = xlsxwriter.Workbook(output, {"constant_memory": True})
+        items = _reiterable(items)
+        keys = self._get_keys(items, chunksize)
+        if keys:
+            sheet = book.add_worksheet(self._clazz.__tablename__)
+            for col, key in enumerate(keys):
+                sheet.write(0, col, key)
+            for row, item in enumerate(self._iter_rows(items, chunksize)):
+                for col, key in enumerate(keys):
+                    sheet.write(row + 1, col, item.get(key))
+        book.close()
+        output.seek(0)
+        while True:
+            chunk = output.read(65536)
+            if not chunk:
+                break
+            yield chunk
+        output.close()
+
 
 class JSONExporter(Exporter):
     """Docstring for JSONExporter. """
@@ -323,10 +623,42 @@ class JSONExporter(Exporter):
     def serialize(self, data):
         return json.dumps(data, cls=ExtendedJSONEncoder)
 
+    def stream(self, items, chunksize=1000):
+        yield "["
+        for num, row in enumerate(self._iter_rows(items, chunksize)):
+            if num > 0:
+                yield ", "
+            yield json.dumps(row, cls=ExtendedJSONEncoder)
+        yield "]"
+
+
+class JSONLinesExporter(JSONExporter):
+    """Exporter for the JSON Lines format. Every exported item is
+    written as JSON object in a single line."""
+
+    def serialize(self, data):
+        if not isinstance(data, list):
+            data = [data]
+        return "".join(json.dumps(row, cls=ExtendedJSONEncoder) + "\n"
+                       for row in data)
+
+    def stream(self, items, chunksize=1000):
+        for row in self._iter_rows(items, chunksize):
+            yield json.dumps(row, cls=ExtendedJSONEncoder) + "\n"
+
+    def serialize_chunk(self, rows, keys=None):
+        return self.serialize(list(rows))
+
+    def _join_chunks(self, chunks, keys=None):
+        for chunk in chunks:
+            yield chunk
+
 
 class CSVExporter(Exporter):
     """Docstring for CSVExporter. """
 
+    _needs_keys = True
+
     def _collect_keys(self, data):
         """The function will collect all keys (fields) within the given
         items. This is needed in case of blobform items as those items
@@ -346,30 +678,252 @@ class CSVExporter(Exporter):
         outfile.seek(0)
         return outfile.read()
 
+    def stream(self, items, chunksize=1000):
+        outfile = cStringIO.StringIO()
+        items = _reiterable(items)
+        writer = UnicodeCSVWriter(outfile, self._get_keys(items, chunksize))
+        writer.writeheader()
+        for num, row in enumerate(self._iter_rows(items, chunksize)):
+            writer.writerow(row)
+            if num % chunksize == 0:
+                yield outfile.getvalue()
+                outfile.truncate(0)
+        yield outfile.getvalue()
+
+    def serialize_chunk(self, rows, keys=None):
+        outfile = cStringIO.StringIO()
+        writer = UnicodeCSVWriter(outfile, keys)
+        writer.writerows(rows)
+        return outfile.getvalue()
+
+    def _join_chunks(self, chunks, keys=None):
+        yield self.serialize_chunk([dict((key, key) for key in keys)], keys)
+        for chunk in chunks:
+            yield chunk
+
+
+def _reiterable(items):
+    """Returns the given items in a way they can be iterated more than
+    once. Lists and queries are returned unchanged. Other iterables
+    like generators are read into a list."""
+    if isinstance(items, (list, tuple, sa.orm.Query)):
+        return items
+    return list(items)
+
+
+def _chunks(iterable, size):
+    """Yields lists with the given size from the given iterable."""
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_json_token = re.compile(r'["{}\[\]]')
+"""Characters which may change the nesting level of a JSON document."""
+_json_string = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+"""Characters of a string up to the closing quote or an escape
+character at the end of the data."""
+_json_whitespace = re.compile(r'[ \t\r\n]*')
+_json_separator = re.compile(r'[ \t\r\n,]*')
+
+
+def _find_object_end(buf, pos, state):
+    """Scans the given buffer beginning at `pos` for the end of the
+    currently scanned JSON object. `state` is a list of the nesting
+    depth and two flags if the scan is within a string or after an
+    escape character. The state is updated, so a scan can be continued
+    after more data has been appended to the buffer.
+
+    :returns: Index after the end of the object or None.
+    """
+    depth, in_string, escaped = state
+    while pos < len(buf):
+        if escaped:
+            escaped = False
+            pos += 1
+            continue
+        if in_string:
+            pos = _json_string.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if buf[pos] == "\\":
+                escaped = True
+            else:
+                in_string = False
+            pos += 1
+            continue
+        match = _json_token.search(buf, pos)
+        if match is None:
+            pos = len(buf)
+            break
+        pos = match.end()
+        token = match.group()
+        if token == '"':
+            in_string = True
+        elif token in "{[":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                state[:] = [0, False, False]
+                return pos
+    state[:] = [depth, in_string, escaped]
+    return None
+
+
+def _iter_json(infile, blocksize=65536):
+    """Yields the objects of a JSON document read from the given file
+    without reading the whole file into memory. The document can either
+    be a JSON array, a single JSON object or multiple JSON objects one
+    per line (JSON Lines).
+
+    Objects which are not complete in the read data are scanned for
+    their end while reading more data. So objects larger than the
+    `blocksize` are not parsed again for every read block and a
+    malformed object raises a ValueError as soon as it is complete."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    # Start of the current object in the buffer and the position and
+    # state of the scan for the end of an incomplete object.
+    start = 0
+    scan = None
+    state = [0, False, False]
+    started = False
+    in_array = False
+    while True:
+        chunk = infile.read(blocksize)
+        buf = buf[start:] + chunk
+        if scan is not None:
+            scan -= start
+        start = 0
+        while True:
+            if scan is None:
+                start = _json_whitespace.match(buf, start).end()
+                if not started and start < len(buf):
+                    started = True
+                    if buf[start] == "[":
+                        in_array = True
+                        start += 1
+                if in_array:
+                    start = _json_separator.match(buf, start).end()
+                    if buf.startswith("]", start):
+                        return
+                if start == len(buf):
+                    break
+                if buf[start] != "{":
+                    raise ValueError("Can not parse JSON data. "
+                                     "Expected an object but found %r"
+                                     % buf[start:start + 20])
+                try:
+                    obj, start = decoder.raw_decode(buf, start)
+                    yield obj
+                    continue
+                except ValueError:
+                    # Object is not complete or malformed.
+                    scan = start
+            end = _find_object_end(buf, scan, state)
+            if end is None:
+                # Object is not complete yet. Read more data.
+                scan = len(buf)
+                break
+            try:
+                obj = decoder.decode(buf[start:end])
+            except ValueError as e:
+                raise ValueError("Can not parse JSON data. %s" % e)
+            yield obj
+            start = end
+            scan = None
+        if not chunk:
+            if buf[start:].strip() or in_array:
+                raise ValueError("Can not parse JSON data. "
+                                 "Document is incomplete")
+            return
+
+
+_type_mappings = {}
+"""Cache for the type mappings of the imported classes. See
+:meth:`Importer._get_types`"""
+
+_relation_types = ['MANYTOONE', 'MANYTOMANY', 'ONETOMANY', 'ONETOONE']
+
+_missing = object()
+
+
+def _normalize_value(value):
+    if isinstance(value, BaseItem):
+        return value.id
+    elif isinstance(value, (list, tuple)):
+        return sorted(_normalize_value(v) for v in value)
+    elif isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    elif isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    elif isinstance(value, decimal.Decimal):
+        # Numeric columns return the value with the scale of the column
+        # (1.50), the imported value may have another scale (1.5).
+        return str(value.normalize())
+    return value
+
+
+def content_hash(values):
+    """Returns a hash of the given dictionary of values. Related items
+    are represented by their id, so the hash of the imported values can
+    be compared with the hash of the values of a stored item.
+
+    :values: Dictionary with values
+    :returns: Hexdigest of the hash
+    """
+    values = dict((k, _normalize_value(v)) for k, v in values.iteritems())
+    data = json.dumps(values, sort_keys=True, cls=ExtendedJSONEncoder)
+    return hashlib.sha1(data).hexdigest()
+
 
 class Importer(object):
     """Docstring for Importer."""
 
-    def __init__(self, clazz, db=None, use_strict=False):
+    def __init__(self, clazz, db=None, use_strict=False, chunksize=1000):
         """@todo: to be defined1.
 
         :clazz: The clazz for which we will import data
+        :chunksize: Number of items which are loaded from the database
+        with a single query.
 
         """
         self._clazz = clazz
         self._db = db
-        self._clazz_type = self._get_types(clazz)
+        self._clazz_type, self._deserializers = self._get_types(clazz)
         self._use_strict = use_strict
+        self._chunksize = chunksize
+        self._related_items = {}
+        """Cache for items in relations loaded with
+        :meth:`_prefetch_relations` for the current chunk"""
+        self._nested_importers = {}
+        """Importers for nested items. See :class:`JSONImporter`"""
 
     def _get_types(self, clazz):
-        type_mapping = {}
-        mapper = sa.orm.class_mapper(clazz)
-        for prop in mapper.iterate_properties:
-            if isinstance(prop, sa.orm.RelationshipProperty):
-                type_mapping[prop.key] = str(prop.direction.name)
-            else:
-                type_mapping[prop.key] = str(prop.columns[0].type)
-        return type_mapping
+        """Returns a dictionary with the type of each field of the
+        given class and a dictionary with the deserializer function for
+        each field which is not a relation. Both are only build once per
+        class.
+        """
+        if clazz not in _type_mappings:
+            type_mapping = {}
+            deserializers = {}
+            mapper = sa.orm.class_mapper(clazz)
+            for prop in mapper.iterate_properties:
+                if isinstance(prop, sa.orm.RelationshipProperty):
+                    type_mapping[prop.key] = str(prop.direction.name)
+                else:
+                    type_mapping[prop.key] = str(prop.columns[0].type)
+                    datatype = type_mapping[prop.key].lower()
+                    deserializers[prop.key] = get_deserializer(datatype)
+            _type_mappings[clazz] = (type_mapping, deserializers)
+        return _type_mappings[clazz]
 
     def _deserialize_values(self, obj):
         """This function can be called after the basic deserialisation
@@ -381,15 +935,11 @@ class Importer(object):
         :returns: Deserialized dictionary with additional integer, date
         and datetime deserialisation
         """
-        for field in obj:
-            if (field not in self._clazz_type or
-               obj[field] is None):
+        deserializers = self._deserializers
+        for field, value in obj.iteritems():
+            if value is None or field not in deserializers:
                 continue
-            else:
-                datatype = self._clazz_type[field].lower()
-                if datatype in ['manytoone', 'manytomany', 'onetomany', 'onetoone']:
-                    continue
-                obj[field] = deserialize(obj[field], datatype)
+            obj[field] = deserializers[field](value)
         return obj
 
     def _deserialize_relations(self, obj):
@@ -411,8 +961,7 @@ class Importer(object):
                 log.warning("Can not find field %s in %s" % (field, self._clazz_type))
                 continue
             # Handle all types of relations...
-            if ftype in ["MANYTOMANY", "MANYTOONE",
-                         "ONETOONE", "ONETOMANY"]:
+            if ftype in _relation_types:
                 # Remove the items from the list if there is no db
                 # connection or of there are not MANYTOMANY.
                 if not self._db or (ftype != "MANYTOMANY"):
@@ -425,6 +974,8 @@ class Importer(object):
                         # Item has been already be deserialized in the
                         # recursive calls.
                         tmp.append(item_id)
+                    elif (clazz, item_id) in self._related_items:
+                        tmp.append(self._related_items[(clazz, item_id)])
                     else:
                         q = self._db.query(clazz).filter(clazz.id == item_id)
                         try:
@@ -436,6 +987,138 @@ class Importer(object):
                 obj[field] = tmp
         return obj
 
+    def _prefetch_relations(self, rows):
+        """Will load the related items of all MANYTOMANY relations in
+        the given rows with a few queries. The items are used later in
+        :meth:`_deserialize_relations` instead of loading each item
+        with a single query.
+
+        :rows: List of dictionaries from basic deserialisation
+        """
+        # The items of the previous chunk are not needed anymore.
+        self._related_items = {}
+        if not self._db:
+            return
+        ids = {}
+        for row in rows:
+            for field, value in row.iteritems():
+                if (self._clazz_type.get(field) != "MANYTOMANY"
+                   or not isinstance(value, list)):
+                    continue
+                ids.setdefault(field, set()).update(
+                    x for x in value if not isinstance(x, (dict, BaseItem)))
+        for field, item_ids in ids.iteritems():
+            clazz = getattr(self._clazz, field).mapper.class_
+            for chunk in _chunks(item_ids, self._chunksize):
+                q = self._db.query(clazz).filter(clazz.id.in_(chunk))
+                for item in q:
+                    self._related_items[(clazz, item.id)] = item
+
+    def _get_load_keys(self, rows, load_key):
+        keys = []
+        for values in rows:
+            if load_key == "uuid" and "id" in values:
+                del values["id"]
+            keys.append(values.get(load_key))
+        return keys
+
+    def _load_items(self, keys, load_key):
+        """Returns a dictionary with the existing items for the given
+        keys. The items are loaded with a single query.
+
+        :keys: List of values of the `load_key` field
+        :load_key: Name of the field to load the items
+        :returns: Dictionary with the key as key and the item as value
+        """
+        keys = set(key for key in keys if key is not None)
+        if not keys:
+            return {}
+        field = getattr(self._clazz, load_key)
+        q = self._db.query(self._clazz).filter(field.in_(keys))
+        for relation in self._clazz._sql_eager_loads:
+            q = q.options(sa.orm.joinedload(relation))
+        return dict((getattr(item, load_key), item) for item in q)
+
+    def is_unchanged(self, item, values):
+        """Returns True if the given values are equal to the values of
+        the item. Only the fields in the given values are compared.
+
+        :item: Stored item
+        :values: Deserialized values of the imported row
+        :returns: True or False
+        """
+        imported = {}
+        stored = {}
+        for field, value in values.iteritems():
+            if field.startswith("_") or field == "id":
+                continue
+            current = getattr(item, field, _missing)
+            if current is _missing:
+                if isinstance(item, Blob):
+                    # Value will be added to the data of the blobform.
+                    return False
+                # Unknown fields are ignored on import.
+                continue
+            imported[field] = value
+            stored[field] = current
+        return content_hash(imported) == content_hash(stored)
+
+    def _import_rows(self, rows, factory, user, translate, load_key,
+                     skip_unchanged=False, dry_run=False):
+        _ = translate
+        imported_items = []
+        keys = self._get_load_keys(rows, load_key)
+        items = self._load_items(keys, load_key)
+        for values, key in zip(rows, keys):
+            # uuid might be empty for new items.
+            item = items.get(key)
+            if item is not None:
+                if ((skip_unchanged or dry_run)
+                   and self.is_unchanged(item, values)):
+                    operation = _("UNCHANGED")
+                else:
+                    if not dry_run:
+                        item.set_values(values, use_strict=self._use_strict)
+                    operation = _("UPDATE")
+            else:
+                if dry_run:
+                    # New items are not created in a dry run.
+                    item = None
+                else:
+                    if ("id" in values and not values["id"]):
+                        del values["id"]
+                    item = factory.create(user=user, values=values)
+                    self._db.add(item)
+                operation = _("CREATE")
+            imported_items.append((item, operation))
+        return imported_items
+
+    def _open(self, data):
+        """Returns a file like object for the given data"""
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        if isinstance(data, str):
+            return cStringIO.StringIO(data)
+        return data
+
+    def iter_rows(self, data):
+        """Will read the given data and yields the rows with the basic
+        deserialisation of the format one by one.
+
+        :data: Importdata as string or file like object.
+        :returns: Iterator of dictionaries
+        """
+        return iter([])
+
+    def deserialize_rows(self, rows):
+        """Will convert the given rows into dictionaries with python
+        values.
+
+        :rows: List of rows returned by :meth:`iter_rows`
+        :returns: List of dictionaries with python values
+        """
+        return rows
+
     def deserialize(self, data):
         """Will convert the string data into a dictionary like data.
 
@@ -443,62 +1126,182 @@ class Importer(object):
         :returns: Dictionary like data
 
         """
-        return {}
+        return self.deserialize_rows(list(self.iter_rows(data)))
+
+    def iter_perform(self, data, user=None, translate=lambda x: x,
+                     load_key="uuid", progress=None, flush=False,
+                     skip_unchanged=False, dry_run=False):
+        """Same as :meth:`perform` but the data is read, imported and
+        yielded in chunks. So the data can be imported without reading
+        the whole data into memory.
 
-    def perform(self, data, user=None, translate=lambda x: x, load_key="uuid"):
+        :data: Importdata as string or file like object.
+        :user: User object. Used when creating objects.
+        :translate: Translation method.
+        :load_key: Define name of the key which is used to load the
+        item.
+        :progress: Optional callable which is called with the number of
+        imported items after each chunk.
+        :flush: If True, the session is flushed after each chunk.
+        :skip_unchanged: If True, existing items are only updated if
+        the imported values differ from the stored values. Otherwise
+        the operation is "UNCHANGED".
+        :dry_run: If True, nothing is changed. The operations are only
+        determined. The item of new rows is None.
+        :returns: Iterator of imported items
+
+        """
+        self.load_key = load_key
+        factory = self._clazz.get_item_factory()
+        if self._use_strict:
+            factory._use_strict = self._use_strict
+        count = 0
+        for rows in _chunks(self.iter_rows(data), self._chunksize):
+            with self._db.no_autoflush:
+                rows = self.deserialize_rows(rows)
+                imported_items = self._import_rows(rows, factory, user,
+                                                   translate, load_key,
+                                                   skip_unchanged, dry_run)
+            if flush:
+                self._db.flush()
+            count += len(imported_items)
+            if progress:
+                progress(count)
+            for imported_item in imported_items:
+                yield imported_item
+
+    def perform(self, data, user=None, translate=lambda x: x, load_key="uuid",
+                skip_unchanged=False, dry_run=False):
         """Will return a list of imported items. The list will contain a
         tupel of the item and a string which gives information on the
         operaten (update, create). For create operations the new item
         will be created with the given user.
 
-        :data: Importdata as string (JSON, XML...)
+        Existing items are loaded in chunks with a single query per
+        chunk.
+
+        :data: Importdata as string or file like object (JSON, CSV...)
         :user: User object. Used when creating objects.
         :translate: Translation method.
         :load_key: Define name of the key which is used to load the
         item.
+        :skip_unchanged: See :meth:`iter_perform`
+        :dry_run: See :meth:`iter_perform`
         :returns: List of imported items
 
+        """
+        return list(self.iter_perform(data, user, translate, load_key,
+                                      skip_unchanged=skip_unchanged,
+                                      dry_run=dry_run))
+
+    def _get_create_defaults(self, user):
+        """Returns the default values for new items created in a bulk
+        import. See :meth:`BaseFactory.create`"""
+        defaults = {}
+        if hasattr(self._clazz, 'uid') and user is not None:
+            defaults["uid"] = user.id
+        if hasattr(self._clazz, 'gid'):
+            modul = get_item_modul(None, self._clazz)
+            if modul.default_gid:
+                defaults["gid"] = modul.default_gid
+            elif user is not None and user.default_gid:
+                defaults["gid"] = user.default_gid
+        return defaults
+
+    def perform_bulk(self, data, user=None, load_key="uuid", progress=None):
+        """Will import the given data using bulk inserts and updates.
+        In contrast to :meth:`perform` no item instances are created
+        for the imported rows. This is much faster, but the values are
+        not set through the items. So no handlers or callbacks are
+        called and the version and meta information of the items are
+        not updated. Rows including relations to other items are still
+        imported like in :meth:`perform`.
+
+        :data: Importdata as string or file like object (JSON, CSV...)
+        :user: User object. Used when creating objects.
+        :load_key: Define name of the key which is used to load the
+        item.
+        :progress: Optional callable which is called with the number of
+        imported items after each chunk.
+        :returns: Tuple with the number of created and updated items
+
         """
         self.load_key = load_key
-        with self._db.no_autoflush:
-            data = self.deserialize(data)
-            imported_items = []
-            factory = self._clazz.get_item_factory()
-            if self._use_strict:
-                factory._use_strict = self._use_strict
-            _ = translate
-            for values in data:
-                if load_key == "uuid":
-                    id = values.get('uuid')
-                    if "id" in values:
-                        del values["id"]
-                    load_key = "uuid"
-                else:
-                    id = values.get(load_key)
-                try:
-                    # uuid might be empty for new items, which will raise an
-                    # error on loading.
-                    item = factory.load(id, field=load_key)
-                    item.set_values(values, use_strict=self._use_strict)
-                    operation = _("UPDATE")
-                except sa.orm.exc.NoResultFound:
-                    if ("id" in values and not values["id"]):
-                        del values["id"]
-                    item = factory.create(user=user, values=values)
-                    self._db.add(item)
-                    operation = _("CREATE")
-                imported_items.append((item, operation))
-        return imported_items
+        mapper = sa.orm.class_mapper(self._clazz)
+        columns = set(prop.key for prop in mapper.column_attrs)
+        field = getattr(self._clazz, load_key)
+        defaults = self._get_create_defaults(user)
+        is_blob = issubclass(self._clazz, Blob)
+        factory = self._clazz.get_item_factory()
+        if self._use_strict:
+            factory._use_strict = self._use_strict
+        created = 0
+        updated = 0
+        for rows in _chunks(self.iter_rows(data), self._chunksize):
+            with self._db.no_autoflush:
+                rows = self.deserialize_rows(rows)
+                keys = self._get_load_keys(rows, load_key)
+                existing = {}
+                if any(key is not None for key in keys):
+                    q = self._db.query(field, self._clazz.id)
+                    q = q.filter(field.in_(set(keys)))
+                    existing = dict(q.all())
+                inserts = []
+                updates = []
+                others = []
+                for values, key in zip(rows, keys):
+                    if (is_blob or [f for f in values
+                                    if f in self._clazz_type
+                                    and f not in columns]):
+                        # Relations and the values of blobforms can not
+                        # be handled in bulk mode.
+                        others.append(values)
+                        continue
+                    mapping = dict((k, v) for k, v in values.iteritems()
+                                   if k in columns)
+                    if key in existing:
+                        mapping["id"] = existing[key]
+                        updates.append(mapping)
+                    else:
+                        for name in ["id", "uuid"]:
+                            if name in mapping and not mapping[name]:
+                                del mapping[name]
+                        for name, value in defaults.iteritems():
+                            mapping.setdefault(name, value)
+                        inserts.append(mapping)
+                if inserts:
+                    self._db.bulk_insert_mappings(self._clazz, inserts)
+                if updates:
+                    self._db.bulk_update_mappings(self._clazz, updates)
+                created += len(inserts)
+                updated += len(updates)
+                for item, operation in self._import_rows(others, factory,
+                                                         user, lambda x: x,
+                                                         load_key):
+                    if operation == "CREATE":
+                        created += 1
+                    else:
+                        updated += 1
+            self._db.flush()
+            if progress:
+                progress(created + updated)
+        return created, updated
 
 
 class JSONImporter(Importer):
     """Docstring for JSONImporter."""
 
+    def _get_nested_importer(self, field):
+        if field not in self._nested_importers:
+            clazz = getattr(self._clazz, field).mapper.class_
+            importer = JSONImporter(clazz, db=self._db, use_strict=self._use_strict)
+            self._nested_importers[field] = importer
+        return self._nested_importers[field]
+
     def _deserialize_recursive(self, obj):
         for field in obj:
             if isinstance(obj[field], (dict, list)):
-                clazz = getattr(self._clazz, field).mapper.class_
-                importer = JSONImporter(clazz, db=self._db, use_strict=self._use_strict)
+                importer = self._get_nested_importer(field)
                 if not isinstance(obj[field], list):
                     import_data = [obj[field]]
                     imported_item = importer.perform(json.dumps(import_data), load_key=self.load_key)
@@ -514,16 +1317,23 @@ class JSONImporter(Importer):
         obj = self._deserialize_values(obj)
         return self._deserialize_relations(obj)
 
-    def deserialize(self, data):
+    def iter_rows(self, data):
+        """Will read the JSON data incrementally. The data can either
+        be a JSON array of objects, a single object or JSON Lines.
+
+        :data: JSON data as string or file like object
+        :returns: Iterator of dictionaries
+        """
+        return _iter_json(self._open(data))
+
+    def deserialize_rows(self, rows):
         """Will convert the JSON data back into a dictionary with python values
 
-        :data: String JSON data
+        :rows: List of dictionaries from the JSON data
         :returns: List of dictionary with python values
         """
-        conv = json.loads(data)
-        if isinstance(conv, dict):
-            conv = [conv]
-        return [self._deserialize_hook(c) for c in conv]
+        self._prefetch_relations(rows)
+        return [self._deserialize_hook(c) for c in rows]
 
 
 class CSVImporter(Importer):
@@ -536,16 +1346,18 @@ class CSVImporter(Importer):
         conv = self._deserialize_values(conv)
         return conv
 
-    def deserialize(self, data):
+    def iter_rows(self, data):
+        """Will read the CSV data row by row.
+
+        :data: CSV data as string or file like object
+        :returns: Iterator of dictionaries
+        """
+        return csv.DictReader(self._open(data))
+
+    def deserialize_rows(self, rows):
         """Will convert the CSV data back into a dictionary with python values
 
-        :data: String CSV data
+        :rows: List of dictionaries from the CSV data
         :returns: List of dictionary with python values
         """
-        result = []
-        infile = cStringIO.StringIO(data)
-        reader = csv.DictReader(infile)
-        for conv in reader:
-            conv = self._deserialize_hook(conv)
-            result.append(conv)
-        return result
+        return [self._deserialize_hook(c) for c in rows]
@@ -0,0 +1,213 @@
+"""Modul to record the number and duration of SQL queries and the hits
+and misses of the caches per request. The instrumentation is disabled
+on default and can be enabled in the configuration::
+
+    instrumentation.enabled = true
+
+If enabled, a tween records the following data for every request:
+
+ * Number of SQL queries and total time spent in the database.
+ * The slowest statements of the request.
+ * Statements which are executed more than `instrumentation.n_plus_one`
+   times within the request (Default 10). Such statements usually
+   indicate a N+1 problem where related items are loaded one by one.
+ * Hits and misses of the SQL query cache (:class:`.CachingQuery`) and
+   of the caches in :mod:`ringo.lib.cache`.
+
+A summary is logged for every request. Requests with N+1 statements or
+more than `instrumentation.slow_request` milliseconds in the database
+(Default 500) are logged as warning. Setting
+`instrumentation.headers = true` adds the numbers as `X-Ringo-*` headers
+to the response which is useful during development. The aggregated
+numbers per route are available for admins as JSON at
+`rest/instrumentation`. A POST request on this URL resets the numbers.
+Requests which do not match any route are aggregated as
+:data:`NO_ROUTE`.
+"""
+import re
+import time
+import heapq
+import logging
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+_lock = threading.Lock()
+
+_routes = {}
+"""Aggregated statistics per route since start of the application or
+the last reset."""
+
+re_parameter_list = re.compile(r"\(\s*(\?|%\(\w+\)s|%s|:\w+)"
+                               r"(\s*,\s*(\?|%\(\w+\)s|%s|:\w+))*\s*\)")
+re_whitespace = re.compile(r"\s+")
+
+NUM_SLOWEST = 5
+"""Number of slowest statements kept per request and route."""
+
+NO_ROUTE = "<no route>"
+"""Name under which the requests are aggregated which do not match any
+route. Using the path would add a new entry for every unknown URL."""
+
+
+def get_shape(statement):
+    """Returns the shape of the given SQL statement. Statements which
+    only differ in the number of parameters in an IN clause have the
+    same shape."""
+    statement = re_whitespace.sub(" ", statement).strip()
+    return re_parameter_list.sub("(...)", statement)
+
+
+class RequestStats(object):
+    """Container for the statistics recorded for a single request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+        self.slowest = []
+        self.shapes = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add_query(self, statement, duration):
+        self.queries += 1
+        self.duration += duration
+        shape = get_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        entry = (duration, shape)
+        if len(self.slowest) < NUM_SLOWEST:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def add_cache_access(self, hit):
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def get_slowest(self):
+        """Returns a list of (duration, statement) tuples of the slowest
+        statements. Slowest statement first."""
+        return sorted(self.slowest, reverse=True)
+
+    def get_repeated(self, threshold):
+        """Returns a dictionary with the statements which have been
+        executed more than `threshold` times and their count."""
+        return dict((shape, count) for shape, count
+                    in self.shapes.iteritems() if count > threshold)
+
+
+def start_recording():
+    """Starts recording the statistics for the current thread."""
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def stop_recording():
+    """Stops recording and returns the recorded statistics of the
+    current thread."""
+    stats = getattr(_local, "stats", None)
+    _local.stats = None
+    return stats
+
+
+def record_cache_access(hit):
+    """Records a hit or miss of a cache. Does nothing if the current
+    thread is not recording."""
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.add_cache_access(hit)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters,
+                           context, executemany):
+    if getattr(_local, "stats", None) is not None:
+        conn.info.setdefault("query_start_time", []).append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters,
+                          context, executemany):
+    stats = getattr(_local, "stats", None)
+    if stats is not None and conn.info.get("query_start_time"):
+        duration = time.time() - conn.info["query_start_time"].pop()
+        stats.add_query(statement, duration)
+
+
+def setup_engine_events():
+    """Registers the listeners to record the SQL queries on all
+    engines."""
+    if not event.contains(Engine, "before_cursor_execute",
+                          _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute",
+                     _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute",
+                     _after_cursor_execute)
+
+
+def aggregate(name, stats, threshold):
+    """Adds the statistics of a request to the aggregated statistics of
+    the route with the given name."""
+    with _lock:
+        route = _routes.get(name)
+        if route is None:
+            route = {"requests": 0,
+                     "queries": 0,
+                     "max_queries": 0,
+                     "db_time": 0.0,
+                     "cache_hits": 0,
+                     "cache_misses": 0,
+                     "repeated": {},
+                     "slowest": []}
+            _routes[name] = route
+        route["requests"] += 1
+        route["queries"] += stats.queries
+        route["max_queries"] = max(route["max_queries"], stats.queries)
+        route["db_time"] += stats.duration
+        route["cache_hits"] += stats.cache_hits
+        route["cache_misses"] += stats.cache_misses
+        for shape, count in stats.get_repeated(threshold).iteritems():
+            route["repeated"][shape] = max(route["repeated"].get(shape, 0),
+                                           count)
+        slowest = route["slowest"] + stats.get_slowest()
+        route["slowest"] = sorted(slowest, reverse=True)[:NUM_SLOWEST]
+
+
+def get_statistics():
+    """Returns the aggregated statistics per route. Times are in
+    milliseconds."""
+    result = {}
+    with _lock:
+        for name, route in _routes.iteritems():
+            requests = route["requests"]
+            result[name] = {
+                "requests": requests,
+                "queries": route["queries"],
+                "avg_queries": float(route["queries"]) / requests,
+                "max_queries": route["max_queries"],
+                "db_time": route["db_time"] * 1000,
+                "avg_db_time": route["db_time"] * 1000 / requests,
+                "cache_hits": route["cache_hits"],
+                "cache_misses": route["cache_misses"],
+                "repeated": dict(route["repeated"]),
+                "slowest": [{"time": duration * 1000, "statement": shape}
+                            for duration, shape in route["slowest"]]
+            }
+    return result
+
+
+def reset_statistics():
+    with _lock:
+        _routes.clear()
+
+
+def setup_instrumentation(config):
+    settings = config.registry.settings
+    if settings.get("instrumentation.enabled") == "true":
+        log.info("Setting up instrumentation of SQL queries.")
+        setup_engine_events()
+        config.add_tween('ringo.tweens.instrumentation.'
+                         'instrumentation_factory')
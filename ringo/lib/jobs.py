@@ -0,0 +1,302 @@
+"""Modul for running long lasting tasks like exports, imports or
+bundled actions on many items in the background.
+
+Instead of doing the work within the request the view enqueues a
+:class:`.Job` in the database. A separate worker process started with
+``ringo-admin jobs worker`` picks up the queued jobs and runs them. No
+external message broker is needed. The progress of a job can be polled
+with the REST endpoint ``rest/jobs/{id}`` and the result of a finished
+job can be downloaded from ``jobs/{id}/download``.
+
+The work of a job is done by a job handler. Job handlers are registered
+by name using :func:`register_job_handler`. A job handler is a callable
+which is called with a :class:`JobContext`::
+
+    def my_job(context):
+        items = ...
+        with context.open_result("result.txt", "text/plain") as f:
+            for num, item in enumerate(items):
+                f.write(...)
+                context.progress(num + 1, len(items))
+
+    register_job_handler("myjob", my_job)
+
+Jobs are configured in the application configuration::
+
+    jobs.enabled = true
+    jobs.directory = /path/to/jobs
+    jobs.threshold = 1000
+    jobs.import.threshold = 1048576
+    jobs.max_age = 24
+    jobs.timeout = 12
+
+If jobs are enabled, exports and bundled deletes of more than
+`jobs.threshold` items and imports of files larger than
+`jobs.import.threshold` bytes are done in the background. Result
+files are written into `jobs.directory` (Defaults to a directory in the
+temp directory of the system). Finished jobs and their result files are
+removed by the worker after `jobs.max_age` hours. Jobs which are still
+running `jobs.timeout` hours after they have been started are considered
+stale (e.g. the worker has been killed) and are queued again.
+"""
+import os
+import time
+import logging
+import tempfile
+import datetime
+import transaction
+from pyramid.events import NewRequest
+from pyramid.scripting import prepare
+from ringo.model.job import Job, QUEUED, RUNNING, FINISHED, FAILED
+from ringo.model.user import User
+
+log = logging.getLogger(__name__)
+
+_job_handlers = {}
+"""Dictionary with the registered job handlers. Key is the name of the
+job."""
+
+
+def register_job_handler(name, handler):
+    """Registers the given handler for jobs with the given name."""
+    _job_handlers[name] = handler
+
+
+def get_job_handler(name):
+    return _job_handlers.get(name)
+
+
+def is_enabled(settings):
+    return settings.get("jobs.enabled") == "true"
+
+
+def get_threshold(settings):
+    """Returns the number of items above which actions on items are
+    done in a job."""
+    return int(settings.get("jobs.threshold", 1000))
+
+
+def get_job_directory(settings):
+    """Returns the directory where the result files of the jobs are
+    stored. The directory is created if it does not exist."""
+    path = settings.get("jobs.directory")
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "ringo-jobs")
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+
+def enqueue(db, name, params, user=None):
+    """Adds a new job to the queue. The job will be picked up by the
+    worker after the current transaction has been committed.
+
+    :db: Current db session
+    :name: Name of a registered job handler
+    :params: Dictionary with the parameters of the job. Must be JSON
+    serializable.
+    :user: User who owns the job. The job is run as this user.
+    :returns: :class:`.Job`
+    """
+    job = Job(name=name, status=QUEUED, progress=0)
+    job.set_params(params)
+    if user:
+        job.uid = user.id
+    db.add(job)
+    db.flush()
+    log.info("Enqueued job %s (%s)" % (job.id, name))
+    return job
+
+
+def get_job(request, id):
+    """Returns the job with the given id if the current user is allowed
+    to access it (owner of the job or admin). Else None."""
+    job = request.db.query(Job).filter(Job.id == id).first()
+    if job is None or request.user is None:
+        return None
+    if job.uid != request.user.id and not request.user.has_role("admin"):
+        return None
+    return job
+
+
+def claim_job(db):
+    """Claims the oldest queued job for the calling worker. The status
+    is changed with a conditional update so a job is only claimed by
+    one worker even if several workers are running.
+
+    :db: Non transactional db session
+    :returns: Claimed :class:`.Job` or None
+    """
+    queued = db.query(Job.id).filter(Job.status == QUEUED)\
+        .order_by(Job.id).limit(10).all()
+    for job_id, in queued:
+        count = db.query(Job)\
+            .filter(Job.id == job_id, Job.status == QUEUED)\
+            .update({"status": RUNNING,
+                     "started": datetime.datetime.utcnow()},
+                    synchronize_session=False)
+        db.commit()
+        if count:
+            return db.query(Job).filter(Job.id == job_id).one()
+    return None
+
+
+class JobContext(object):
+    """The context is given to the job handler. It provides the
+    parameters of the job, a request to work with and methods to report
+    the progress and to write the result of the job."""
+
+    def __init__(self, job, request, db, settings):
+        """
+        :job: Running :class:`.Job`
+        :request: Request used while running the job. The user of the
+        request is the owner of the job.
+        :db: Non transactional db session used to update the status of
+        the job.
+        :settings: Application settings
+        """
+        self.job = job
+        self.request = request
+        self.params = job.get_params()
+        self.settings = settings
+        self._db = db
+        self._last_update = 0
+
+    def progress(self, count, total=None):
+        """Reports the number of processed items. The status in the
+        database is updated at most once per second."""
+        self.job.progress = count
+        if total is not None:
+            self.job.total = total
+        now = time.time()
+        if now - self._last_update >= 1:
+            self._last_update = now
+            self._db.commit()
+
+    def set_message(self, message):
+        self.job.message = message
+
+    def open_result(self, filename, content_type):
+        """Returns a file opened for writing the result of the job.
+
+        :filename: Filename offered when downloading the result.
+        :content_type: Content type of the result.
+        :returns: File object
+        """
+        self.job.result = "%s-%s" % (self.job.id, filename)
+        self.job.result_name = filename
+        self.job.result_type = content_type
+        path = os.path.join(get_job_directory(self.settings),
+                            self.job.result)
+        return open(path, "wb")
+
+
+def run_job(job, registry, db):
+    """Runs the given job. The job handler is called with a new request
+    which is set up in the same way as the requests of the application.
+    The work of the handler is done in a transaction which is committed
+    if the handler succeeds. The status of the job is updated in the
+    given non transactional session.
+
+    :job: Claimed :class:`.Job`
+    :registry: Registry of the application
+    :db: Non transactional db session
+    """
+    settings = registry.settings
+    handler = get_job_handler(job.name)
+    env = prepare(registry=registry)
+    request = env["request"]
+    try:
+        transaction.begin()
+        registry.notify(NewRequest(request))
+        if job.uid:
+            request.user = request.db.query(User)\
+                .filter(User.id == job.uid).one()
+        if handler is None:
+            raise Exception("No handler registered for job %s" % job.name)
+        context = JobContext(job, request, db, settings)
+        log.info("Running job %s (%s)" % (job.id, job.name))
+        handler(context)
+        transaction.commit()
+        job.status = FINISHED
+    except Exception as e:
+        transaction.abort()
+        log.exception("Job %s (%s) failed" % (job.id, job.name))
+        job.status = FAILED
+        job.message = unicode(e)
+    finally:
+        if getattr(request, "db", None) is not None:
+            request.db.close()
+        env["closer"]()
+    job.finished = datetime.datetime.utcnow()
+    db.commit()
+    return job
+
+
+def purge_jobs(db, settings):
+    """Deletes all finished or failed jobs which are older than the
+    configured `jobs.max_age` (in hours) together with their result
+    files and uploaded files (`file` parameter)."""
+    max_age = datetime.timedelta(hours=int(settings.get("jobs.max_age", 24)))
+    limit = datetime.datetime.utcnow() - max_age
+    directory = get_job_directory(settings)
+    jobs = db.query(Job).filter(Job.status.in_([FINISHED, FAILED]),
+                                Job.finished < limit).all()
+    for job in jobs:
+        filenames = [job.result, job.get_params().get("file")]
+        for filename in filenames:
+            path = filename and os.path.join(directory, filename)
+            if path and os.path.exists(path):
+                os.remove(path)
+        db.delete(job)
+    db.commit()
+    return len(jobs)
+
+
+def reset_stale_jobs(db, settings):
+    """Queues all running jobs again which have been started more
+    than the configured `jobs.timeout` (in hours) ago. Those jobs are
+    left over by workers which have been stopped while running the job.
+    The status is changed with a conditional update so a job which has
+    been finished in the meantime is not reset.
+
+    :db: Non transactional db session
+    :settings: Application settings
+    :returns: Number of reset jobs
+    """
+    timeout = datetime.timedelta(hours=int(settings.get("jobs.timeout", 12)))
+    limit = datetime.datetime.utcnow() - timeout
+    count = db.query(Job)\
+        .filter(Job.status == RUNNING, Job.started < limit)\
+        .update({"status": QUEUED, "started": None, "progress": 0},
+                synchronize_session=False)
+    db.commit()
+    if count:
+        log.warning("Reset %s stale running jobs" % count)
+    return count
+
+
+def run_worker(registry, db, interval=2, once=False):
+    """Runs the queued jobs one after another. If there are no more
+    queued jobs the worker sleeps for `interval` seconds and looks
+    again. Stale running jobs are queued again and old jobs are purged
+    on start and once per hour.
+
+    :registry: Registry of the application
+    :db: Non transactional db session
+    :interval: Seconds to wait for new jobs
+    :once: If True the worker stops if there are no more queued jobs.
+    """
+    last_purge = 0
+    while True:
+        if time.time() - last_purge > 3600:
+            last_purge = time.time()
+            reset_stale_jobs(db, registry.settings)
+            purge_jobs(db, registry.settings)
+        job = claim_job(db)
+        if job is not None:
+            run_job(job, registry, db)
+            continue
+        if once:
+            break
+        time.sleep(interval)
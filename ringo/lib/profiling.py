@@ -0,0 +1,159 @@
+"""Modul to profile single requests of the running application. The
+profiling is disabled on default and can be enabled with a feature
+toggle in the configuration::
+
+    feature.profiling = true
+
+If enabled, a request is only profiled on demand. Either by an admin
+adding the `_profile` parameter to the URL, or by any client sending
+the configured secret in the `X-Ringo-Profile` header::
+
+    profiling.secret = <secret>
+
+Two profilers are available and configured with `profiling.mode`:
+
+ * *cprofile* (default): Deterministic profiling using
+   :mod:`cProfile`. The result is written as pstats file which can be
+   inspected with :mod:`pstats` or tools like snakeviz.
+ * *sampling*: A thread samples the stack of the request every
+   `profiling.interval` milliseconds (Default 5). The overhead is low
+   and independent from the number of function calls. The result is
+   written as collapsed stack file which can be converted into a
+   flamegraph with flamegraph.pl or speedscope.
+
+The results are written into `profiling.directory` (Defaults to a
+directory in the temp directory of the system). The name of the file
+is returned in the `X-Ringo-Profile` header of the response.
+"""
+import os
+import sys
+import time
+import uuid
+import hmac
+import logging
+import tempfile
+import threading
+import cProfile
+from ringo.lib.request.featuretoggle import FeatureToggle
+
+log = logging.getLogger(__name__)
+
+HEADER = "X-Ringo-Profile"
+PARAM = "_profile"
+
+
+def get_profile_directory(settings):
+    directory = settings.get("profiling.directory")
+    if not directory:
+        directory = os.path.join(tempfile.gettempdir(), "ringo-profiles")
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    return directory
+
+
+def is_requested(request, secret):
+    """Returns True if profiling is requested for the given request.
+    Profiling is requested if an admin adds the profiling parameter or
+    the secret is sent in the profiling header."""
+    header = request.headers.get(HEADER)
+    if header and secret:
+        return hmac.compare_digest(str(header), str(secret))
+    if PARAM in request.GET:
+        user = request.user
+        return user is not None and user.has_role("admin")
+    return False
+
+
+def get_filename(request, extension):
+    route = request.matched_route
+    name = route.name if route else "unknown"
+    return "%s-%s-%s.%s" % (time.strftime("%Y%m%d-%H%M%S"), name,
+                            uuid.uuid4().hex[:8], extension)
+
+
+def _get_frame_name(frame):
+    code = frame.f_code
+    return "%s:%s" % (os.path.basename(code.co_filename), code.co_name)
+
+
+def collapse_stack(frame):
+    """Returns the stack of the given frame in the collapsed format of
+    flamegraphs. Root first, names seperated by semicolons."""
+    names = []
+    while frame is not None:
+        names.append(_get_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+class Sampler(object):
+    """Samples the stack of the given thread in a seperate thread."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = collapse_stack(frame)
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.iteritems()):
+                f.write("%s %s\n" % (stack, count))
+
+
+def profile(request, handler, mode, directory, interval):
+    """Calls the handler for the request and profiles the call. The
+    result is written into a file in the given directory.
+
+    :returns: Tuple of the response and the name of the file
+    """
+    if mode == "sampling":
+        profiler = Sampler(threading.current_thread().ident, interval)
+        profiler.start()
+        try:
+            response = handler(request)
+        finally:
+            profiler.stop()
+        filename = get_filename(request, "collapsed")
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = handler(request)
+        finally:
+            profiler.disable()
+        filename = get_filename(request, "pstats")
+    path = os.path.join(directory, filename)
+    if mode == "sampling":
+        profiler.write(path)
+    else:
+        profiler.dump_stats(path)
+    log.info("Profile of %s %s written to %s"
+             % (request.method, request.path, path))
+    return response, filename
+
+
+def setup_profiling(config):
+    settings = config.registry.settings
+    if FeatureToggle(settings).profiling:
+        log.info("Setting up profiling of requests.")
+        config.add_tween('ringo.tweens.profiling.profiling_factory')
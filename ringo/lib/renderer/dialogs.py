@@ -224,6 +224,10 @@ class ImportDialogRenderer(DialogRenderer):
         values['overview_url'] = self._request.route_path(get_action_routename(self._item, 'list'))
         values['eval_url'] = self._request.application_url+get_eval_url()
         values['items'] = items
+        summary = {}
+        for item in items:
+            summary[item[1]] = summary.get(item[1], 0) + 1
+        values['summary'] = summary
         values['h'] = ringo.lib.helpers
         return literal(self.template.render(**values))
 
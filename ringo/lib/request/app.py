@@ -1,9 +1,9 @@
-from pyramid.events import NewRequest, ContextFound, NewResponse
+from pyramid.events import NewRequest, ContextFound
 from pyramid.decorator import reify
 
 from ringo.lib.request.featuretoggle import FeatureToggle
 from ringo.lib.request.params import Params, save_params_in_session
-from ringo.lib.history import History, handle_history
+from ringo.lib.history import History, get_ignore_matcher
 from ringo.lib.i18n import locale_negotiator
 
 
@@ -14,7 +14,8 @@ class RingoRequest(object):
 
     def __init__(self, request):
         self.request = request
-
+        self.history_loaded = None
+        self.history_pushed = None
 
     @reify
     def feature(self):
@@ -33,20 +34,28 @@ class RingoRequest(object):
 
     @reify
     def history(self):
-        """History of the last 5 requests."""
-        history = self.request.session.get('history')
-        if history is None:
-            history = History([])
-            history.push(self.request)
-            self.request.session['history'] = history
-            self.request.session.save()
+        """History of the last requests. The history is loaded from the
+        session on first access and the url of the current request is
+        added. The history is written back into the session at the end
+        of the request (see :func:`.handle_history`)."""
+        # Work on a copy. Changes are only written into the session if
+        # needed.
+        history = History([])
+        saved = self.request.session.get('history')
+        if saved is not None:
+            history.history = list(saved.history)
+        self.history_loaded = list(history.history)
+        history.push(self.request)
+        self.history_pushed = list(history.history)
         return history
 
 
 def includeme(config):
     config.add_subscriber(add_ringo_request, NewRequest)
     config.add_subscriber(save_params_in_session, ContextFound)
-    config.add_subscriber(handle_history, NewRequest, ignore_static_urls="")
+    config.registry.history_ignore_matcher = get_ignore_matcher(
+        config.registry.settings)
+    config.add_tween('ringo.tweens.history.history_factory')
 
 
 def add_ringo_request(event):
@@ -292,7 +292,9 @@ def get_permissions(modul, item=None):
         for smname in item._statemachines:
             sm = item.get_statemachine(smname)
             state = sm.get_state()
-            current_states.append(state)
+            current_states.append((sm.get_item_disabled_actions_matrix(),
+                                   state._id))
+    disabled_actions = {}
 
     # No need to call get_item_actions. We only need the modul actions
     # here as all other ActionItem added dynamically to the items clazz
@@ -300,7 +302,8 @@ def get_permissions(modul, item=None):
     # available base modul permissions (create, read, update, delete...)
     actions = modul.actions
     for action in actions:
-        permission = action.permission or action.name.lower()
+        action_name = action.name.lower()
+        permission = action.permission or action_name
         # TODO: Note that actions, which are not inserted into the
         # database (e.g custom mixin actions.) will not have any roles
         # and are not considerd on building principals yet. (ti)
@@ -311,10 +314,15 @@ def get_permissions(modul, item=None):
 
             # Check if the actions is available in the current state of
             # the item if the item has states.
-            for state in current_states:
-                if str(action.name.lower()) in state.get_disabled_actions(role.name):
+            if current_states:
+                if role.name not in disabled_actions:
+                    disabled = set()
+                    for matrix, state_id in current_states:
+                        disabled.update(matrix.get((state_id, role.name),
+                                                   ()))
+                    disabled_actions[role.name] = disabled
+                if action_name in disabled_actions[role.name]:
                     add_perm = False
-                    continue
 
             # administrational role means allow without further
             # ownership checks. If item is class than check is on modul
@@ -0,0 +1,124 @@
+"""Modul with the session factory of ringo. The session is a beaker
+session (see pyramid_beaker) which is only persisted at the end of the
+request if the data of the session has actually changed.
+
+Calling `request.session.save()` does not write the session
+immediately but only marks the session to be saved when the response
+is returned. Many views and subscribers call `save()` after setting
+values like the sorting or the history even if the values did not
+change. The session of ringo therefor takes a snapshot of the data
+when the session is loaded and only saves the whole session if the
+data differs from the snapshot at the end of the request. Session
+which are only read, or written with the same values are not
+rewritten.
+
+Beaker would additionally rewrite unchanged sessions on every request
+to update the access time of the session. The access time is needed
+to expire sessions with a `session.timeout`. Unchanged sessions are
+only rewritten if the stored access time is older than half of the
+timeout. Without timeout unchanged sessions are never rewritten.
+"""
+import time
+import logging
+import cPickle as pickle
+from pyramid_beaker import (
+    session_factory_from_settings,
+    set_cache_regions_from_settings
+)
+
+log = logging.getLogger(__name__)
+
+IGNORED_KEYS = ["_accessed_time"]
+"""Keys of the session which are not compared. The access time is
+updated by beaker on every request."""
+
+
+def _get_snapshot(session):
+    data = dict((k, v) for k, v in session.iteritems()
+                if k not in IGNORED_KEYS)
+    try:
+        return session.id, pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError):
+        # Can not compare data which can not be pickled. Always save.
+        return None
+
+
+def _get_session_settings(settings):
+    """Returns the settings for the session factory. Beaker does not
+    pass the `session.timeout` to the session stores. For the stores of
+    ringo (see :mod:`ringo.lib.sessionstore`) the timeout is therefor
+    passed as `session.purge_age` if no purge age is configured."""
+    settings = dict(settings)
+    if str(settings.get("session.type")).startswith("ringo_"):
+        timeout = settings.get("session.timeout")
+        if timeout and not settings.get("session.purge_age"):
+            settings["session.purge_age"] = timeout
+    return settings
+
+
+def get_session_factory(settings):
+    """Returns the session factory for the given settings. The factory
+    is a pyramid_beaker session factory with a session which is only
+    saved if its data has been changed."""
+    factory = session_factory_from_settings(_get_session_settings(settings))
+
+    class RingoSession(factory):
+
+        def _session(self):
+            loaded = self.__dict__['_sess'] is not None
+            session = factory._session(self)
+            if not loaded:
+                self.__dict__['_snapshot'] = _get_snapshot(session)
+            return session
+
+        def delete(self):
+            self.__dict__['_deleted'] = True
+            factory.delete(self)
+
+        def has_changed(self):
+            """Returns True if the data of the session has changed since
+            the session was loaded."""
+            if self.__dict__.get('_deleted'):
+                return True
+            if self.__dict__['_sess'] is None:
+                return False
+            snapshot = self.__dict__.get('_snapshot')
+            return snapshot is None or snapshot != _get_snapshot(self._sess)
+
+        def needs_access_update(self):
+            """Returns True if the stored access time of the session
+            must be refreshed to prevent the session from expiring. This
+            is the case if the access time is older than half of the
+            timeout of the session."""
+            session = self.__dict__['_sess']
+            timeout = getattr(session, 'timeout', None)
+            if session is None or not timeout:
+                return False
+            if not self.__dict__['_params'].get('save_accessed_time', True):
+                return False
+            last_accessed = getattr(session, 'last_accessed', None)
+            if last_accessed is None:
+                return True
+            return time.time() - last_accessed >= timeout / 2.0
+
+        def persist(self):
+            if self.has_changed():
+                factory.persist(self)
+            elif self.needs_access_update():
+                log.debug("Session not changed. Saving access time.")
+                # Not dirty. Beaker only saves the access time.
+                self.__dict__['_dirty'] = False
+                factory.persist(self)
+            else:
+                log.debug("Session not changed. Skipping save.")
+                self.__dict__['_dirty'] = False
+
+    return RingoSession
+
+
+def includeme(config):
+    """Sets the session factory and the cache regions from the settings
+    of the application. Replaces `config.include('pyramid_beaker')`."""
+    settings = config.registry.settings
+    config.set_session_factory(get_session_factory(settings))
+    set_cache_regions_from_settings(settings)
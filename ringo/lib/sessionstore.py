@@ -0,0 +1,360 @@
+"""Session stores for beaker provided by ringo. The stores are
+registered as beaker backends and can be used by setting the
+`session.type` in the configuration:
+
+ * *ringo_sql*: Stores the sessions in the `sessions` table of the
+   application database. The connections are taken from the connection
+   pool of the application. Sessions are written with a single upsert
+   statement and no file locking is needed. The store can be used by
+   several hosts sharing the same database.
+ * *ringo_memory*: Stores the sessions in a LRU cache in the memory of
+   the process. The number of sessions is limited by
+   `session.lru_size` (Default 10000). Only usable if the application
+   runs in a single process. If `session.write_behind` is true,
+   changed sessions are additionally written to the `sessions` table
+   in a background thread every `session.flush_interval` seconds
+   (Default 5). Sessions which are not in the cache are loaded from
+   the table. So sessions survive a restart of the application.
+
+The data of the sessions is pickled and compressed if larger than
+:data:`COMPRESS_THRESHOLD` bytes. Sessions which have not been written
+for longer than `session.purge_age` seconds are purged from the table
+from time to time. The purge age defaults to the `session.timeout` (see
+:func:`ringo.lib.session.get_session_factory`) or to one day if no
+timeout is configured.
+
+The namespace managers only implement the interface of beaker. Loading,
+storing and removing of the data is delegated to a store object
+(:class:`SQLStore` or :class:`MemoryStore`).
+"""
+import zlib
+import time
+import atexit
+import logging
+import datetime
+import threading
+import collections
+import cPickle as pickle
+import sqlalchemy as sa
+from beaker.container import NamespaceManager
+from beaker.synchronization import null_synchronizer
+from ringo.lib.sql.db import NTDBSession
+from ringo.model.session import SessionData
+
+try:
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+except ImportError:
+    pg_insert = None
+
+log = logging.getLogger(__name__)
+
+COMPRESS_THRESHOLD = 1024
+"""Serialized sessions larger than this number of bytes are
+compressed."""
+DEFAULT_MAX_AGE = 86400
+"""Seconds after which sessions are purged if no timeout is set."""
+PURGE_INTERVAL = 1000
+"""Number of writes after which old sessions are purged."""
+
+table = SessionData.__table__
+
+
+def dumps(data):
+    """Returns the serialized data. Large data is compressed."""
+    value = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    if len(value) > COMPRESS_THRESHOLD:
+        return "z" + zlib.compress(value)
+    return "p" + value
+
+
+def loads(value):
+    value = str(value)
+    if value[0] == "z":
+        return pickle.loads(zlib.decompress(value[1:]))
+    return pickle.loads(value[1:])
+
+
+def _get_engine():
+    # Use the bound engine directly. Calling get_bind() would mark the
+    # session as written and route its queries to the primary.
+    return NTDBSession.bind
+
+
+def load(id):
+    """Returns the serialized data of the session with the given id or
+    None."""
+    with _get_engine().connect() as conn:
+        return conn.execute(sa.select([table.c.data])
+                            .where(table.c.id == id)).scalar()
+
+
+def store(id, value, max_age=DEFAULT_MAX_AGE):
+    """Stores the serialized data of the session with the given id."""
+    values = {"id": id,
+              "data": value,
+              "updated": datetime.datetime.utcnow()}
+    with _get_engine().begin() as conn:
+        dialect = conn.dialect.name
+        if dialect == "postgresql" and pg_insert is not None:
+            stmt = pg_insert(table).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={"data": stmt.excluded.data,
+                      "updated": stmt.excluded.updated})
+            conn.execute(stmt)
+        elif dialect == "sqlite":
+            conn.execute(table.insert().prefix_with("OR REPLACE"), values)
+        else:
+            result = conn.execute(table.update()
+                                  .where(table.c.id == id)
+                                  .values(data=value,
+                                          updated=values["updated"]))
+            if result.rowcount == 0:
+                conn.execute(table.insert(), values)
+    _purge_from_time_to_time(max_age)
+
+
+def delete(id):
+    with _get_engine().begin() as conn:
+        conn.execute(table.delete().where(table.c.id == id))
+
+
+def purge(max_age=DEFAULT_MAX_AGE):
+    """Deletes all sessions which have not been written for the given
+    number of seconds.
+
+    :returns: Number of deleted sessions
+    """
+    limit = datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age)
+    with _get_engine().begin() as conn:
+        result = conn.execute(table.delete().where(table.c.updated < limit))
+    log.debug("Purged %s sessions" % result.rowcount)
+    return result.rowcount
+
+
+_writes = [0]
+_writes_lock = threading.Lock()
+
+
+def _purge_from_time_to_time(max_age):
+    with _writes_lock:
+        _writes[0] += 1
+        if _writes[0] < PURGE_INTERVAL:
+            return
+        _writes[0] = 0
+    purge(max_age)
+
+
+def _get_purge_age(purge_age):
+    if purge_age:
+        return int(purge_age)
+    return DEFAULT_MAX_AGE
+
+
+class SQLStore(object):
+    """Stores the serialized sessions in the `sessions` table."""
+
+    def __init__(self, purge_age=DEFAULT_MAX_AGE):
+        self.purge_age = purge_age
+
+    def load(self, id):
+        return load(id)
+
+    def store(self, id, value):
+        store(id, value, self.purge_age)
+
+    def remove(self, id):
+        delete(id)
+
+
+class LRUCache(object):
+    """Thread safe LRU cache with a limited number of items."""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.pop(key, None)
+            if value is not None:
+                self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class WriteBehind(object):
+    """Writes changed sessions to the database in a background
+    thread. Pending sessions are written on exit of the process too."""
+
+    def __init__(self, interval, max_age):
+        self.interval = interval
+        self.max_age = max_age
+        self._pending = {}
+        """Pending writes. None as value means delete."""
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def get(self, key):
+        """Returns a tuple of a flag if a write of the key is pending
+        and the pending value."""
+        with self._lock:
+            if key in self._pending:
+                return True, self._pending[key]
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for key, value in pending.iteritems():
+            try:
+                if value is None:
+                    delete(key)
+                else:
+                    store(key, value, self.max_age)
+            except Exception:
+                log.exception("Writing session %s failed" % key)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+class MemoryStore(object):
+    """Stores the serialized sessions in a LRU cache and optionally
+    writes them behind to the `sessions` table."""
+
+    def __init__(self, cache, write_behind=None):
+        self.cache = cache
+        self.write_behind = write_behind
+
+    def load(self, id):
+        value = self.cache.get(id)
+        if value is None and self.write_behind is not None:
+            pending, value = self.write_behind.get(id)
+            if not pending:
+                value = load(id)
+            if value is not None:
+                self.cache.set(id, value)
+        return value
+
+    def store(self, id, value):
+        self.cache.set(id, value)
+        if self.write_behind is not None:
+            self.write_behind.set(id, value)
+
+    def remove(self, id):
+        self.cache.delete(id)
+        if self.write_behind is not None:
+            self.write_behind.set(id, None)
+
+
+_memory_stores = {}
+_memory_stores_lock = threading.Lock()
+
+
+def get_memory_store(lru_size, write_behind, flush_interval, purge_age):
+    """Returns the memory store for the given configuration. The store
+    is shared by all sessions of the process using the same
+    configuration."""
+    write_behind = str(write_behind).lower() == "true"
+    key = (int(lru_size), write_behind, float(flush_interval), purge_age)
+    with _memory_stores_lock:
+        if key not in _memory_stores:
+            writer = None
+            if write_behind:
+                writer = WriteBehind(key[2], purge_age)
+            _memory_stores[key] = MemoryStore(LRUCache(key[0]), writer)
+        return _memory_stores[key]
+
+
+class _StoreNamespaceManager(NamespaceManager):
+    """Base for the namespace managers of the session stores. The data
+    of a namespace (the session) is loaded from the given store on first
+    access and written to the store when the write lock is released."""
+
+    def __init__(self, namespace, store):
+        NamespaceManager.__init__(self, namespace)
+        self.store = store
+        self._data = None
+        self._changed = False
+
+    @property
+    def data(self):
+        if self._data is None:
+            value = self.store.load(self.namespace)
+            self._data = loads(value) if value is not None else {}
+        return self._data
+
+    def get_creation_lock(self, key):
+        return null_synchronizer()
+
+    def acquire_write_lock(self, wait=True, replace=False):
+        if replace:
+            self._data = {}
+        return True
+
+    def release_write_lock(self):
+        if self._changed:
+            self.store.store(self.namespace, dumps(self._data))
+            self._changed = False
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self._changed = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self._changed = True
+
+    def keys(self):
+        return self.data.keys()
+
+    def do_remove(self):
+        self._data = {}
+        self._changed = False
+        self.store.remove(self.namespace)
+
+
+class SQLNamespaceManager(_StoreNamespaceManager):
+    """Namespace manager storing the sessions in the database."""
+
+    def __init__(self, namespace, purge_age=None, **kwargs):
+        _StoreNamespaceManager.__init__(
+            self, namespace, SQLStore(_get_purge_age(purge_age)))
+
+
+class MemoryNamespaceManager(_StoreNamespaceManager):
+    """Namespace manager storing the sessions in a LRU cache in memory
+    and optionally in the database."""
+
+    def __init__(self, namespace, lru_size=10000, write_behind=False,
+                 flush_interval=5, purge_age=None, **kwargs):
+        store = get_memory_store(lru_size, write_behind, flush_interval,
+                                 _get_purge_age(purge_age))
+        _StoreNamespaceManager.__init__(self, namespace, store)
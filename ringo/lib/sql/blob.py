@@ -0,0 +1,259 @@
+"""Modul with helpers to store the data of :class:`.Blob` items in a
+JSON capable column and to query single fields within this data
+directly in the database.
+
+On default the data of blobform items is stored as a JSON string in a
+simple text column. Setting the following configuration option will
+store the data in a JSONB column if the application runs on a
+PostgreSQL database::
+
+    db.blob.jsonb = true
+
+In all other cases (e.g SQLite) the data is still stored in a text
+column. Single fields in the data can be accessed using the JSON
+functions of the database in both cases (JSON1 extension in SQLite).
+"""
+import re
+import json
+import operator
+import sqlalchemy as sa
+from sqlalchemy.types import TypeDecorator, Text
+from sqlalchemy.dialects import postgresql, sqlite
+
+_use_jsonb = False
+"""Flag to indicate if the blob data should be stored in a JSONB
+column. Set on application startup based on the `db.blob.jsonb`
+setting."""
+
+valid_fieldname = re.compile("^\w+$")
+
+sql_opmapping = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "!=": operator.ne,
+    "==": operator.eq
+}
+"""Mapping of the search operators supported in the
+:func:`.BaseList.filter` method which can be translated into SQL."""
+
+
+def setup_blob_storage(settings):
+    """Will configure how the data of blob items is stored based on the
+    given settings."""
+    global _use_jsonb
+    _use_jsonb = settings.get("db.blob.jsonb") == "true"
+
+
+def _is_jsonb(dialect):
+    return _use_jsonb and dialect.name == "postgresql"
+
+
+class JSONData(TypeDecorator):
+    """Type for the data field of blob items. The value of the field is
+    always a JSON string on python side. Depending on the configuration
+    and the database the value is stored as JSONB or as text."""
+
+    impl = Text
+
+    def load_dialect_impl(self, dialect):
+        if _is_jsonb(dialect):
+            return dialect.type_descriptor(postgresql.JSONB())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        if _is_jsonb(dialect):
+            # The JSONB type will serialize the value on its own.
+            if isinstance(value, basestring):
+                value = json.loads(value)
+        elif not isinstance(value, basestring):
+            value = json.dumps(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and not isinstance(value, basestring):
+            value = json.dumps(value)
+        return value
+
+
+def is_blob_field(clazz, field):
+    """Returns True if the given field is not a field of the clazz
+    but a field which is stored in the data of a blob item."""
+    from ringo.model.mixins import Blob
+    return (issubclass(clazz, Blob)
+            and valid_fieldname.match(field) is not None
+            and not hasattr(clazz, field))
+
+
+def _get_field_expression(data, field, dialect_name):
+    if not valid_fieldname.match(field):
+        return None
+    # Fieldnames are inlined as literals to make the expression
+    # match the expression indexes created with the `ringo-admin db
+    # blobindex` command.
+    if dialect_name == "postgresql":
+        path = sa.literal_column("'%s'" % field)
+        return sa.cast(data, postgresql.JSONB).op("->>")(path)
+    elif dialect_name == "sqlite":
+        path = sa.literal_column("'$.%s'" % field)
+        return sa.func.json_extract(data, path)
+    return None
+
+
+def _get_type_expression(data, field, dialect_name):
+    if not valid_fieldname.match(field):
+        return None
+    if dialect_name == "postgresql":
+        path = sa.literal_column("'%s'" % field)
+        return sa.func.jsonb_typeof(sa.cast(data, postgresql.JSONB)
+                                    .op("->")(path))
+    elif dialect_name == "sqlite":
+        path = sa.literal_column("'$.%s'" % field)
+        return sa.func.json_type(data, path)
+    return None
+
+
+def _get_text_expression(data, field, dialect_name):
+    expr = _get_field_expression(data, field, dialect_name)
+    if expr is None:
+        return None
+    vtype = _get_type_expression(data, field, dialect_name)
+    true = sa.literal_column("'True'")
+    false = sa.literal_column("'False'")
+    if dialect_name == "postgresql":
+        boolean = sa.case([(expr == sa.literal_column("'true'"), true)],
+                          else_=false)
+        return sa.case([(vtype == sa.literal_column("'boolean'"), boolean)],
+                       else_=expr)
+    return sa.case([(vtype == sa.literal_column("'true'"), true),
+                    (vtype == sa.literal_column("'false'"), false)],
+                   else_=sa.cast(expr, Text))
+
+
+def get_blob_field_expression(clazz, field, dialect_name):
+    """Returns a SQL expression to access the value of the given field
+    within the data of a blob item. Returns None if the database does
+    not support accessing JSON values.
+
+    :clazz: Clazz of the blob items
+    :field: Name of the field in the data of the blob item
+    :dialect_name: Name of the SQL dialect (postgresql, sqlite)
+    :returns: SQL expression or None
+    """
+    return _get_field_expression(clazz.data, field, dialect_name)
+
+
+def get_blob_text_expression(clazz, field, dialect_name):
+    """Returns a SQL expression to access the value of the given field
+    within the data of a blob item as text. The text is the same as
+    the unicode representation of the value in python which is used in
+    the :func:`.BaseList.filter` method. So numbers are converted into
+    text and booleans are "True" and "False". null values and missing
+    fields are NULL. Returns None if the database does not support
+    accessing JSON values.
+
+    :clazz: Clazz of the blob items
+    :field: Name of the field in the data of the blob item
+    :dialect_name: Name of the SQL dialect (postgresql, sqlite)
+    :returns: SQL expression or None
+    """
+    return _get_text_expression(clazz.data, field, dialect_name)
+
+
+def has_blob_container_values(db, clazz, field, dialect_name):
+    """Returns True if the given field contains lists or objects in the
+    data of any blob item. Those values are not comparable in SQL in
+    the same way as in the application.
+
+    :db: DB session
+    :clazz: Clazz of the blob items
+    :field: Name of the field in the data of the blob item
+    :dialect_name: Name of the SQL dialect (postgresql, sqlite)
+    :returns: True or False
+    """
+    vtype = _get_type_expression(clazz.data, field, dialect_name)
+    if vtype is None:
+        return False
+    query = db.query(clazz.id).filter(vtype.in_(["array", "object"]))
+    return db.query(query.exists()).scalar()
+
+
+def get_blob_search_expression(clazz, field, search, regexpr,
+                               dialect_name):
+    """Returns a SQL expression for a filter on the given field of a
+    blob item. The search supports the same operators as the
+    :func:`.BaseList.filter` method except the fuzzy search. Like in
+    this method the values are compared as text. null values and
+    missing fields are "None" for operators and an empty string
+    otherwise. Returns None if the search can not be translated into
+    SQL.
+
+    :clazz: Clazz of the blob items
+    :field: Name of the field in the data of the blob item
+    :search: Search expression
+    :regexpr: Flag if the search is a regular expression
+    :dialect_name: Name of the SQL dialect (postgresql, sqlite)
+    :returns: SQL expression or None
+    """
+    expr = get_blob_text_expression(clazz, field, dialect_name)
+    if expr is None:
+        return None
+    x = search.split(" ")
+    if x[0] in sql_opmapping:
+        search = " ".join(x[1:])
+        condition = sql_opmapping[x[0]](expr, search)
+        # Missing values are compared as "None" in the application.
+        matches_null = sql_opmapping[x[0]](u"None", search)
+    elif x[0] == "~":
+        return None
+    elif regexpr:
+        if dialect_name != "postgresql":
+            return None
+        condition = expr.op("~*")(search)
+        matches_null = re.search(search, u"", re.IGNORECASE) is not None
+    else:
+        condition = expr.ilike(u"%%%s%%" % escape_like(search),
+                               escape="\\")
+        matches_null = search == ""
+    if matches_null:
+        return sa.or_(condition, expr.is_(None))
+    return condition
+
+
+def escape_like(value, escape="\\"):
+    """Returns the given value with the wildcards of a LIKE expression
+    escaped by the given escape character."""
+    return value.replace(escape, escape + escape)\
+                .replace("%", escape + "%")\
+                .replace("_", escape + "_")
+
+
+def get_blob_index_statements(tablename, field, dialect_name):
+    """Returns SQL statements to create expression indexes on the given
+    field in the data of the blob items stored in `tablename`. One
+    index is created on the value which is used for sorting and one on
+    the text of the value which is used for searching.
+
+    :tablename: Name of the table of the blob items
+    :field: Name of the field in the data of the blob item
+    :dialect_name: Name of the SQL dialect (postgresql, sqlite)
+    :returns: List of SQL statements or None
+    """
+    data = sa.column("data")
+    indexes = [("data", _get_field_expression(data, field, dialect_name)),
+               ("text", _get_text_expression(data, field, dialect_name))]
+    if indexes[0][1] is None:
+        return None
+    if dialect_name == "postgresql":
+        dialect = postgresql.dialect()
+    else:
+        dialect = sqlite.dialect()
+    statements = []
+    for kind, expr in indexes:
+        name = "ix_%s_%s_%s" % (tablename, kind, field)
+        statements.append("CREATE INDEX IF NOT EXISTS %s ON %s ((%s));"
+                          % (name, tablename, expr.compile(dialect=dialect)))
+    return statements
@@ -0,0 +1,74 @@
+"""Modul with helpers to delete many items with set based SQL
+statements instead of handling every single item in the ORM.
+
+Set based statements bypass the session of the ORM. So they can only
+be used if nothing needs to be done per item: No callbacks, no cascades
+on relations, no mapper events and no inheritance. Use
+:func:`can_bulk_delete` to check this and handle the items in the ORM
+if needed."""
+import logging
+import sqlalchemy as sa
+from sqlalchemy.orm.interfaces import ONETOMANY
+
+log = logging.getLogger(__name__)
+
+CHUNKSIZE = 500
+"""Number of ids in a single IN clause of the set based statements.
+Keeps the number of bound parameters below the limits of the
+databases."""
+
+
+def _chunks(ids, size=CHUNKSIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def can_bulk_delete(clazz):
+    """Returns True if items of the given clazz can be deleted with a
+    set based DELETE statement. This is not possible if the mapper of
+    the clazz has relations with secondary tables, cascading deletes or
+    dependent items (which would be unlinked by the ORM) or if
+    listeners for the delete events are registered as these things are
+    only handled by the ORM. Items of classes which are part of an
+    inheritance hierarchy may be stored in more than one table (joined
+    table inheritance) and are only deleted completely by the ORM as
+    well.
+
+    :clazz: Class of the items
+    :returns: True or False
+    """
+    mapper = sa.inspect(clazz)
+    if mapper.inherits is not None or mapper.polymorphic_on is not None:
+        return False
+    if mapper.dispatch.before_delete or mapper.dispatch.after_delete:
+        return False
+    for relation in mapper.relationships:
+        if relation.secondary is not None or relation.cascade.delete:
+            return False
+        if (relation.direction is ONETOMANY
+           and not relation.passive_deletes):
+            return False
+    return True
+
+
+def bulk_delete(db, clazz, items):
+    """Deletes the given items with set based DELETE statements. The
+    items are removed from the session afterwards. Please make sure
+    that :func:`can_bulk_delete` is true for the clazz.
+
+    :db: Current db session
+    :clazz: Class of the items
+    :items: List of items to delete
+    :returns: Number of deleted items
+    """
+    ids = [item.id for item in items]
+    count = 0
+    for chunk in _chunks(ids):
+        count += db.query(clazz).filter(clazz.id.in_(chunk))\
+            .delete(synchronize_session=False)
+    for item in items:
+        if item in db:
+            db.expunge(item)
+    log.debug("Deleted %s items of %s in bulk" % (count, clazz))
+    return count
+
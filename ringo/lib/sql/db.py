@@ -1,19 +1,111 @@
 import sys
 import os
+import time
+import random
 import logging
+import functools
+import contextlib
 import query
+import sqlalchemy
 from zope.sqlalchemy import ZopeTransactionExtension
 from pyramid.events import NewRequest
 from sqlalchemy import engine_from_config
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.sql.expression import Select
 from sqlalchemy import exc
 from sqlalchemy import event
-from sqlalchemy.pool import Pool, StaticPool
+from sqlalchemy.pool import StaticPool
 
 from ringo.lib.sql.cache import regions, init_cache
+from ringo.lib.sql.blob import setup_blob_storage
 
 log = logging.getLogger(__name__)
 
+replicas = []
+"""Engines of the configured read replicas. See
+:func:`setup_db_session`."""
+
+
+class RoutingSession(Session):
+    """Session which sends read only work to a read replica if
+    replicas are configured. Work is read only if done within
+    :func:`use_replica`. Only SELECT statements are sent to the replica.
+    Once the session has written anything (flushes, bulk operations and
+    all other statements which are not a SELECT), all following
+    statements go to the primary database until the session is closed.
+    So changes of the current request are always visible. The replica
+    is chosen randomly per session."""
+
+    def __init__(self, **kwargs):
+        Session.__init__(self, **kwargs)
+        self._read_only = 0
+        self._written = False
+        self._replica = None
+        self._write_callbacks = []
+
+    def on_write(self, callback):
+        """Registers a callback which is called without arguments when
+        the session writes for the first time and replicas are
+        configured. Use it to invalidate results which have been read
+        from the replica. Callbacks are removed when the session is
+        closed."""
+        self._write_callbacks.append(callback)
+
+    def _set_written(self):
+        if self._written:
+            return
+        self._written = True
+        if replicas:
+            for callback in self._write_callbacks:
+                callback()
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not isinstance(clause, Select):
+            # Flushes and bulk operations get the bind without a clause.
+            self._set_written()
+        elif self._read_only and replicas and not self._written:
+            if self._replica is None:
+                self._replica = random.choice(replicas)
+            return self._replica
+        return Session.get_bind(self, mapper, clause, **kwargs)
+
+    def close(self):
+        Session.close(self)
+        self._written = False
+        self._replica = None
+        self._write_callbacks = []
+
+
+@contextlib.contextmanager
+def use_replica(db):
+    """Context manager to send the queries of the given session to a
+    read replica. Does nothing if the session is not a
+    :class:`RoutingSession` or no replicas are configured::
+
+        with use_replica(request.db):
+            items = request.db.query(clazz).all()
+    """
+    if not isinstance(db, RoutingSession):
+        yield db
+        return
+    db._read_only += 1
+    try:
+        yield db
+    finally:
+        db._read_only -= 1
+
+
+def reads_from_replica(func):
+    """Decorator for functions taking the request as first argument.
+    The queries of the request within the function are sent to a read
+    replica (see :func:`use_replica`)."""
+    @functools.wraps(func)
+    def wrapper(request, *args, **kwargs):
+        with use_replica(getattr(request, "db", None)):
+            return func(request, *args, **kwargs)
+    return wrapper
+
+
 # Session initialisation
 ########################
 # scoped_session.  Apply our custom CachingQuery class to it,
@@ -21,41 +113,118 @@ log = logging.getLogger(__name__)
 # of regions with the Query.
 DBSession = scoped_session(
                 sessionmaker(
+                    class_=RoutingSession,
                     query_cls=query.query_callable(regions),
                 )
             )
 
 NTDBSession = scoped_session(
                 sessionmaker(
+                    class_=RoutingSession,
                     query_cls=query.query_callable(regions)
                 )
             )
 testsession = None
 
 
-# Pessimisitic detection of disconnects of connections in the connection pool
-# (E.g the database server restarts because of maintenance. Per checkout
-# of a connection from the pool we will do a extra SQL-Query. In case
-# this fails because of the disconnection the connection pool will be
-# invalidated and the connections will be reestablished. See
-# http://docs.sqlalchemy.org/en/latest/core/pooling.html#disconnect-handling-pessimistic
+# Detection of disconnects of connections in the connection pool (E.g
+# the database server restarts because of maintenance). The strategy is
+# configured with `db.disconnect_handling`. See
+# http://docs.sqlalchemy.org/en/latest/core/pooling.html#disconnect-handling
 # for for details.
-@event.listens_for(Pool, "checkout")
-def ping_connection(dbapi_connection, connection_record, connection_proxy):
-    cursor = dbapi_connection.cursor()
-    try:
-        cursor.execute("SELECT 1")
-    except:
-        log.info("Possible DB disconnect detected! "
-                 "Reestablishing the connection to the DB.")
-        # optional - dispose the whole pool
-        # instead of invalidating one at a time
-        connection_proxy._pool.dispose()
+DISCONNECT_HANDLINGS = ["ping", "pre_ping", "optimistic", "none"]
+LAST_PING = "ringo_last_ping"
+"""Key in the info of the connection record with the time of the last
+successful ping."""
+
+
+def _set_last_ping(dbapi_connection, connection_record):
+    connection_record.info[LAST_PING] = time.time()
 
-        # raise DisconnectionError - pool will try
-        # connecting again up to three times before raising.
-        raise exc.DisconnectionError()
-    cursor.close()
+
+def get_ping_connection(interval):
+    """Returns a listener for the checkout event of the pool which
+    pings the connection with an extra SQL-Query. The ping is done at
+    most every `interval` seconds per connection. In case the ping
+    fails because of a disconnection the connection pool will be
+    invalidated and the connections will be reestablished."""
+
+    def ping_connection(dbapi_connection, connection_record,
+                        connection_proxy):
+        last_ping = connection_record.info.get(LAST_PING)
+        if last_ping is not None and time.time() - last_ping < interval:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except:
+            log.info("Possible DB disconnect detected! "
+                     "Reestablishing the connection to the DB.")
+            # optional - dispose the whole pool
+            # instead of invalidating one at a time
+            connection_proxy._pool.dispose()
+
+            # raise DisconnectionError - pool will try
+            # connecting again up to three times before raising.
+            raise exc.DisconnectionError()
+        cursor.close()
+        _set_last_ping(dbapi_connection, connection_record)
+    return ping_connection
+
+
+def handle_disconnect(context):
+    """Listener for the handle_error event of the engine. SQLAlchemy
+    invalidates the connection pool on disconnect errors, so the
+    following requests will use new connections. The request causing
+    the error fails."""
+    if context.is_disconnect:
+        log.info("DB disconnect detected! "
+                 "Reestablishing the connections to the DB.")
+
+
+def _supports_pre_ping():
+    version = tuple(int(x) for x in sqlalchemy.__version__.split(".")[:2])
+    return version >= (1, 2)
+
+
+def get_disconnect_handling(settings):
+    """Returns the configured strategy for the disconnect handling.
+    Pool pre ping falls back to ping if not supported by the installed
+    version of SQLAlchemy."""
+    handling = settings.get("db.disconnect_handling", "ping")
+    if handling not in DISCONNECT_HANDLINGS:
+        raise ValueError("Unknown db.disconnect_handling '%s'. "
+                         "Must be one of %s" % (handling,
+                                                DISCONNECT_HANDLINGS))
+    if handling == "pre_ping" and not _supports_pre_ping():
+        log.warning("Pool pre ping needs SQLAlchemy >= 1.2. "
+                    "Falling back to ping.")
+        handling = "ping"
+    return handling
+
+
+def setup_disconnect_handling(engine, settings):
+    """Sets up the configured disconnect handling on the given engine.
+
+     * *ping* (Default): Pessimistic ping of the connection on checkout
+       from the pool, but at most every `db.ping_interval` seconds per
+       connection (Default 30). A interval of 0 pings on every checkout.
+     * *pre_ping*: Pessimistic ping using the pre ping of the pool of
+       SQLAlchemy. Must be set when creating the engine.
+     * *optimistic*: No ping. Disconnects are detected when using the
+       connection. The pool is invalidated and the current request
+       fails.
+     * *none*: No disconnect handling at all.
+    """
+    handling = get_disconnect_handling(settings)
+    if handling == "ping":
+        interval = float(settings.get("db.ping_interval", 30))
+        event.listen(engine.pool, "connect", _set_last_ping)
+        event.listen(engine.pool, "checkout", get_ping_connection(interval))
+    elif handling == "optimistic":
+        event.listen(engine, "handle_error", handle_disconnect)
+    log.info("Using '%s' disconnect handling for the DB" % handling)
+    return engine
 
 
 def setup_db_engine(settings):
@@ -71,11 +240,30 @@ def setup_db_engine(settings):
         regions.append(region.split(":"))
     if cachedir:
         init_cache(cachedir, regions)
+    setup_blob_storage(settings)
+    return create_engine(settings)
+
+
+def create_engine(settings, url=None):
+    """Returns a new engine configured by the `sqlalchemy.` options of
+    the settings. The url of the database can optionally be overwritten
+    by the given url, which is used for the engines of the replicas."""
+    if url:
+        settings = dict(settings)
+        settings['sqlalchemy.url'] = url
+    kwargs = {}
     if settings.get("app.mode") == "testing":
-        return engine_from_config(settings, 'sqlalchemy.',
-                                  poolclass=StaticPool)
-    else:
-        return engine_from_config(settings, 'sqlalchemy.')
+        kwargs["poolclass"] = StaticPool
+    if get_disconnect_handling(settings) == "pre_ping":
+        kwargs["pool_pre_ping"] = True
+    engine = engine_from_config(settings, 'sqlalchemy.', **kwargs)
+    return setup_disconnect_handling(engine, settings)
+
+
+def get_replica_urls(settings):
+    """Returns the list of urls of the read replicas configured in
+    `db.replicas` (separated by whitespace or commas)."""
+    return settings.get("db.replicas", "").replace(",", " ").split()
 
 
 def setup_db_session(engine, settings=None):
@@ -83,6 +271,10 @@ def setup_db_session(engine, settings=None):
     # autocommits after each request.
     if not settings:
         settings = {}
+    replicas[:] = [create_engine(settings, url)
+                   for url in get_replica_urls(settings)]
+    if replicas:
+        log.info("Sending read only queries to %s replicas" % len(replicas))
     if settings.get("app.mode") == "testing":
         DBSession.configure(bind=engine)
     else:
@@ -24,6 +24,7 @@ from sqlalchemy.orm.interfaces import MapperOption
 from sqlalchemy.orm.query import Query
 from sqlalchemy.sql import visitors
 from dogpile.cache.api import NO_VALUE
+from ringo.lib.instrumentation import record_cache_access
 
 class CachingQuery(Query):
     """A Query subclass which optionally loads full results from a dogpile
@@ -61,7 +62,14 @@ class CachingQuery(Query):
 
         """
         if hasattr(self, '_cache_region'):
-            return self.get_value(createfunc=lambda: list(Query.__iter__(self)))
+            created = []
+
+            def createfunc():
+                created.append(True)
+                return list(Query.__iter__(self))
+            value = self.get_value(createfunc=createfunc)
+            record_cache_access(not created)
+            return value
         else:
             return Query.__iter__(self)
 
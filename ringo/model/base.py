@@ -26,6 +26,7 @@ from ringo.lib.cache import CACHE_MODULES
 from ringo.lib.form import get_form_config
 from ringo.lib.table import get_table_config
 from ringo.lib.sql import DBSession
+from ringo.lib.sql.db import reads_from_replica
 from ringo.lib.sql.cache import regions
 from ringo.lib.sql.query import FromCache, set_relation_caching
 from ringo.lib.alchemy import get_columns_from_instance
@@ -558,6 +559,7 @@ class BaseItem(object):
 ########################################################################
 
 
+@reads_from_replica
 def get_item_list(request, clazz, user=None, cache="", items=None):
     """Returns a :class:`.BaseList` instance with items of the given
     clazz. You can optionally provide a user object. If provided the
@@ -16,6 +16,8 @@ form can not be changed."""
 
 class ReviewStatemachine(Statemachine):
 
+    shared = True
+
     def setup(self):
         s1 = State(self, 1, "Draft", description=d1)
         s2 = State(self, 2, "Published", description=d2)
@@ -0,0 +1,67 @@
+import json
+import logging
+import sqlalchemy as sa
+from datetime import datetime
+from ringo.model import Base
+
+log = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+
+
+class Job(Base):
+    """A job is a long running task like an export or import of many
+    items which is not done within the request but in a separate worker
+    process. Jobs are stored in the database. The worker picks up the
+    queued jobs one by one and updates the status and progress of the
+    job while running it. The result of a job is written into a file
+    which can be downloaded when the job is finished. See
+    :mod:`ringo.lib.jobs` for more details."""
+    __tablename__ = "jobs"
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String, nullable=False)
+    """Name of the registered job handler which runs the job"""
+    status = sa.Column(sa.String, nullable=False, default=QUEUED)
+    progress = sa.Column(sa.Integer, nullable=False, default=0)
+    """Number of already processed items"""
+    total = sa.Column(sa.Integer)
+    """Total number of items to process if known"""
+    message = sa.Column(sa.Text)
+    params = sa.Column(sa.Text, nullable=False, default="{}")
+    """Parameters of the job as JSON string"""
+    result = sa.Column(sa.String)
+    """Name of the result file in the job directory"""
+    result_name = sa.Column(sa.String)
+    """Filename of the result offered on download"""
+    result_type = sa.Column(sa.String)
+    uid = sa.Column(sa.Integer, sa.ForeignKey("users.id"))
+    user = sa.orm.relationship("User")
+    created = sa.Column(sa.DateTime, default=datetime.utcnow)
+    started = sa.Column(sa.DateTime)
+    finished = sa.Column(sa.DateTime)
+
+    __table_args__ = (sa.Index("ix_jobs_status", "status"),)
+
+    def get_params(self):
+        return json.loads(self.params)
+
+    def set_params(self, params):
+        self.params = json.dumps(params)
+
+    def get_status(self):
+        """Returns a dictionary with the current status of the job. The
+        dictionary is used as response of the REST status endpoint."""
+        return {"id": self.id,
+                "name": self.name,
+                "status": self.status,
+                "progress": self.progress,
+                "total": self.total,
+                "message": self.message,
+                "result": self.result is not None,
+                "created": self.created and self.created.isoformat(),
+                "started": self.started and self.started.isoformat(),
+                "finished": self.finished and self.finished.isoformat()}
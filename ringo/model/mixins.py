@@ -29,9 +29,11 @@ comments).
     As most of the mixins will add additional tables and database fields
     to your item it is needed to migrate your database to the new model.
 """
+import base64
 import datetime
 import json
 import logging
+import zlib
 from sqlalchemy.ext.declarative import declared_attr
 
 from sqlalchemy import (
@@ -39,18 +41,26 @@ from sqlalchemy import (
     Text,
     String,
     Integer,
+    Boolean,
     DateTime,
     ForeignKey,
-    Table
+    Table,
+    Index,
+    select,
+    literal,
+    func,
+    or_
 )
 
 from sqlalchemy.orm import (
     relationship,
-    backref
+    backref,
+    object_session
 )
 
 from ringo.model import Base
 from ringo.lib.helpers import get_raw_value
+from ringo.lib.sql.blob import JSONData
 from ringo.lib.alchemy import get_columns_from_instance
 
 log = logging.getLogger(__name__)
@@ -165,8 +175,11 @@ class Meta(object):
 class Blob(object):
     """Mixin to add a data fields to store form data as JSON in a single
     field. The mixin will overwrite the way how to get the form
-    definiton and how to get values from the item."""
-    data = Column(Text, default="{}")
+    definiton and how to get values from the item.
+
+    The data is stored as text or as JSONB depending on the
+    configuration. See :mod:`ringo.lib.sql.blob` for more details."""
+    data = Column(JSONData, default="{}")
 
     def __getattr__(self, name):
         """This function tries to get the given attribute of the item if
@@ -221,6 +234,68 @@ class Version(Base):
     values = Column(Text, nullable=False)
     author = Column(String, nullable=False)
     date = Column(DateTime, nullable=False)
+    snapshot = Column(Boolean, nullable=False, default=True,
+                      server_default="1")
+    """Flag if the version contains all values of the item (snapshot)
+    or only the compressed changes to the previous version."""
+
+    def get_values(self):
+        """Returns the dictionary of values stored in this version. In
+        case of a snapshot this are all values of the item, otherwise
+        only the values which has been changed compared to the previous
+        version."""
+        return self._load()["values"]
+
+    def get_deleted(self):
+        """Returns the list of keys which has been removed compared to
+        the previous version. Snapshots do not have deleted keys."""
+        return self._load().get("deleted", [])
+
+    def set_values(self, values, snapshot=True, deleted=None):
+        """Stores the given dictionary of values in this version. If
+        `snapshot` is False the values are stored compressed together
+        with the list of `deleted` keys."""
+        self.snapshot = snapshot
+        if snapshot:
+            self.values = json.dumps(values)
+        else:
+            delta = {"values": values, "deleted": list(deleted or [])}
+            self.values = base64.b64encode(zlib.compress(json.dumps(delta)))
+
+    def apply(self, values):
+        """Applies this version on the given dictionary of values of the
+        previous version. A snapshot replaces all values."""
+        if self.snapshot:
+            values.clear()
+        values.update(self.get_values())
+        for key in self.get_deleted():
+            values.pop(key, None)
+        return values
+
+    def _load(self):
+        if self.snapshot:
+            return {"values": json.loads(self.values)}
+        return json.loads(zlib.decompress(base64.b64decode(self.values)))
+
+
+def _build_values(versions):
+    """Returns the dictionary of values after applying the given list
+    of versions. The list should start with a snapshot."""
+    values = {}
+    for version in versions:
+        version.apply(values)
+    return values
+
+
+def _build_delta(previous, current):
+    """Returns a tuple of the changed values and the deleted keys of
+    the `current` values compared to the `previous` values."""
+    changes = {}
+    for key, value in current.iteritems():
+        if key not in previous or previous[key] != value:
+            changes[key] = value
+    deleted = sorted(key for key in previous if key not in current)
+    return changes, deleted
 
 
 class Versioned(object):
@@ -228,15 +303,29 @@ class Versioned(object):
     used to store different "versions" of an item. On each update of
     the item, the serialized values of the item will be saved in the
     version table. Item modul will have a "versions" relationship
-    containing all versions of the values for this item."""
+    containing all versions of the values for this item.
+
+    To keep the history small only every n-th version is stored as a
+    full snapshot of the values. All versions in between only store the
+    changed and deleted values compared to the previous version. The
+    number of versions between two snapshots can be configured::
+
+        versions.snapshot_interval = 10
+
+    The values of a version can only be rebuild with the versions since
+    the last snapshot. Use :meth:`query_versions` to load only the
+    needed versions instead of the whole `versions` relationship.
+    """
 
     @declared_attr
     def versions(cls):
         tbl_name = "nm_%s_versions" % cls.__name__.lower()
         nm_table = Table(tbl_name, Base.metadata,
                          Column('iid', Integer, ForeignKey(cls.id)),
-                         Column('vid', Integer, ForeignKey("versions.id")))
-        versions = relationship(Version, secondary=nm_table, cascade="all")
+                         Column('vid', Integer, ForeignKey("versions.id")),
+                         Index("ix_%s_iid_vid" % tbl_name, "iid", "vid"))
+        versions = relationship(Version, secondary=nm_table, cascade="all",
+                                order_by=Version.id)
         return versions
 
     @classmethod
@@ -246,50 +335,114 @@ class Versioned(object):
     @classmethod
     def update_handler(cls, request, item):
         """Will add the serialized values of the item into the version
-        table.
+        table. The values are stored as full snapshot if the number of
+        versions since the last snapshot reaches the configured
+        interval. Otherwise only the changed values are stored.
 
         :request: Current request
         :item: Item handled in the update.
 
         """
-        version = Version()
+        settings = request.registry.settings
+        interval = int(settings.get("versions.snapshot_interval", 10))
         item_values = item.get_values(serialized=True)
-        version.values = json.dumps(item_values)
+        chain = item._get_version_chain()
+        version = Version()
+        if not chain or len(chain) >= interval:
+            version.set_values(item_values)
+        else:
+            changes, deleted = _build_delta(_build_values(chain),
+                                            item_values)
+            version.set_values(changes, snapshot=False, deleted=deleted)
         version.author = request.user.login
         version.date = datetime.datetime.utcnow()
-        item.versions.append(version)
-
-    def _get_version(self, author, id):
-        if not author and not id:
-            return self.versions[-2]
-        # iterate over the revsersed versions ignoring the last one
-        for version in self.versions[-2::-1]:
-            if id and version.id == id:
-                return version
-            elif author and version.author == author:
-                return version
-        return self.versions[0]
+        # Link the version with an insert into the nm table. Appending
+        # the version to the `versions` relationship would load all
+        # versions of the item.
+        db = object_session(item) or request.db
+        if item.id is None:
+            db.add(item)
+        db.add(version)
+        db.flush()
+        nm_table = item.__class__.versions.property.secondary
+        db.execute(nm_table.insert().values(iid=item.id, vid=version.id))
+        db.expire(item, ["versions"])
+
+    def query_versions(self):
+        """Returns a query for the versions of this item ordered by
+        their id. The query is not bound to the `versions` relationship
+        and can be filtered to load only a part of the versions."""
+        nm_table = self.__class__.versions.property.secondary
+        db = object_session(self)
+        return db.query(Version) \
+            .join(nm_table, nm_table.c.vid == Version.id) \
+            .filter(nm_table.c.iid == self.id) \
+            .order_by(Version.id)
+
+    def _get_version_chain(self, vid=None):
+        """Returns the list of versions beginning with the latest
+        snapshot up to the version with the given id (including). If no
+        id is given the chain up to the latest version is returned."""
+        if self.id is None or object_session(self) is None:
+            return []
+        query = self.query_versions()
+        if vid is not None:
+            query = query.filter(Version.id <= vid)
+        snapshot = query.filter(Version.snapshot == True) \
+            .order_by(None).with_entities(func.max(Version.id)).scalar()
+        if snapshot is not None:
+            query = query.filter(Version.id >= snapshot)
+        return query.all()
+
+    def _get_version_id(self, author, id):
+        """Returns the id of the previous version of the item. This is
+        the latest version before the current one which matches the
+        given id or author. If nothing matches, the first version is
+        returned. Returns None if there is no previous version."""
+        query = self.query_versions().order_by(None) \
+            .with_entities(Version.id)
+        last = query.order_by(Version.id.desc()).limit(1).scalar()
+        if last is None:
+            return None
+        # Search in the versions ignoring the last one
+        query = query.filter(Version.id < last)
+        first = query.order_by(Version.id).limit(1).scalar()
+        if first is None:
+            # There is no previous version.
+            return None
+        if author or id:
+            conditions = []
+            if id:
+                conditions.append(Version.id == id)
+            if author:
+                conditions.append(Version.author == author)
+            vid = query.filter(or_(*conditions)) \
+                .order_by(Version.id.desc()).limit(1).scalar()
+            return vid or first
+        return query.order_by(Version.id.desc()).limit(1).scalar()
 
     def get_previous_values(self, author=None, id=None):
         """Returns a dictionary parsed from the last log entry of the
         item containinge the previous values for each field if it has
-        been changed."""
-        if len(self.versions) < 1:
+        been changed. Only the versions needed to rebuild the values of
+        this entry are loaded from the database."""
+        if self.id is None or object_session(self) is None:
             return {}
-        else:
-            pvalues = {}
-            last = self._get_version(author, id)
-            try:
-                values = json.loads(last.values)
-                for field in values:
-                    if field == "data" and isinstance(self, Blob):
-                        blobdata = json.loads(values[field])
-                        for blobfield in blobdata:
-                            pvalues[blobfield] = blobdata[blobfield]
-                    pvalues[field] = values[field]
-            except:
-                log.warning(("Could not build previous values dict. "
-                             "Maybe old log format?"))
+        vid = self._get_version_id(author, id)
+        if vid is None:
+            return {}
+        pvalues = {}
+        try:
+            values = _build_values(self._get_version_chain(vid))
+            for field in values:
+                if field == "data" and isinstance(self, Blob):
+                    blobdata = json.loads(values[field])
+                    for blobfield in blobdata:
+                        pvalues[blobfield] = blobdata[blobfield]
+                pvalues[field] = values[field]
+        except:
+            log.warning(("Could not build previous values dict. "
+                         "Maybe old log format?"))
         return pvalues
 
 
@@ -366,10 +519,17 @@ class Owned(object):
         return user.id == self.uid
 
     def is_member(self, user):
-        if self.group:
-            return user.id in [user.id for user in self.group.members]
-        else:
+        """Returns true if the given user is member of the group of
+        the item. The membership is checked against the groups of the
+        user. The groups are loaded only once per user and session, so
+        checking many items neither loads the members of every group nor
+        needs a query per item."""
+        if self.gid is None:
+            # Group may be set but is not flushed yet.
+            if self.group:
+                return user.id in [m.id for m in self.group.members]
             return False
+        return self.gid in [g.id for g in user.groups]
 
 
 class Nested(object):
@@ -377,7 +537,15 @@ class Nested(object):
     can have a parent item and many children. The class will add two
     relation attribute to the inheriting class. The parent item is
     available under the *parent* attribute. The children items are
-    available under the *children* attribute."""
+    available under the *children* attribute.
+
+    Parents and children of an item are loaded with a single recursive
+    query on the *parent_id* field. The queries can also be used as
+    filter in other queries::
+
+        query = db.query(Comment)
+        query = query.filter(Comment.subtree_filter(thread.id))
+    """
 
     @declared_attr
     def parent_id(cls):
@@ -393,26 +561,110 @@ class Nested(object):
                             backref=backref('parent', remote_side=[cls.id]),
                             cascade="all")
 
+    @classmethod
+    def get_tree_cte(cls, id, ancestors=False):
+        """Returns a recursive CTE with the ids of all children and
+        subchildren of the item with the given id. If `ancestors` is
+        True the CTE will contain the ids of all parents instead. Each
+        row in the CTE has a *depth* column with the distance to the
+        item with the given id.
+
+        :id: ID of the item
+        :ancestors: If True, return the parents of the item.
+        :returns: CTE with an *id* and *depth* column
+        """
+        # Use the table of the parent_id column. In case of joined
+        # table inheritance the table of the class may not contain it.
+        table = cls.__mapper__.c.parent_id.table
+        node = table.alias()
+        if ancestors:
+            start = select([table.c.parent_id.label("id"),
+                            literal(1).label("depth")]) \
+                .where(table.c.id == id) \
+                .where(table.c.parent_id.isnot(None))
+            cte = start.cte(name="%s_ancestors" % table.name,
+                            recursive=True)
+            step = select([node.c.parent_id, cte.c.depth + 1]) \
+                .where(node.c.id == cte.c.id) \
+                .where(node.c.parent_id.isnot(None))
+        else:
+            start = select([table.c.id.label("id"),
+                            literal(1).label("depth")]) \
+                .where(table.c.parent_id == id)
+            cte = start.cte(name="%s_subtree" % table.name,
+                            recursive=True)
+            step = select([node.c.id, cte.c.depth + 1]) \
+                .where(node.c.parent_id == cte.c.id)
+        return cte.union_all(step)
+
+    @classmethod
+    def subtree_filter(cls, id, include_self=False):
+        """Returns a filter expression which matches all children and
+        subchildren of the item with the given id.
+
+        :id: ID of the item
+        :include_self: If True the item itself will match too.
+        :returns: SQL expression
+        """
+        cte = cls.get_tree_cte(id)
+        expr = cls.id.in_(select([cte.c.id]))
+        if include_self:
+            expr = expr | (cls.id == id)
+        return expr
+
+    @classmethod
+    def ancestors_filter(cls, id, include_self=False):
+        """Returns a filter expression which matches all parents of the
+        item with the given id.
+
+        :id: ID of the item
+        :include_self: If True the item itself will match too.
+        :returns: SQL expression
+        """
+        cte = cls.get_tree_cte(id, ancestors=True)
+        expr = cls.id.in_(select([cte.c.id]))
+        if include_self:
+            expr = expr | (cls.id == id)
+        return expr
+
+    def _load_tree(self, ancestors):
+        session = object_session(self)
+        cte = self.get_tree_cte(self.id, ancestors)
+        query = session.query(self.__class__) \
+            .join(cte, self.__class__.id == cte.c.id) \
+            .order_by(cte.c.depth, self.__class__.id)
+        return query.all()
+
     def get_parents(self):
-        """Return a list of all parents of the current item
+        """Return a list of all parents of the current item. The list
+        is ordered by the distance to the item beginning with the
+        direct parent.
+
         :returns: List of BaseItems
 
         """
-        parents = []
-        if not self.parent:
+        if self.id is None or object_session(self) is None:
+            # Item is not persistent yet. So walk along the relations.
+            parents = []
+            if self.parent:
+                parents.append(self.parent)
+                parents.extend(self.parent.get_parents())
             return parents
-        else:
-            parents.append(self.parent)
-            parents.extend(self.parent.get_parents())
-        return parents
+        return self._load_tree(ancestors=True)
 
     def get_children(self):
-        """Returns a list of all children und subchildren
+        """Returns a list of all children und subchildren. The list is
+        ordered by the depth of the children beginning with the direct
+        children.
+
         :returns: List of BaseItems
 
         """
-        childs = []
-        for child in self.children:
-            childs.append(child)
-            childs.extend(child.get_children())
-        return childs
+        if self.id is None or object_session(self) is None:
+            # Item is not persistent yet. So walk along the relations.
+            childs = []
+            for child in self.children:
+                childs.append(child)
+                childs.extend(child.get_children())
+            return childs
+        return self._load_tree(ancestors=False)
@@ -0,0 +1,15 @@
+import sqlalchemy as sa
+from ringo.model import Base
+
+
+class SessionData(Base):
+    """Data of a session stored in the database. Used by the session
+    stores in :mod:`ringo.lib.sessionstore`. The data is the serialized
+    dictionary of the beaker session."""
+    __tablename__ = "sessions"
+
+    id = sa.Column(sa.String(64), primary_key=True)
+    """Id of the session"""
+    data = sa.Column(sa.LargeBinary, nullable=False)
+    updated = sa.Column(sa.DateTime, nullable=False, index=True)
+    """Date of the last write. Used to purge old sessions."""
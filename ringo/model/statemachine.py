@@ -80,6 +80,16 @@ class TransitionCondition(object):
         """
         return null_condition(item, transition)
 
+_definitions = {}
+"""Cache for the graphs of the statemachines. Key is the class of the
+statemachine. See :meth:`Statemachine.get_definition`"""
+
+_matrices = {}
+"""Cache for the disabled actions of the statemachines. Key is the
+class of the statemachine. See
+:meth:`Statemachine.get_disabled_actions_matrix`"""
+
+
 class Statemachine(object):
     """A state machine, is a mathematical model of computation used to
     design sequential logic circuits for items of a module. It is
@@ -87,7 +97,19 @@ class Statemachine(object):
     number of states.  The machine is in only one state at a time; the
     state it is in at any given time is called the current state. It can
     change from one state to another when initiated by a triggering
-    event or condition; this is called a transition."""
+    event or condition; this is called a transition.
+
+    On default the graph of states is build for every instance of the
+    statemachine. Statemachines whose graph does not depend on the item
+    or the request should set :attr:`shared` to True. The graph is then
+    only build once (see :meth:`get_definition`) and the states can be
+    checked on the class level, e.g. in SQL when loading lists."""
+
+    shared = False
+    """If True the graph of the states is only build once per class and
+    shared between all instances. :meth:`setup` is called without item
+    and request then. If False (default) the graph is build for every
+    instance by calling :meth:`setup` with the item and the request."""
 
     def __init__(self, item, item_state_attr, init_state=None, request=None):
         """Initialise the statemachine for the given item.
@@ -103,21 +125,99 @@ class Statemachine(object):
         self._item = item
         self._item_state_attr = item_state_attr
         self._request = request
-        self._root = self.setup()
-        self._current = self._root
 
         # Try to set the current state of the statemaching by getting
         # the current state from the item.
+        if self.shared:
+            root, states = self.get_definition()
+        else:
+            root, states = _build_definition(self)
+        self._definition = (root, states)
         current_id = getattr(self._item, self._item_state_attr)
         if init_state:
             current_id = init_state
-        for st in self.get_states(ignore_checks=True):
-            if st._id == current_id:
-                self._current = st
-                break
+        self._current = BoundState(states.get(current_id, root), self)
+
+    @classmethod
+    def get_definition(cls):
+        """Returns the graph of states of the statemachine. The graph
+        is only build once per statemachine class by calling
+        :meth:`setup` and is shared between all instances of the
+        statemachine. The instances only keep the current state of
+        their item.
+
+        Statemachines which are not :attr:`shared` do not have a
+        graph per class. (None, {}) is returned for them.
+
+        :returns: Tuple of the root :class:`State` and a dictionary
+        with all states of the graph. The key is the id of the state.
+        """
+        if not cls.shared:
+            return None, {}
+        definition = _definitions.get(cls)
+        if definition is None:
+            proto = cls.__new__(cls)
+            proto._item = None
+            proto._item_state_attr = None
+            proto._request = None
+            definition = _build_definition(proto)
+            _definitions[cls] = definition
+        return definition
+
+    @classmethod
+    def get_disabled_actions_matrix(cls):
+        """Returns a dictionary with the disabled actions for every
+        state and role of the statemachine. The matrix is only build
+        once per statemachine class.
+
+        :returns: Dictionary with tuples of (state id, rolename) as key
+        and a frozenset of the lowercased names of the disabled actions
+        as value.
+        """
+        matrix = _matrices.get(cls)
+        if matrix is None:
+            matrix = _build_matrix(cls.get_definition()[1])
+            _matrices[cls] = matrix
+        return matrix
+
+    def get_item_disabled_actions_matrix(self):
+        """Returns the disabled actions for every state and role of
+        this statemachine instance. See
+        :meth:`get_disabled_actions_matrix`. Use this method if the
+        statemachine may not be :attr:`shared`."""
+        if self.shared:
+            return self.get_disabled_actions_matrix()
+        return _build_matrix(self._definition[1])
+
+    @classmethod
+    def get_disabling_states(cls, action, role):
+        """Returns the ids of all states which disable the given action
+        for the given role.
+
+        :action: Name of the action
+        :role: Name of the role
+        :returns: Set of state ids
+        """
+        action = action.lower()
+        return set(state_id for (state_id, rolename), actions
+                   in cls.get_disabled_actions_matrix().iteritems()
+                   if rolename == role and action in actions)
+
+    @property
+    def _root(self):
+        return BoundState(self._definition[0], self)
 
     def setup(self):
-        """Need to be implemented in the inherited class.
+        """Need to be implemented in the inherited class. Returns the
+        root state of the graph.
+
+        If the statemachine is :attr:`shared` this method is only
+        called once per class on an instance without item and request
+        (`self._item` and `self._request` are None). So the graph must
+        not depend on them. Labels should not be translated here but
+        when rendered. Conditions and handlers are called with the item
+        of the statemachine as usual. Otherwise (default) this method is
+        called for every instance with the item and the request.
 
         Example::
 
@@ -256,6 +356,31 @@ class Transition(object):
             return True
 
 
+def _build_definition(statemachine):
+    root = statemachine.setup()
+    states = {}
+    if root is not None:
+        for st in walk(root, ignore_checks=True):
+            states[st._id] = st
+    return root, states
+
+
+def _build_matrix(states):
+    matrix = {}
+    for state_id, state in states.iteritems():
+        for role, actions in state._disabled_actions.iteritems():
+            matrix[(state_id, role)] = frozenset(a.lower() for a in actions)
+    return matrix
+
+
+def has_unshared_statemachines(clazz):
+    """Returns True if the given class has statemachines which are not
+    :attr:`Statemachine.shared`. The states of those can not be
+    checked on the class level (e.g in SQL) but only per item."""
+    return any(not sm.shared
+               for sm in getattr(clazz, "_statemachines", {}).itervalues())
+
+
 class State(object):
     """A single state in a statemachine."""
 
@@ -347,3 +472,57 @@ class State(object):
             if ignore_checks or trans.is_available():
                 transitions.append(trans)
         return transitions
+
+
+class BoundState(object):
+    """A :class:`State` of the shared statemachine graph bound to the
+    statemachine of a single item. All attributes and methods are taken
+    from the wrapped state, so methods overwritten in subclasses of
+    :class:`State` are used. Bound states compare equal to the state
+    they are based on. Conditions of the transitions are checked
+    against the item of the bound statemachine."""
+
+    def __init__(self, state, statemachine):
+        self._state = getattr(state, "_state", state)
+        self._statemachine = statemachine
+
+    def __getattr__(self, name):
+        return getattr(self._state, name)
+
+    def __str__(self):
+        return str(self._state)
+
+    def __unicode__(self):
+        return unicode(self._state)
+
+    def __eq__(self, other):
+        return self._state is getattr(other, "_state", other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self._state)
+
+    def get_transitions(self, ignore_checks=False):
+        transitions = []
+        for trans in self._state._transitions:
+            trans = BoundTransition(trans, self._statemachine)
+            if ignore_checks or trans.is_available():
+                transitions.append(trans)
+        return transitions
+
+
+class BoundTransition(Transition):
+    """A :class:`Transition` of the shared statemachine graph bound to
+    the statemachine of a single item."""
+
+    def __init__(self, transition, statemachine):
+        Transition.__init__(self,
+                            BoundState(transition._start_state,
+                                       statemachine),
+                            BoundState(transition._end_state,
+                                       statemachine),
+                            transition._label,
+                            transition._handler,
+                            transition._condition)
@@ -37,7 +37,8 @@ from ringo.scripts.db import (
     handle_db_uuid_command,
     handle_db_restrict_command,
     handle_db_unrestrict_command,
-    handle_db_fixsequence_command
+    handle_db_fixsequence_command,
+    handle_db_blobindex_command
 )
 
 from ringo.scripts.fixture import (
@@ -55,6 +56,15 @@ from ringo.scripts.user import (
     handle_user_passwd_command
 )
 
+from ringo.scripts.jobs import (
+    handle_jobs_worker_command
+)
+
+from ringo.scripts.benchmark import (
+    setup_imexport_arguments,
+    handle_benchmark_imexport_command
+)
+
 from ringo.scripts.application import (
     handle_app_init_command,
     handle_ext_init_command,
@@ -191,6 +201,44 @@ def setup_modul_parser(subparsers, parent):
     return sp
 
 
+def setup_jobs_parser(subparsers, parent):
+    p = subparsers.add_parser('jobs',
+                              help='Background jobs',
+                              parents=[parent])
+    sp = p.add_subparsers(help='Jobs command help')
+
+    # Worker command
+    worker_parser = sp.add_parser('worker',
+                                help=('Starts a worker which runs the '
+                                      'queued background jobs'),
+                                parents=[parent])
+    worker_parser.add_argument('--interval',
+                        type=float,
+                        default=2,
+                        help="Seconds to wait before looking for new jobs")
+    worker_parser.add_argument('--once',
+                        action="store_true",
+                        help="Stop if there are no more queued jobs")
+    worker_parser.set_defaults(func=handle_jobs_worker_command)
+    return sp
+
+
+def setup_benchmark_parser(subparsers, parent):
+    p = subparsers.add_parser('benchmark',
+                              help='Benchmarks',
+                              parents=[parent])
+    sp = p.add_subparsers(help='Benchmark command help')
+
+    # Import/Export command
+    imexport_parser = sp.add_parser('imexport',
+                                    help=('Measures the import and export '
+                                          'of synthetic items of a modul'),
+                                    parents=[parent])
+    setup_imexport_arguments(imexport_parser)
+    imexport_parser.set_defaults(func=handle_benchmark_imexport_command)
+    return sp
+
+
 def setup_db_parser(subparsers, parent):
     p = subparsers.add_parser('db',
                               help='Database administration',
@@ -233,13 +281,17 @@ def setup_db_parser(subparsers, parent):
                         action="store_true",
                         help="Include relations in the export")
     savedata_parser.add_argument('--format',
-                        choices=["json", "csv"],
+                        choices=["json", "jsonl", "csv"],
                         default="json",
                         help="Format of the saved data")
     savedata_parser.add_argument('--filter',
                         help="Define a filter on the exported data to select with items should be included in the export.")
     savedata_parser.add_argument('--export-config',
                         help="Detailed configuration of the content of the export.")
+    savedata_parser.add_argument('--processes',
+                        type=int,
+                        default=1,
+                        help="Number of processes used to export the data in parallel")
 
     # restrict command
     savedata_parser = sp.add_parser('restrict',
@@ -277,6 +329,21 @@ def setup_db_parser(subparsers, parent):
                         choices=["json", "csv"],
                         default="json",
                         help="Format of the loaded data")
+    loaddata_parser.add_argument('--chunksize',
+                        type=int,
+                        default=1000,
+                        help="Number of items imported at once")
+    loaddata_parser.add_argument('--skip-unchanged',
+                        action="store_true",
+                        help="Do not update items if the values are unchanged")
+    loaddata_parser.add_argument('--dry-run',
+                        action="store_true",
+                        help=("Only report how many items would be created, "
+                              "updated or are unchanged"))
+    loaddata_parser.add_argument('--bulk',
+                        action="store_true",
+                        help=("Use bulk inserts and updates. Faster but "
+                              "no handlers are called on the items"))
 
     # UUID command
     uuid_parser = sp.add_parser('resetuuid',
@@ -295,6 +362,23 @@ def setup_db_parser(subparsers, parent):
                                 help='Fixes sequences in postgres databases',
                                 parents=[parent])
     upgrade_parser.set_defaults(func=handle_db_fixsequence_command)
+
+    # Blobindex command
+    blobindex_parser = sp.add_parser('blobindex',
+                                help=('Creates indexes on fields of '
+                                      'blobform items of a given modul'),
+                                parents=[parent])
+    blobindex_parser.set_defaults(func=handle_db_blobindex_command)
+    blobindex_parser.add_argument('modul',
+                        metavar="modul",
+                        help="Name of the Modul")
+    blobindex_parser.add_argument('--fields',
+                        nargs="*",
+                        help=("Fields to index. Defaults to the searchable "
+                              "fields in the overview"))
+    blobindex_parser.add_argument('--jsonb',
+                        action="store_true",
+                        help="Convert the data into a JSONB column (PostgreSQL)")
     return sp
 
 
@@ -328,6 +412,8 @@ def setup_parser():
     parser["user"] = setup_user_parser(subparsers, global_arguments)
     parser["app"] = setup_application_parser(subparsers, global_arguments)
     parser["fixture"] = setup_fixture_parser(subparsers, global_arguments)
+    parser["jobs"] = setup_jobs_parser(subparsers, global_arguments)
+    parser["benchmark"] = setup_benchmark_parser(subparsers, global_arguments)
     return (parser, subparsers, global_arguments)
 
 
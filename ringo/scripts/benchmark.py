@@ -0,0 +1,13 @@
+from ringo.benchmarks import add_arguments
+from ringo.benchmarks.imexport import add_imexport_arguments, run
+
+
+def setup_imexport_arguments(parser):
+    add_arguments(parser)
+    return add_imexport_arguments(parser)
+
+
+def handle_benchmark_imexport_command(args):
+    """Runs the benchmark of the import and export. See
+    :mod:`ringo.benchmarks.imexport`."""
+    run(args)
@@ -1,10 +1,11 @@
 import sys
 import logging
+import functools
 import shutil
 import os
 import time
 import json
-from sqlalchemy import engine_from_config
+from sqlalchemy.orm import Query
 import transaction
 
 from invoke import run
@@ -16,12 +17,19 @@ from pyramid.paster import (
     setup_logging,
 )
 from ringo.lib.sql import DBSession, NTDBSession, setup_db_session
+from ringo.lib.sql.db import create_engine
 from ringo.lib.helpers import get_app_location, dynamic_import
 from ringo.lib.imexport import (
-    JSONExporter, JSONImporter,
+    JSONExporter, JSONLinesExporter, JSONImporter,
     CSVExporter, CSVImporter,
     ExportConfiguration
 )
+from ringo.lib.table import get_table_config
+from ringo.lib.sql.blob import (
+    is_blob_field,
+    get_blob_index_statements,
+    setup_blob_storage
+)
 from ringo.model.base import BaseList
 from ringo.model.modul import ModulItem
 
@@ -81,7 +89,9 @@ def get_last_revision_file(args):
 def get_engine(config_file):
     setup_logging(config_file)
     settings = get_appsettings_(config_file)
-    engine = engine_from_config(settings, 'sqlalchemy.')
+    # Use the same disconnect handling as the application.
+    engine = create_engine(settings)
+    setup_blob_storage(settings)
     setup_db_session(engine)
     return engine
 
@@ -190,12 +200,12 @@ def handle_db_savedata_command(args):
     session = get_session(os.path.join(*path))
     modul_clazzpath = session.query(ModulItem).filter(ModulItem.name == args.modul).all()[0].clazzpath
     modul = dynamic_import(modul_clazzpath)
-    data = session.query(modul).order_by(modul.id).all()
+    data = session.query(modul).order_by(modul.id)
 
     if args.filter:
         # Build Baselist which is used for filtering.
         filter_stack = []
-        listing = BaseList(modul, db=None, items=data)
+        listing = BaseList(modul, db=None, items=data.all())
         for f in args.filter.split(";"):
             filter_item = f.split(",")
             filter_item[2] = bool(filter_item[2])
@@ -218,73 +228,95 @@ def handle_db_savedata_command(args):
         exporter = JSONExporter(modul, serialized=False,
                                 relations=args.include_relations,
                                 config=export_config)
-        data = prepare_data(data)
+    elif args.format == "jsonl":
+        exporter = JSONLinesExporter(modul, serialized=False,
+                                     relations=args.include_relations,
+                                     config=export_config)
     else:
         exporter = CSVExporter(modul, serialized=False,
                                relations=args.include_relations,
                                config=export_config)
-    print exporter.perform(data)
-
-def prepare_data(applications):
-    import datetime
-    for application in applications:
-        for field, value in application.__dict__.items():
-            if isinstance(value, datetime.date):
-                application.__setattr__(field, str(value))
-    return applications
+    if args.processes > 1:
+        # Export chunks of the items in parallel worker processes. Each
+        # worker uses its own session.
+        if isinstance(data, Query):
+            ids = [id for id, in data.with_entities(modul.id)]
+        else:
+            ids = [item.id for item in data]
+        session_factory = functools.partial(get_session, args.config, False)
+        for chunk in exporter.stream_parallel(ids, session_factory,
+                                              args.processes):
+            sys.stdout.write(chunk)
+        return
+    exporter.dump(data, sys.stdout)
 
 def handle_db_loaddata_command(args):
     path = []
     path.append(args.config)
     session = get_session(os.path.join(*path))
-    importer = get_importer(session, args.modul, args.format)
+    importer = get_importer(session, args.modul, args.format,
+                            args.chunksize)
     if args.loadbyid:
         load_key = "id"
     else:
         load_key = "uuid"
-    with open(args.fixture) as f:
-        data = f.read()
-        items, created, updated = do_import(session,
-                                            importer, data,
-                                            load_key)
+    if args.bulk and (args.dry_run or args.skip_unchanged):
+        print "Bulk mode can not be combined with --dry-run or --skip-unchanged"
+        sys.exit(1)
+
+    def progress(count):
+        sys.stderr.write("\rImported %s items" % count)
 
+    unchanged = 0
+    with open(args.fixture) as f:
+        if args.bulk:
+            created, updated = importer.perform_bulk(f, load_key=load_key,
+                                                     progress=progress)
+        else:
+            created = 0
+            updated = 0
+            items = importer.iter_perform(f, load_key=load_key,
+                                          progress=progress,
+                                          flush=not args.dry_run,
+                                          skip_unchanged=args.skip_unchanged,
+                                          dry_run=args.dry_run)
+            for item, action in items:
+                if action.find("CREATE") > -1:
+                    created += 1
+                elif action.find("UNCHANGED") > -1:
+                    unchanged += 1
+                else:
+                    updated += 1
+        sys.stderr.write("\n")
+
+    if args.dry_run:
+        transaction.abort()
+        print ("Would update %s items, create %s items, %s items unchanged"
+               % (updated, created, unchanged))
+        return
     try:
         transaction.commit()
-        print "Updated %s items, Created %s items" % (updated, created)
+        print ("Updated %s items, Created %s items, %s items unchanged"
+               % (updated, created, unchanged))
     except Exception as e:
         print str(e)
         print "Loading data failed!"
 
 
-def get_importer(session, modulname, fmt):
+def get_importer(session, modulname, fmt, chunksize=1000):
     try:
         modul_clazzpath = session.query(ModulItem).filter(ModulItem.name == modulname).all()[0].clazzpath
         modul = dynamic_import(modul_clazzpath)
         if fmt == "json":
-            return JSONImporter(modul, session)
+            return JSONImporter(modul, session, chunksize=chunksize)
         else:
-            return CSVImporter(modul, session)
+            return CSVImporter(modul, session, chunksize=chunksize)
     except:
         modules = [m.name for m in session.query(ModulItem).all()]
         print "Can not load modul '{}'. Please choose one from [{}].".format(modulname, ", ".join(modules))
         sys.exit(1)
 
 
-def do_import(session, importer, data, load_key):
-    items = []
-    updated = 0
-    created = 0
-    items = importer.perform(data, load_key=load_key)
-    for item, action in items:
-        # Add all new items to the session
-        if action.find("CREATE") > -1:
-            session.add(item)
-            created += 1
-        else:
-            updated += 1
-    return items, created, updated
-
-
 def handle_db_uuid_command(args):
     path = []
     path.append(args.config)
@@ -381,3 +413,49 @@ def handle_db_fixsequence_command(args):
         conn.execute(r[0])
     conn.close()
     print "OK"
+
+
+def handle_db_blobindex_command(args):
+    """Will create expression indexes on fields in the data of blobform
+    items of the given modul. On default indexes are created for all
+    searchable blobform fields in the overview configuration of the
+    modul. Optionally the data column can be converted into a JSONB
+    column in PostgreSQL databases."""
+    session = get_session(args.config)
+    try:
+        modul_clazzpath = session.query(ModulItem).filter(ModulItem.name == args.modul).all()[0].clazzpath
+    except IndexError:
+        print "Can not load modul '{}'.".format(args.modul)
+        sys.exit(1)
+    modul = dynamic_import(modul_clazzpath)
+    if args.fields:
+        fields = args.fields
+    else:
+        fields = [col.get('name') for col
+                  in get_table_config(modul, "overview").get_columns()
+                  if col.get("searchable", True)]
+    fields = [f for f in fields if is_blob_field(modul, f)]
+
+    engine = session.get_bind()
+    dialect_name = engine.dialect.name
+    tablename = modul.__tablename__
+    conn = engine.connect()
+    if args.jsonb:
+        if dialect_name != "postgresql":
+            print "Converting the data into JSONB is only supported on PostgreSQL."
+            sys.exit(1)
+        print "Converting data of %s into JSONB ... " % tablename,
+        conn.execute("ALTER TABLE %s ALTER COLUMN data TYPE JSONB "
+                     "USING data::jsonb;" % tablename)
+        print "OK"
+    for field in fields:
+        statements = get_blob_index_statements(tablename, field,
+                                               dialect_name)
+        if statements is None:
+            print "Indexes are not supported for '%s' in %s" % (field, dialect_name)
+            continue
+        print "Creating indexes for '%s' ... " % field,
+        for sql in statements:
+            conn.execute(sql)
+        print "OK"
+    conn.close()
@@ -0,0 +1,23 @@
+import logging
+from pyramid.paster import bootstrap, setup_logging
+from ringo.lib.sql import NTDBSession
+from ringo.lib.jobs import run_worker
+
+log = logging.getLogger(__name__)
+
+
+def handle_jobs_worker_command(args):
+    """Starts a worker which runs the queued background jobs. The
+    application is loaded from the given configuration so the job
+    handlers registered in the views of the application are
+    available."""
+    setup_logging(args.config)
+    env = bootstrap(args.config)
+    log.info("Worker started. Waiting for jobs...")
+    try:
+        run_worker(env["registry"], NTDBSession(),
+                   interval=args.interval, once=args.once)
+    except KeyboardInterrupt:
+        log.info("Worker stopped.")
+    finally:
+        env["closer"]()
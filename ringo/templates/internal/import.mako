@@ -26,6 +26,11 @@
       <div class="panel panel-info">
         <div class="panel-heading"><strong>${_('Import results')} ${modul}</strong></div>
           <div class="panel-body">
+          <p>
+          % for operation in sorted(summary):
+            ${operation}: ${summary[operation]}<br/>
+          % endfor
+          </p>
           <table class="table">
             <tr>
               <th>${_('Name')}</th>
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import os
+import datetime
+import pytest
+from pytest_ringo import login, transaction_begin, transaction_rollback
+
+
+def _test_job(context):
+    with context.open_result("result.txt", "text/plain") as f:
+        f.write(context.params["text"])
+    context.progress(1, 1)
+
+
+def _failing_job(context):
+    raise ValueError("Job failed")
+
+
+@pytest.fixture()
+def jobs(app):
+    """Returns a non transactional session to enqueue the jobs. The
+    jobs and their results are deleted after the test."""
+    from ringo.lib.jobs import register_job_handler, get_job_directory
+    from ringo.lib.sql import NTDBSession
+    from ringo.model.job import Job
+    register_job_handler("test", _test_job)
+    register_job_handler("failing", _failing_job)
+    db = NTDBSession()
+    yield db
+    db.rollback()
+    directory = get_job_directory(app.app.registry.settings)
+    for job in db.query(Job).filter(Job.name.in_(["test", "failing"])):
+        if job.result:
+            os.remove(os.path.join(directory, job.result))
+        db.delete(job)
+    db.commit()
+
+
+def _run(app, db, job):
+    from ringo.lib.jobs import claim_job, run_job
+    claimed = claim_job(db)
+    assert claimed.id == job.id
+    return run_job(claimed, app.app.registry, db)
+
+
+class TestJobs:
+
+    def test_status_unknown(self, app):
+        login(app, "admin", "secret")
+        app.get("/rest/jobs/999", status=404)
+
+    def test_download_unknown(self, app):
+        login(app, "admin", "secret")
+        app.get("/jobs/999/download", status=404)
+
+    def test_run(self, app, jobs):
+        from ringo.lib.jobs import enqueue
+        from ringo.model.user import User
+        admin = jobs.query(User).filter(User.login == "admin").one()
+        job = enqueue(jobs, "test", {"text": "foo"}, admin)
+        jobs.commit()
+        login(app, "admin", "secret")
+        status = app.get("/rest/jobs/%s" % job.id).json["data"]
+        assert status["status"] == "queued"
+        # No result available until the job is finished.
+        response = app.get("/jobs/%s/download" % job.id)
+        assert response.json["success"] is False
+
+        _run(app, jobs, job)
+        status = app.get("/rest/jobs/%s" % job.id).json["data"]
+        assert status["status"] == "finished"
+        assert status["progress"] == 1
+        assert status["total"] == 1
+        assert status["result"] is True
+        response = app.get("/jobs/%s/download" % job.id)
+        assert response.body == "foo"
+
+    def test_run_failed(self, app, jobs):
+        from ringo.lib.jobs import enqueue
+        job = enqueue(jobs, "failing", {})
+        jobs.commit()
+        job = _run(app, jobs, job)
+        assert job.status == "failed"
+        assert job.message == "Job failed"
+        assert job.finished is not None
+
+    def test_reset_stale_jobs(self, app, jobs):
+        from ringo.lib.jobs import enqueue, reset_stale_jobs, claim_job
+        stale = enqueue(jobs, "test", {"text": "foo"})
+        running = enqueue(jobs, "test", {"text": "foo"})
+        jobs.commit()
+        assert claim_job(jobs).id == stale.id
+        assert claim_job(jobs).id == running.id
+        stale.started = datetime.datetime.utcnow() \
+            - datetime.timedelta(hours=2)
+        jobs.commit()
+        settings = {"jobs.timeout": "1"}
+        assert reset_stale_jobs(jobs, settings) == 1
+        jobs.expire_all()
+        assert stale.status == "queued"
+        assert stale.started is None
+        assert running.status == "running"
+        assert claim_job(jobs).id == stale.id
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import pytest
+from pytest_ringo import login, transaction_begin, transaction_rollback
+
+
+class TestHistory:
+
+    def test_persisted(self, app):
+        login(app, "admin", "secret")
+        app.get("/usergroups/list")
+        app.get("/users/list")
+        # The view of the test case pops the last page from the history
+        # stored in the session and redirects to it.
+        response = app.get("/_test_case/start").follow()
+        assert response.location.endswith("/users/list")
+        response.follow()
+        transaction_rollback(app)
+
+    def test_json_not_in_history(self, app):
+        login(app, "admin", "secret")
+        app.get("/users/list")
+        app.get("/rest/users/1")
+        response = app.get("/_test_case/start").follow()
+        assert response.location.endswith("/users/list")
+        response.follow()
+        transaction_rollback(app)
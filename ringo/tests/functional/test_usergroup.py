@@ -93,3 +93,22 @@ class TestDelete:
         values = {"confirmed": 1}
         app.post("/usergroups/delete/2", params=values, status=302)
         transaction_rollback(app)
+
+
+class TestBundle:
+
+    def test_bundle_delete(self, app):
+        login(app, "admin", "secret")
+        transaction_begin(app)
+        values = {"bundle_action": "Delete", "id": 2}
+        app.get("/usergroups/bundle", params=values, status=200)
+        transaction_rollback(app)
+
+    def test_bundle_delete_POST_confirm_yes(self, app):
+        login(app, "admin", "secret")
+        transaction_begin(app)
+        values = {"bundle_action": "Delete", "id": 2}
+        app.get("/usergroups/bundle", params=values, status=200)
+        values = {"confirmed": 1}
+        app.post("/usergroups/bundle", params=values, status=302)
+        transaction_rollback(app)
@@ -39,6 +39,45 @@ class BaseItemTests(unittest.TestCase):
         result = exporter.perform([item])
         self.assertEqual(len(result), len('[{"str_repr": "%s|name", "description": "", "name": "modules", "label": "Modul", "default_gid": "", "id": "1", "label_plural": "Modules", "display": "admin-menu", "clazzpath": "ringo.model.modul.ModulItem", "uuid": "xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"}]'))
 
+    def test_json_stream(self):
+        from ringo.lib.imexport import JSONExporter, JSONLinesExporter
+        item = self._load_item()
+        exporter = JSONExporter(item.__class__)
+        result = "".join(exporter.stream([item]))
+        self.assertEqual(result, exporter.perform([item]))
+        exporter = JSONLinesExporter(item.__class__)
+        result = "".join(exporter.stream([item, item]))
+        self.assertEqual(len(result.splitlines()), 2)
+
+    def test_serialize_chunks(self):
+        import json
+        from ringo.lib.imexport import Exporter, JSONExporter
+        item = self._load_item()
+        for exporter in [Exporter(item.__class__),
+                         JSONExporter(item.__class__)]:
+            chunks = [exporter.serialize_chunk(exporter._iter_rows([item], 1))
+                      for x in range(2)]
+            result = json.loads("".join(exporter._join_chunks(chunks)))
+            self.assertEqual([row["name"] for row in result],
+                             ["modules", "modules"])
+
+    def test_export_relations(self):
+        from ringo.lib.imexport import Exporter, ExportConfiguration
+        item = self._load_item()
+        config = ExportConfiguration(["id", {"actions": ["id", "name"]}])
+        self.assertEqual(len(config.get_load_options(item.__class__)), 1)
+        exporter = Exporter(item.__class__, config=config)
+        result = exporter.perform(item)
+        self.assertEqual(len(result["actions"]), len(item.actions))
+
+    def test_import_unchanged(self):
+        from ringo.lib.imexport import JSONImporter
+        item = self._load_item()
+        importer = JSONImporter(item.__class__)
+        self.assertTrue(importer.is_unchanged(item, {"name": "modules",
+                                                     "unknown": "foo"}))
+        self.assertFalse(importer.is_unchanged(item, {"name": "foo"}))
+
     def test_get_form_config(self):
         from ringo.model.modul import ModulItem
         from ringo.lib.form import get_form_config
@@ -83,6 +122,68 @@ class BaseItemTests(unittest.TestCase):
         self.assertTrue(isinstance(result, BaseFactory))
 
 
+def test_content_hash_decimal():
+    from decimal import Decimal
+    from ringo.lib.imexport import content_hash
+    assert content_hash({"price": Decimal("1.50")}) == \
+        content_hash({"price": Decimal("1.5")})
+    assert content_hash({"price": Decimal("1.50")}) != \
+        content_hash({"price": Decimal("1.05")})
+
+
+def test_export_query_yield_per(apprequest, monkeypatch):
+    import sqlalchemy as sa
+    from ringo.lib import imexport
+    from ringo.model.modul import ModulItem
+    config = imexport.ExportConfiguration(["id", {"actions": ["id"]}])
+    exporter = imexport.Exporter(ModulItem, config=config)
+    # The actions are joined eager loaded on default.
+    query = apprequest.db.query(ModulItem).order_by(ModulItem.id)
+    expected = [(item.id, len(item.actions)) for item in query]
+
+    def export():
+        rows = exporter.stream(query, chunksize=2)
+        return [(int(row["id"]), len(row["actions"])) for row in rows]
+
+    assert export() == expected
+    # Older versions of SQLAlchemy can not combine the subqueryload with
+    # yield_per.
+    monkeypatch.setattr(imexport, "selectinload", sa.orm.subqueryload)
+    monkeypatch.setattr(imexport, "_eager_yield_per", False)
+    assert export() == expected
+
+
+def test_export_generator(apprequest):
+    import zipfile
+    from StringIO import StringIO
+    from ringo.lib.imexport import CSVExporter, XLSXExporter
+    from ringo.model.modul import ModulItem
+    items = apprequest.db.query(ModulItem).order_by(ModulItem.id).all()
+    exporter = CSVExporter(ModulItem)
+    result = "".join(exporter.stream(item for item in items))
+    assert result == "".join(exporter.stream(items))
+    assert len(result.splitlines()) == len(items) + 1
+
+    def sheet(data):
+        book = zipfile.ZipFile(StringIO("".join(data)))
+        return book.read("xl/worksheets/sheet1.xml")
+
+    exporter = XLSXExporter(ModulItem)
+    assert (sheet(exporter.stream(item for item in items))
+            == sheet(exporter.stream(items)))
+
+
+def test_import_related_items_per_chunk(apprequest):
+    from ringo.lib.imexport import JSONImporter
+    from ringo.model.user import User, Role
+    importer = JSONImporter(User, apprequest.db, chunksize=1)
+    for role_id in [1, 2]:
+        rows = importer.deserialize_rows([{"roles": [role_id]}])
+        assert [role.id for role in rows[0]["roles"]] == [role_id]
+        # Only the related items of the current chunk are cached.
+        assert importer._related_items.keys() == [(Role, role_id)]
+
+
 def test_get_item_list(apprequest):
     from ringo.model.modul import ModulItem
     from ringo.model.base import BaseList, get_item_list
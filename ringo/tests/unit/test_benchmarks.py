@@ -0,0 +1,38 @@
+import pytest
+
+
+def _fail():
+    raise ValueError("foo")
+
+
+def test_run():
+    from ringo.benchmarks import Benchmark
+    bench = Benchmark("test", repeat=2)
+    value = bench.run("stage", lambda: [1, 2, 3], calls=3, unit="rows",
+                      allocations=True)
+    # The measured allocations do not replace the return value.
+    assert value == [1, 2, 3]
+    result = bench.results[0]
+    assert result["rows"] == 3
+    assert result["min"] <= result["mean"]
+    assert "objects" in result
+    assert "objects_per_call" in result
+
+
+def test_run_failed():
+    from ringo.benchmarks import Benchmark
+    bench = Benchmark("test")
+    assert bench.run("stage", _fail, calls=3, allocations=True) is None
+    result = bench.results[0]
+    assert result["error"] == "ValueError: foo"
+    assert "min" not in result
+    assert "calls" not in result
+    assert "objects" not in result
+
+
+def test_run_without_repeat():
+    from ringo.benchmarks import Benchmark
+    bench = Benchmark("test")
+    with pytest.raises(ValueError):
+        bench.run("stage", list, repeat=0)
+    assert bench.results == []
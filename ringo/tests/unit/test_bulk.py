@@ -0,0 +1,109 @@
+import sys
+import pytest
+import sqlalchemy as sa
+from mock import Mock
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from pyramid import testing
+from ringo.model.statemachine import Statemachine, State, \
+    null_handler as handler, null_condition as condition
+
+
+class BulkStatemachine(Statemachine):
+
+    shared = True
+
+    def setup(self):
+        s1 = State(self, 1, "New")
+        s2 = State(self, 2, "Open")
+        s3 = State(self, 3, "Archived",
+                   disabled_actions={"users": ["archive"]})
+        s1.add_transition(s2, "Open", handler, condition)
+        s2.add_transition(s3, "Archive", handler, condition)
+        s3.add_transition(s2, "Reopen", handler, condition)
+        return s1
+
+
+@pytest.fixture()
+def bulk():
+    """Returns the class of the items, the db session and a dummy
+    request. The db contains items with the ids 1 to 6. The items 1 to
+    3 are in state 1 (or have no state at all), the items 4 to 6 are in
+    state 2."""
+    from ringo.model.base import BaseItem
+    from ringo.model.mixins import StateMixin
+
+    Base = declarative_base()
+
+    class BulkItem(StateMixin, BaseItem, Base):
+        __tablename__ = "bulkitems"
+        _statemachines = {"state_id": BulkStatemachine}
+        id = sa.Column(sa.Integer, primary_key=True)
+        uid = sa.Column(sa.Integer)
+        gid = sa.Column(sa.Integer)
+        state_id = sa.Column(sa.Integer)
+
+    engine = sa.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    for id in range(1, 7):
+        state_id = None if id == 1 else 1 if id < 4 else 2
+        db.add(BulkItem(id=id, uid=1, gid=1, state_id=state_id))
+    db.commit()
+    return BulkItem, db, testing.DummyRequest(db=db)
+
+
+def test_can_bulk_delete(bulk):
+    from ringo.lib.sql.bulk import can_bulk_delete, bulk_delete
+    clazz, db, request = bulk
+    assert can_bulk_delete(clazz)
+    items = db.query(clazz).filter(clazz.id < 4).all()
+    assert bulk_delete(db, clazz, items) == 3
+    assert [item.id for item in db.query(clazz)] == [4, 5, 6]
+
+
+def test_can_bulk_delete_inheritance():
+    from ringo.lib.sql.bulk import can_bulk_delete
+
+    Base = declarative_base()
+
+    class Parent(Base):
+        __tablename__ = "parents"
+        id = sa.Column(sa.Integer, primary_key=True)
+        type = sa.Column(sa.String)
+        __mapper_args__ = {"polymorphic_on": type,
+                           "polymorphic_identity": "parent"}
+
+    class Child(Parent):
+        __tablename__ = "children"
+        id = sa.Column(sa.Integer, sa.ForeignKey("parents.id"),
+                       primary_key=True)
+        __mapper_args__ = {"polymorphic_identity": "child"}
+
+    # The rows in the other table would be left behind.
+    assert not can_bulk_delete(Parent)
+    assert not can_bulk_delete(Child)
+
+
+def test_action_filter_disabled_by_action_name(bulk, monkeypatch):
+    from ringo.views.base.list_ import _query_add_action_filter
+    clazz, db, request = bulk
+    db.query(clazz).filter(clazz.id == 6)\
+        .update({"state_id": 3}, synchronize_session=False)
+    role = Mock(admin=False)
+    role.name = "users"
+    action = Mock(admin=False, roles=[role], permission="update")
+    action.name = "Archive"
+    action.get_permission = lambda: "update"
+    modul = Mock(actions=[action])
+    # The list_ module is shadowed by the list_ view in ringo.views.base
+    monkeypatch.setattr(sys.modules["ringo.views.base.list_"],
+                        "get_item_modul", lambda request, clazz: modul)
+    user = Mock(id=1, roles=[role], groups=[])
+    user.has_role = lambda name: False
+    request.user = user
+    # The state disables the "archive" action which is checked with
+    # the "update" permission.
+    query = _query_add_action_filter(db.query(clazz), request, clazz,
+                                     "update")
+    assert sorted(item.id for item in query) == [1, 2, 3, 4, 5]
@@ -0,0 +1,186 @@
+import pytest
+
+
+class DummyCursor(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        self.connection.pings += 1
+
+    def close(self):
+        pass
+
+
+class DummyConnection(object):
+
+    def __init__(self):
+        self.pings = 0
+
+    def cursor(self):
+        return DummyCursor(self)
+
+
+class DummyRecord(object):
+
+    def __init__(self):
+        self.info = {}
+
+
+def test_ping_throttled():
+    from ringo.lib.sql.db import get_ping_connection
+    ping = get_ping_connection(30)
+    connection, record = DummyConnection(), DummyRecord()
+    ping(connection, record, None)
+    ping(connection, record, None)
+    assert connection.pings == 1
+
+
+def test_ping_every_checkout():
+    from ringo.lib.sql.db import get_ping_connection
+    ping = get_ping_connection(0)
+    connection, record = DummyConnection(), DummyRecord()
+    ping(connection, record, None)
+    ping(connection, record, None)
+    assert connection.pings == 2
+
+
+def test_unknown_disconnect_handling():
+    from ringo.lib.sql.db import get_disconnect_handling
+    assert get_disconnect_handling({}) == "ping"
+    with pytest.raises(ValueError):
+        get_disconnect_handling({"db.disconnect_handling": "foo"})
+
+
+def test_admin_disconnect_handling(monkeypatch):
+    from ringo.scripts import db
+    settings = {"sqlalchemy.url": "sqlite://",
+                "db.disconnect_handling": "optimistic"}
+    monkeypatch.setattr(db, "setup_logging", lambda config_file: None)
+    monkeypatch.setattr(db, "get_appsettings_",
+                        lambda config_file: settings)
+    monkeypatch.setattr(db, "setup_db_session", lambda engine: None)
+    engine = db.get_engine("test.ini")
+    assert len(engine.dispatch.handle_error) == 1
+
+
+def test_savedata_parallel(app_config, monkeypatch, capsys):
+    import json
+    import datetime
+    import argparse
+    import sqlalchemy as sa
+    from sqlalchemy.orm import sessionmaker
+    from ringo.scripts import db
+    from ringo.model.user import User
+    engine = sa.create_engine(app_config["sqlalchemy.url"])
+
+    def get_session(config_file, transactional=True):
+        return sessionmaker(bind=engine)()
+
+    monkeypatch.setattr(db, "get_session", get_session)
+    session = get_session(None)
+    admin = session.query(User).filter(User.login == "admin").one()
+    last_login = admin.last_login
+    admin.last_login = datetime.datetime(2020, 1, 31, 12, 30, 15, 500)
+    session.commit()
+    try:
+        outputs = []
+        for processes in [1, 2]:
+            args = argparse.Namespace(config="test.ini", modul="users",
+                                      filter=None, export_config=None,
+                                      format="json", processes=processes,
+                                      include_relations=False)
+            db.handle_db_savedata_command(args)
+            outputs.append(json.loads(capsys.readouterr()[0]))
+    finally:
+        admin.last_login = last_login
+        session.commit()
+    assert outputs[0] == outputs[1]
+    assert [user["last_login"] for user in outputs[0]
+            if user["login"] == "admin"] == ["2020-01-31 12:30:15"]
+
+
+@pytest.fixture()
+def routing():
+    """Returns a function to create a routing session, the mapped item
+    class and the engines of the primary and the replica. The database
+    of the primary contains an item named "primary" and the replica an
+    item named "replica"."""
+    import sqlalchemy as sa
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.ext.declarative import declarative_base
+    from ringo.lib.sql import db
+    from ringo.lib.sql.db import RoutingSession
+
+    Base = declarative_base()
+
+    class Item(Base):
+        __tablename__ = "items"
+        id = sa.Column(sa.Integer, primary_key=True)
+        name = sa.Column(sa.String)
+
+    primary = sa.create_engine("sqlite://")
+    replica = sa.create_engine("sqlite://")
+    for engine, name in [(primary, "primary"), (replica, "replica")]:
+        Base.metadata.create_all(engine)
+        engine.execute(Item.__table__.insert(), name=name)
+    db.replicas[:] = [replica]
+    session = sessionmaker(class_=RoutingSession, bind=primary)()
+    yield session, Item
+    session.close()
+    db.replicas[:] = []
+
+
+def _names(session, clazz):
+    from ringo.lib.sql.db import use_replica
+    with use_replica(session):
+        return sorted(item.name for item in session.query(clazz))
+
+
+def test_routing_read(routing):
+    session, Item = routing
+    assert _names(session, Item) == ["replica"]
+    assert sorted(i.name for i in session.query(Item)) == ["primary"]
+
+
+def test_routing_after_flush(routing):
+    session, Item = routing
+    assert _names(session, Item) == ["replica"]
+    session.add(Item(name="new"))
+    assert _names(session, Item) == ["new", "primary"]
+
+
+def test_routing_after_bulk_update(routing):
+    session, Item = routing
+    assert _names(session, Item) == ["replica"]
+    session.query(Item).update({"name": "changed"},
+                               synchronize_session=False)
+    assert _names(session, Item) == ["changed"]
+
+
+def test_routing_after_bulk_insert(routing):
+    session, Item = routing
+    session.bulk_insert_mappings(Item, [{"name": "new"}])
+    assert _names(session, Item) == ["new", "primary"]
+
+
+def test_routing_after_execute(routing):
+    import sqlalchemy as sa
+    session, Item = routing
+    session.execute(sa.text("DELETE FROM items"))
+    assert _names(session, Item) == []
+
+
+def test_routing_write_callback(routing):
+    session, Item = routing
+    calls = []
+    session.on_write(lambda: calls.append(True))
+    _names(session, Item)
+    assert calls == []
+    session.add(Item(name="new"))
+    session.flush()
+    session.query(Item).delete(synchronize_session=False)
+    assert calls == [True]
+    session.close()
+    assert _names(session, Item) == ["replica"]
@@ -26,6 +26,25 @@ def test_serialize_list():
     assert type(result) == unicode
 
 
+def test_deserialize_interval():
+    from ringo.lib.helpers import deserialize
+    from datetime import timedelta
+    result = deserialize("01:30:00", "datetime")
+    assert result == timedelta(hours=1, minutes=30)
+
+
+def test_deserialize_empty():
+    from ringo.lib.helpers import deserialize
+    assert deserialize("", "integer") is None
+    assert deserialize("", "text") == ""
+
+
+def test_deserialize_boolean():
+    from ringo.lib.helpers import deserialize
+    assert deserialize(True, "boolean") is True
+    assert deserialize("", "boolean") is None
+
+
 def test_import_ok():
     from ringo.lib.helpers import dynamic_import
     result = dynamic_import('ringo.model.base.BaseItem')
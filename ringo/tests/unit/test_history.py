@@ -0,0 +1,104 @@
+import pytest
+
+
+@pytest.mark.parametrize("data",
+                         [
+                             ("/profiles/list", False),
+                             ("/profiles/download/1", True),
+                             ("/ringo-static/css/ringo.css", True),
+                             ("/rest/profiles/1", True),
+                             ("/favicon.ico", True),
+                             ("/foo/list", True),
+                             ("/bar/foo", False),
+                         ])
+def test_ignore_matcher(data):
+    from ringo.lib.history import get_ignore_matcher
+    matcher = get_ignore_matcher({"app.history.ignore": "/foo,/baz"})
+    assert bool(matcher.match(data[0])) == data[1]
+
+
+class DummySession(dict):
+
+    saved = 0
+
+    def save(self):
+        self.saved += 1
+
+
+def _handle(path, response, history=None, xhr=False, view=None):
+    """Handles the history of a request on the given path returning the
+    given response. The optional view is called with the request
+    before. Returns the session."""
+    from pyramid import testing
+    from ringo.lib.history import History, handle_history, \
+        get_ignore_matcher
+    from ringo.lib.request.app import RingoRequest
+    request = testing.DummyRequest(path=path)
+    request.url = "http://example.com%s" % path
+    request.is_xhr = xhr
+    request.registry = testing.DummyResource(
+        settings={}, history_ignore_matcher=get_ignore_matcher({}))
+    request.session = DummySession()
+    if history is not None:
+        request.session["history"] = History(list(history))
+    request.ringo = RingoRequest(request)
+    if view:
+        view(request)
+    handle_history(request, response)
+    return request.session
+
+
+def _html():
+    from pyramid.response import Response
+    return Response("<html></html>", content_type="text/html")
+
+
+def _json():
+    from pyramid.response import Response
+    return Response("{}", content_type="application/json")
+
+
+def test_html_push():
+    session = _handle("/foo/list", _html(), ["/bar/list"])
+    assert session.saved == 1
+    assert session["history"].history == ["/bar/list", "/foo/list"]
+
+
+def test_html_unchanged():
+    session = _handle("/foo/list", _html(), ["/foo/list"])
+    assert session.saved == 0
+
+
+def test_json_not_written():
+    session = _handle("/foo/list", _json(), ["/bar/list"])
+    assert session.saved == 0
+    assert session["history"].history == ["/bar/list"]
+
+
+def test_xhr_not_written():
+    session = _handle("/foo/list", _html(), ["/bar/list"], xhr=True)
+    assert session.saved == 0
+    assert session["history"].history == ["/bar/list"]
+
+
+def test_redirect_with_pop():
+    from pyramid.httpexceptions import HTTPFound
+
+    def view(request):
+        assert request.ringo.history.pop() == "/bar/list"
+
+    session = _handle("/foo/delete/1", HTTPFound(location="/bar/list"),
+                      ["/baz/list", "/bar/list"], view=view)
+    assert session.saved == 1
+    assert session["history"].history == ["/baz/list", "/foo/delete/1"]
+
+
+def test_redirect_with_last():
+    from pyramid.httpexceptions import HTTPFound
+
+    def view(request):
+        assert request.ringo.history.last() == "/bar/list"
+
+    session = _handle("/foo/delete/1", HTTPFound(location="/bar/list"),
+                      ["/baz/list", "/bar/list"], view=view)
+    assert session.saved == 0
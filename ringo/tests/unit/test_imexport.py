@@ -0,0 +1,57 @@
+import pytest
+from StringIO import StringIO
+
+
+def iter_json(data, blocksize=4):
+    from ringo.lib.imexport import _iter_json
+    return list(_iter_json(StringIO(data), blocksize))
+
+
+def test_iter_json_array():
+    data = '[{"id": 1, "name": "foo"},\n {"id": 2, "name": "b]a}r"}]'
+    assert iter_json(data) == [{"id": 1, "name": "foo"},
+                               {"id": 2, "name": "b]a}r"}]
+
+
+def test_iter_json_empty_array():
+    assert iter_json(" [ ] ") == []
+
+
+def test_iter_json_single_object():
+    data = '{"id": 1, "data": {"list": [1, 2, {"x": "\\"}"}]}}\n'
+    assert iter_json(data) == [{"id": 1,
+                                "data": {"list": [1, 2, {"x": '"}'}]}}]
+
+
+def test_iter_json_lines():
+    data = '{"id": 1}\n{"id": 2}\n\n{"id": 3}\n'
+    assert iter_json(data) == [{"id": 1}, {"id": 2}, {"id": 3}]
+
+
+def test_iter_json_large_object():
+    data = '{"name": "%s"}\n{"id": 2}' % ("x" * 1000)
+    assert iter_json(data, 16) == [{"name": "x" * 1000}, {"id": 2}]
+
+
+@pytest.mark.parametrize("data", ['[{"id": 1}, {"id": 2}',
+                                  '[{"id": 1}, {"id": ',
+                                  '{"id": 1}\n{"id": "foo'])
+def test_iter_json_truncated(data):
+    with pytest.raises(ValueError):
+        iter_json(data)
+
+
+def test_iter_json_malformed():
+    from ringo.lib.imexport import _iter_json
+    infile = StringIO('{"id": 1}\n{"id": 2,}\n' + '{"id": 3}\n' * 1000)
+    items = _iter_json(infile, 16)
+    assert next(items) == {"id": 1}
+    with pytest.raises(ValueError):
+        next(items)
+    # The error is raised without reading the rest of the file.
+    assert infile.tell() < 100
+
+
+def test_iter_json_no_object():
+    with pytest.raises(ValueError):
+        iter_json('[1, 2]')
@@ -0,0 +1,80 @@
+def test_shape_in_clause():
+    from ringo.lib.instrumentation import get_shape
+    a = "SELECT * FROM users WHERE users.id IN (?, ?, ?)"
+    b = "SELECT * FROM users\n WHERE users.id IN (?)"
+    assert get_shape(a) == get_shape(b)
+
+
+def test_repeated_statements():
+    from ringo.lib.instrumentation import RequestStats
+    stats = RequestStats()
+    for i in range(11):
+        stats.add_query("SELECT * FROM users WHERE id = ?", 0.001)
+    stats.add_query("SELECT * FROM roles", 0.1)
+    assert stats.queries == 12
+    assert stats.get_repeated(10) == {"SELECT * FROM users WHERE id = ?": 11}
+    assert stats.get_slowest()[0] == (0.1, "SELECT * FROM roles")
+
+
+def test_cache_access():
+    from ringo.lib.instrumentation import (
+        start_recording,
+        stop_recording,
+        record_cache_access
+    )
+    from ringo.lib.cache import Cache
+    cache = Cache()
+    cache.set("foo", "bar")
+    start_recording()
+    cache.get("foo")
+    cache.get("baz")
+    stats = stop_recording()
+    record_cache_access(True)
+    assert stats.cache_hits == 1
+    assert stats.cache_misses == 1
+
+
+def test_no_route():
+    from pyramid import testing
+    from pyramid.response import Response
+    from ringo.lib.instrumentation import (
+        get_statistics,
+        reset_statistics,
+        NO_ROUTE
+    )
+    from ringo.tweens.instrumentation import instrumentation_factory
+    registry = testing.DummyResource(settings={})
+    tween = instrumentation_factory(lambda request: Response(), registry)
+    reset_statistics()
+    for path in ["/foo", "/bar"]:
+        request = testing.DummyRequest(path=path)
+        request.matched_route = None
+        tween(request)
+    assert get_statistics().keys() == [NO_ROUTE]
+    assert get_statistics()[NO_ROUTE]["requests"] == 2
+    reset_statistics()
+
+
+def test_reset_statistics_view():
+    from mock import Mock
+    from pyramid import testing
+    from ringo.lib.instrumentation import (
+        RequestStats,
+        aggregate,
+        get_statistics,
+        reset_statistics
+    )
+    from ringo.views.api import instrumentation, reset_instrumentation
+    reset_statistics()
+    aggregate("home", RequestStats(), 10)
+    request = testing.DummyRequest(params={"reset": "1"})
+    request.user = Mock()
+    request.user.has_role = lambda name: name == "admin"
+    # Reading the statistics does not reset them.
+    assert "home" in instrumentation(request)._data
+    assert "home" in get_statistics()
+    request = testing.DummyRequest(post={})
+    request.user = Mock()
+    request.user.has_role = lambda name: name == "admin"
+    assert "home" in reset_instrumentation(request)._data
+    assert get_statistics() == {}
@@ -0,0 +1,113 @@
+import sys
+import json
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from pyramid import testing
+
+NAMES = ["foo", "Foobar", "bar", "50%", "500", "5_0", "5x0", "x_y", "a\\b"]
+# Values of different types for the items with the same position in
+# NAMES. The last item has no value at all.
+VALUES = [10, 5, 10.5, True, False, None, "10", "2020-01-31"]
+
+
+class DummyTableConfig(object):
+
+    def get_columns(self):
+        return [{"name": "name"}, {"name": "secret", "searchable": False},
+                {"name": "value"}, {"name": "tags"}]
+
+    def get_renderer(self, col):
+        return None
+
+
+@pytest.fixture()
+def search(monkeypatch):
+    """Returns a function to search the blob items in SQL and in the
+    application. The function returns the names of the found items for
+    both searches. The SQL result is None if the search can not be done
+    in SQL. The search in the application can be skipped."""
+    from ringo.model.base import BaseItem, BaseList
+    from ringo.model.mixins import Blob
+    from ringo.views.base.list_ import _query_add_search_filter
+
+    Base = declarative_base()
+
+    class SearchItem(Blob, BaseItem, Base):
+        __tablename__ = "searchitems"
+        id = sa.Column(sa.Integer, primary_key=True)
+
+    engine = sa.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    for num, name in enumerate(NAMES):
+        data = {"name": name, "secret": name}
+        if num < len(VALUES):
+            data["value"] = VALUES[num]
+        if num == 0:
+            data["tags"] = ["foo", "bar"]
+        db.add(SearchItem(id=num, data=json.dumps(data)))
+    db.commit()
+    config = DummyTableConfig()
+    # The list_ module is shadowed by the list_ view in ringo.views.base
+    for modul in ["ringo.views.base.list_", "ringo.model.base"]:
+        monkeypatch.setattr(sys.modules[modul], "get_table_config",
+                            lambda clazz, table=None: config)
+    request = testing.DummyRequest(db=db)
+
+    def search(stack, application=True):
+        query = _query_add_search_filter(db.query(SearchItem), request,
+                                         SearchItem, stack, "overview")
+        if query is not None:
+            query = sorted(item.name for item in query)
+        if not application:
+            return query, None
+        items = BaseList(SearchItem, db, items=db.query(SearchItem).all())
+        items.filter(stack, None)
+        return query, sorted(item.name for item in items.items)
+    return search
+
+
+@pytest.mark.parametrize("stack", [
+    [("foo", "name", False)],
+    [("FOO", "name", False)],
+    [("50%", "name", False)],
+    [("5_0", "name", False)],
+    [("_", "name", False)],
+    [("\\", "name", False)],
+    [("> m", "name", False)],
+    [("!= bar", "name", False)],
+    [("o", "name", False), ("bar", "name", False)],
+    [("10", "value", False)],
+    [("true", "value", False)],
+    [("2020", "value", False)],
+    [("== 10", "value", False)],
+    [("!= 10", "value", False)],
+    [("> 5", "value", False)],
+    [("== True", "value", False)],
+    [("== None", "value", False)],
+    [("!= None", "value", False)],
+    [("== 10.5", "value", False)],
+    [("< 2020-02-01", "value", False)],
+])
+def test_search_sql_equals_application(search, stack):
+    sql, application = search(stack)
+    assert sql is not None
+    assert sql == application
+
+
+def test_search_not_searchable_column(search):
+    sql, application = search([("foo", "secret", False)], False)
+    assert sql is None
+
+
+def test_search_escape_like(search):
+    sql, application = search([("5_0", "name", False)], False)
+    assert sql == ["5_0"]
+
+
+def test_search_container_values(search):
+    sql, application = search([("foo", "tags", False)])
+    assert sql is None
+    assert application == ["foo"]
@@ -0,0 +1,108 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+
+# Tree of the nodes as (id, parent_id):
+#
+#   1 -+- 2 -+- 4
+#      |     +- 5 --- 6
+#      +- 3
+#   7
+TREE = [(1, None), (2, 1), (3, 1), (4, 2), (5, 2), (6, 5), (7, None)]
+
+
+@pytest.yield_fixture()
+def nodes(app_config):
+    """Returns a session and a tuple of two nested classes. The second
+    class is a joined table subclass of the first one. The tree of
+    nodes is stored for both classes. The tables are created in the
+    database of the application and removed by a rollback."""
+    from ringo.model.mixins import Nested
+
+    Base = declarative_base()
+
+    class Node(Nested, Base):
+        __tablename__ = "testnodes"
+        id = sa.Column(sa.Integer, primary_key=True)
+        type = sa.Column(sa.String)
+        __mapper_args__ = {"polymorphic_on": type,
+                           "polymorphic_identity": "node"}
+
+    class SpecialNode(Node):
+        __tablename__ = "testspecialnodes"
+        id = sa.Column(sa.Integer, sa.ForeignKey("testnodes.id"),
+                       primary_key=True)
+        __mapper_args__ = {"polymorphic_identity": "special"}
+
+    engine = sa.engine_from_config(app_config, "sqlalchemy.")
+    connection = engine.connect()
+    transaction = connection.begin()
+    Base.metadata.create_all(connection)
+    db = sessionmaker(bind=connection)()
+    for clazz, offset in [(Node, 0), (SpecialNode, 100)]:
+        for id, parent_id in TREE:
+            db.add(clazz(id=id + offset,
+                         parent_id=parent_id and parent_id + offset))
+    db.flush()
+    yield db, (Node, SpecialNode)
+    db.close()
+    transaction.rollback()
+    connection.close()
+
+
+def ids(items, offset):
+    return [item.id - offset for item in items]
+
+
+@pytest.mark.parametrize("num, offset", [(0, 0), (1, 100)])
+def test_get_children(nodes, num, offset):
+    db, classes = nodes
+    clazz = classes[num]
+    item = db.query(clazz).get(1 + offset)
+    assert ids(item.get_children(), offset) == [2, 3, 4, 5, 6]
+    item = db.query(clazz).get(5 + offset)
+    assert ids(item.get_children(), offset) == [6]
+    item = db.query(clazz).get(7 + offset)
+    assert item.get_children() == []
+
+
+@pytest.mark.parametrize("num, offset", [(0, 0), (1, 100)])
+def test_get_parents(nodes, num, offset):
+    db, classes = nodes
+    clazz = classes[num]
+    item = db.query(clazz).get(6 + offset)
+    assert ids(item.get_parents(), offset) == [5, 2, 1]
+    item = db.query(clazz).get(1 + offset)
+    assert item.get_parents() == []
+
+
+@pytest.mark.parametrize("num, offset", [(0, 0), (1, 100)])
+def test_tree_filter(nodes, num, offset):
+    db, classes = nodes
+    clazz = classes[num]
+    query = db.query(clazz).order_by(clazz.id)
+    result = query.filter(clazz.subtree_filter(2 + offset))
+    assert ids(result, offset) == [4, 5, 6]
+    result = query.filter(clazz.subtree_filter(2 + offset, True))
+    assert ids(result, offset) == [2, 4, 5, 6]
+    result = query.filter(clazz.ancestors_filter(6 + offset))
+    assert ids(result, offset) == [1, 2, 5]
+    result = query.filter(clazz.ancestors_filter(6 + offset, True))
+    assert ids(result, offset) == [1, 2, 5, 6]
+
+
+def test_get_children_not_persistent():
+    from ringo.model.mixins import Nested
+
+    Base = declarative_base()
+
+    class Node(Nested, Base):
+        __tablename__ = "testnodes"
+        id = sa.Column(sa.Integer, primary_key=True)
+
+    root = Node()
+    child = Node(parent=root)
+    grandchild = Node(parent=child)
+    assert root.get_children() == [child, grandchild]
+    assert grandchild.get_parents() == [child, root]
@@ -0,0 +1,30 @@
+import time
+import threading
+
+
+def test_collapse_stack():
+    import sys
+    from ringo.lib.profiling import collapse_stack
+    stack = collapse_stack(sys._getframe())
+    names = stack.split(";")
+    assert names[-1] == "test_profiling.py:test_collapse_stack"
+
+
+def test_sampler(tmpdir):
+    from ringo.lib.profiling import Sampler
+
+    def busy():
+        end = time.time() + 0.1
+        while time.time() < end:
+            pass
+
+    sampler = Sampler(threading.current_thread().ident, 0.001)
+    sampler.start()
+    busy()
+    sampler.stop()
+    assert [s for s in sampler.stacks if "busy" in s]
+    path = tmpdir.join("profile.collapsed")
+    sampler.write(str(path))
+    for line in path.readlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
@@ -91,3 +91,27 @@ def test_equal_values(modulrequest):
     checker = ValueChecker()
     values = modulrequest.context.item.get_values(include_relations=True)
     checker.check(modulrequest.context.item.__class__, values, modulrequest, modulrequest.context.item)
+
+
+def test_is_member_loads_groups_once(apprequest):
+    import sqlalchemy as sa
+    from ringo.model.user import User, Usergroup, Role
+    db = apprequest.db
+    user = db.query(User).filter(User.login == "admin").one()
+    group = db.query(Usergroup).get(1)
+    items = db.query(Role).all() + db.query(Usergroup).all()
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    sa.event.listen(db.bind, "before_cursor_execute", count)
+    try:
+        assert not any(item.is_member(user) for item in items)
+        # Only the groups of the user are loaded.
+        assert len(statements) == 1
+        user.groups.append(group)
+        assert all(item.is_member(user) for item in items)
+        assert len(statements) == 1
+    finally:
+        sa.event.remove(db.bind, "before_cursor_execute", count)
+        db.rollback()
@@ -0,0 +1,64 @@
+import time
+import pytest
+from pyramid import testing
+
+SETTINGS = {"session.type": "memory",
+            "session.key": "ringo",
+            "session.secret": "secret"}
+
+
+@pytest.fixture()
+def saves(monkeypatch):
+    """Records the calls of the save method of the beaker session
+    which writes the session into the backend."""
+    from beaker.session import Session
+    calls = []
+    save = Session.save
+
+    def record_save(self, accessed_only=False):
+        calls.append(accessed_only)
+        return save(self, accessed_only)
+    monkeypatch.setattr(Session, "save", record_save)
+    return calls
+
+
+def get_session(**settings):
+    from ringo.lib.session import get_session_factory
+    settings.update(SETTINGS)
+    return get_session_factory(settings)(testing.DummyRequest())
+
+
+def test_unchanged_session_not_saved(saves):
+    session = get_session()
+    session.get("foo")
+    session.save()
+    assert not session.has_changed()
+    session.persist()
+    assert not session.dirty()
+    assert saves == []
+
+
+def test_unchanged_session_with_timeout_not_saved(saves):
+    session = get_session(**{"session.timeout": "1800"})
+    session.get("foo")
+    session._session().last_accessed = time.time() - 60
+    session.save()
+    session.persist()
+    assert saves == []
+
+
+def test_access_time_saved_after_half_timeout(saves):
+    session = get_session(**{"session.timeout": "1800"})
+    session.get("foo")
+    session._session().last_accessed = time.time() - 1000
+    session.persist()
+    assert saves == [True]
+
+
+def test_changed_session_saved(saves):
+    session = get_session()
+    session["foo"] = "bar"
+    session.save()
+    assert session.has_changed()
+    session.persist()
+    assert saves == [False]
@@ -0,0 +1,132 @@
+import pytest
+
+
+def test_serialize_small():
+    from ringo.lib.sessionstore import dumps, loads
+    data = {"profiles.list.sort_field": "last_name"}
+    value = dumps(data)
+    assert value.startswith("p")
+    assert loads(value) == data
+
+
+def test_serialize_compressed():
+    from ringo.lib.sessionstore import dumps, loads, COMPRESS_THRESHOLD
+    data = {"history": ["/profiles/list"] * COMPRESS_THRESHOLD}
+    value = dumps(data)
+    assert value.startswith("z")
+    assert len(value) < COMPRESS_THRESHOLD
+    assert loads(value) == data
+
+
+def test_lru_cache():
+    from ringo.lib.sessionstore import LRUCache
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+@pytest.fixture()
+def engine(monkeypatch):
+    """Returns a SQLite engine with the sessions table which is used by
+    the SQL session store."""
+    import sqlalchemy as sa
+    from ringo.lib import sessionstore
+    engine = sa.create_engine("sqlite://")
+    sessionstore.table.create(engine)
+    monkeypatch.setattr(sessionstore, "_get_engine", lambda: engine)
+    return engine
+
+
+def get_updated(engine, id):
+    import sqlalchemy as sa
+    from ringo.lib.sessionstore import table
+    return engine.execute(sa.select([table.c.updated])
+                          .where(table.c.id == id)).scalar()
+
+
+def test_sql_namespace_store_and_load(engine):
+    from ringo.lib.sessionstore import SQLNamespaceManager
+    manager = SQLNamespaceManager("abc")
+    manager.acquire_write_lock()
+    manager["session"] = {"foo": "bar"}
+    manager.release_write_lock()
+    assert get_updated(engine, "abc") is not None
+
+    manager = SQLNamespaceManager("abc")
+    assert "session" in manager
+    assert manager["session"] == {"foo": "bar"}
+    assert "session" not in SQLNamespaceManager("xyz")
+
+
+def test_sql_namespace_update(engine):
+    from ringo.lib.sessionstore import SQLNamespaceManager
+    for value in ["foo", "bar"]:
+        manager = SQLNamespaceManager("abc")
+        manager["session"] = value
+        manager.release_write_lock()
+    assert SQLNamespaceManager("abc")["session"] == "bar"
+
+
+def test_sql_namespace_unchanged_not_stored(engine):
+    from ringo.lib.sessionstore import SQLNamespaceManager
+    manager = SQLNamespaceManager("abc")
+    assert "session" not in manager
+    manager.release_write_lock()
+    assert get_updated(engine, "abc") is None
+
+
+def test_sql_namespace_delete(engine):
+    from ringo.lib.sessionstore import SQLNamespaceManager
+    manager = SQLNamespaceManager("abc")
+    manager["session"] = "foo"
+    manager.release_write_lock()
+    manager.do_remove()
+    assert get_updated(engine, "abc") is None
+    assert "session" not in SQLNamespaceManager("abc")
+
+
+def test_sql_purge(engine):
+    import datetime
+    from ringo.lib.sessionstore import table, store, purge
+    store("old", "pfoo", 60)
+    store("new", "pbar", 60)
+    updated = datetime.datetime.utcnow() - datetime.timedelta(seconds=120)
+    engine.execute(table.update().where(table.c.id == "old")
+                   .values(updated=updated))
+    assert purge(60) == 1
+    assert get_updated(engine, "old") is None
+    assert get_updated(engine, "new") is not None
+
+
+def test_purge_age_from_timeout():
+    from ringo.lib.session import _get_session_settings
+    settings = _get_session_settings({"session.type": "ringo_sql",
+                                      "session.timeout": "1800"})
+    assert settings["session.purge_age"] == "1800"
+    settings = _get_session_settings({"session.type": "ringo_sql",
+                                      "session.timeout": "1800",
+                                      "session.purge_age": "3600"})
+    assert settings["session.purge_age"] == "3600"
+    settings = _get_session_settings({"session.type": "file",
+                                      "session.timeout": "1800"})
+    assert "session.purge_age" not in settings
+
+
+def test_sql_namespace_purge_age():
+    from ringo.lib.sessionstore import SQLNamespaceManager, DEFAULT_MAX_AGE
+    assert SQLNamespaceManager("abc", purge_age="1800").store.purge_age == 1800
+    assert SQLNamespaceManager("abc").store.purge_age == DEFAULT_MAX_AGE
+
+
+def test_memory_store_per_configuration():
+    from ringo.lib.sessionstore import MemoryNamespaceManager
+    first = MemoryNamespaceManager("abc", lru_size=10)
+    assert MemoryNamespaceManager("xyz", lru_size=10).store is first.store
+    other = MemoryNamespaceManager("abc", lru_size=20)
+    assert other.store is not first.store
+    assert other.store.cache.size == 20
@@ -21,6 +21,8 @@ class DummyItem(object):
 
 class DummyStatemachine(Statemachine):
 
+    shared = True
+
     def setup(self):
         s1 = State(self, 1, "Unconfirmed")
         s2 = State(self, 2, "New")
@@ -99,6 +101,93 @@ class TestSequenceFunctions(unittest.TestCase):
         labels = ", ".join([s._label for s in transitions])
         self.assertEqual(labels, "Resolve")
 
+    def test_shared_definition(self):
+        other = DummyStatemachine(DummyItem(2), 'state')
+        root, states = DummyStatemachine.get_definition()
+        self.assertTrue(len(states) == 7)
+        self.assertIs(self.sm.get_state()._state, root)
+        self.assertIs(other.get_state()._state, states[2])
+        self.assertEqual(other.get_state(), states[2])
+
+    def test_condition_item(self):
+        items = []
+
+        def _condition(item, transition):
+            items.append(item)
+            return True
+
+        class ConditionStatemachine(Statemachine):
+            def setup(self):
+                s1 = State(self, 1, "On")
+                s2 = State(self, 2, "Off")
+                s1.add_transition(s2, "Turn off", handler, _condition)
+                s2.add_transition(s1, "Turn on", handler, _condition)
+                return s1
+
+        item1, item2 = DummyItem(1), DummyItem(2)
+        ConditionStatemachine(item1, 'state').get_state().get_transitions()
+        ConditionStatemachine(item2, 'state').get_state().get_transitions()
+        self.assertEqual(items, [item1, item2])
+
+    def test_disabled_actions_matrix(self):
+        class DisabledStatemachine(Statemachine):
+            shared = True
+
+            def setup(self):
+                s1 = State(self, 1, "Draft",
+                           disabled_actions={"user": ["Read", "update"]})
+                s2 = State(self, 2, "Published",
+                           disabled_actions={"user": ["update"]})
+                s1.add_transition(s2, "Publish", handler, condition)
+                return s1
+
+        matrix = DisabledStatemachine.get_disabled_actions_matrix()
+        self.assertEqual(matrix[(1, "user")], frozenset(["read", "update"]))
+        self.assertEqual(matrix[(2, "user")], frozenset(["update"]))
+        self.assertNotIn((1, "admin"), matrix)
+        self.assertEqual(DisabledStatemachine.get_disabling_states("read",
+                                                                   "user"),
+                         set([1]))
+
+    def test_bound_state_delegates(self):
+        class DescriptionState(State):
+            def get_description(self, user=None):
+                return "Description of %s" % self._label
+
+        class DescriptionStatemachine(Statemachine):
+            shared = True
+
+            def setup(self):
+                s1 = DescriptionState(self, 1, "On")
+                s2 = DescriptionState(self, 2, "Off")
+                s1.add_transition(s2, "Turn off", handler, condition)
+                return s1
+
+        state = DescriptionStatemachine(DummyItem(1), 'state').get_state()
+        self.assertEqual(state.get_description(), "Description of On")
+        end = state.get_transitions()[0].get_end()
+        self.assertEqual(end.get_description(), "Description of Off")
+
+    def test_unshared_statemachine(self):
+        # Statemachines are not shared on default.
+        class ItemStatemachine(Statemachine):
+            def setup(self):
+                s1 = State(self, 1, "Item %s" % self._item.testdata,
+                           disabled_actions={"user": ["update"]})
+                s2 = State(self, 2, "Off")
+                s1.add_transition(s2, "Turn off", handler, condition)
+                return s1
+
+        item = DummyItem(1)
+        item.testdata = "bar"
+        sm = ItemStatemachine(item, 'state')
+        self.assertEqual(sm.get_state()._label, "Item bar")
+        self.assertEqual(len(sm.get_states()), 2)
+        self.assertEqual(ItemStatemachine.get_definition(), (None, {}))
+        self.assertEqual(sm.get_item_disabled_actions_matrix(),
+                         {(1, "user"): frozenset(["update"])})
+        self.assertEqual(sm.set_state(2)._id, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
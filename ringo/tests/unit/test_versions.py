@@ -0,0 +1,145 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+
+VALUES = [
+    {"id": 1, "name": "foo", "data": "{}"},
+    {"id": 1, "name": "bar", "data": "{}"},
+    {"id": 1, "name": "bar", "data": "{}", "extra": "baz"},
+    {"id": 1, "name": "bar", "data": "{}"},
+    {"id": 1, "name": "bar"},
+    {"id": 1, "name": None, "data": "{\"x\": 1}"},
+    {"id": 1, "name": None, "data": "{\"x\": 1}"},
+]
+
+
+class DummyRegistry(object):
+
+    def __init__(self, interval):
+        self.settings = {"versions.snapshot_interval": interval}
+
+
+class DummyUser(object):
+
+    def __init__(self, login):
+        self.login = login
+
+
+class DummyRequest(object):
+
+    def __init__(self, db, interval, login="admin"):
+        self.db = db
+        self.registry = DummyRegistry(interval)
+        self.user = DummyUser(login)
+
+
+@pytest.yield_fixture()
+def versioned():
+    """Returns a session and a versioned class. The item with id 1
+    exists in the database. The values of the item are taken from its
+    `values` attribute."""
+    from ringo.model import Base as RingoBase
+    from ringo.model.mixins import Version, Versioned
+
+    Base = declarative_base()
+
+    class VersionedItem(Versioned, Base):
+        __tablename__ = "versioneditems"
+        id = sa.Column(sa.Integer, primary_key=True)
+
+        values = {}
+
+        def get_values(self, serialized=False):
+            return dict(self.values)
+
+    nm_table = VersionedItem.versions.property.secondary
+    engine = sa.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Version.__table__.create(engine)
+    nm_table.create(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(VersionedItem(id=1))
+    db.commit()
+    yield db, VersionedItem
+    db.close()
+    # The nm table has been added to the metadata of ringo.
+    RingoBase.metadata.remove(nm_table)
+
+
+def _save_versions(db, clazz, interval, values=VALUES, logins=None):
+    item = db.query(clazz).get(1)
+    for num, item.values in enumerate(values):
+        login = logins[num] if logins else "admin"
+        clazz.update_handler(DummyRequest(db, interval, login), item)
+    db.commit()
+    return item
+
+
+@pytest.mark.parametrize("interval", [1, 2, 3, 10])
+def test_roundtrip(versioned, interval):
+    from ringo.model.mixins import _build_values
+    item = _save_versions(*versioned, interval=interval)
+    assert len(item.versions) == len(VALUES)
+    for version, values in zip(item.versions, VALUES):
+        chain = item._get_version_chain(version.id)
+        assert chain[-1] is version
+        assert _build_values(chain) == values
+
+
+def test_snapshot_interval(versioned):
+    item = _save_versions(*versioned, interval=3)
+    snapshots = [v.snapshot for v in item.versions]
+    assert snapshots == [True, False, False, True, False, False, True]
+    # Only the versions since the last snapshot are loaded.
+    assert item._get_version_chain() == item.versions[-1:]
+    assert item._get_version_chain(item.versions[5].id) == \
+        item.versions[3:6]
+
+
+def test_delta_tracks_deleted_keys(versioned):
+    item = _save_versions(*versioned, interval=10)
+    assert item.versions[3].get_values() == {}
+    assert item.versions[3].get_deleted() == ["extra"]
+    assert item.versions[4].get_deleted() == ["data"]
+    assert item.versions[5].get_values() == {"name": None,
+                                             "data": "{\"x\": 1}"}
+
+
+def test_versions_not_loaded(versioned):
+    db, clazz = versioned
+    _save_versions(db, clazz, 3, VALUES[:2])
+    db.expire_all()
+    item = db.query(clazz).get(1)
+    item.values = VALUES[2]
+    clazz.update_handler(DummyRequest(db, 3), item)
+    assert "versions" not in item.__dict__
+    assert len(item.versions) == 3
+
+
+def test_previous_values(versioned):
+    item = _save_versions(*versioned, interval=2, values=VALUES[:4],
+                          logins=["foo", "bar", "foo", "baz"])
+    ids = [version.id for version in item.versions]
+    # Values of the version before the current one.
+    assert item.get_previous_values() == VALUES[2]
+    assert item.get_previous_values(author="bar")["name"] == "bar"
+    assert "extra" not in item.get_previous_values(author="bar")
+    assert item.get_previous_values(author="foo")["extra"] == "baz"
+    assert item.get_previous_values(id=ids[0])["name"] == "foo"
+    # The first version if nothing matches.
+    assert item.get_previous_values(author="baz")["name"] == "foo"
+
+
+def test_previous_values_single_version(versioned):
+    item = _save_versions(*versioned, interval=10, values=VALUES[:1])
+    assert item.get_previous_values() == {}
+    assert item.get_previous_values(author="admin") == {}
+
+
+def test_snapshot_replaces_values():
+    from ringo.model.mixins import Version
+    version = Version()
+    version.set_values({"name": "foo"})
+    assert version.apply({"name": "bar", "extra": 1}) == {"name": "foo"}
+    assert version.get_deleted() == []
@@ -0,0 +1,13 @@
+from ringo.config import static_urls
+from ringo.lib.history import handle_history
+
+
+def history_factory(handler, registry):
+    def history_tween(request):
+        response = handler(request)
+        # The tween runs before the response callbacks of the request.
+        # So the history is written before the session is persisted.
+        if not static_urls.match(request.path):
+            handle_history(request, response)
+        return response
+    return history_tween
@@ -0,0 +1,55 @@
+import logging
+from ringo.config import static_urls
+from ringo.lib.instrumentation import (
+    start_recording,
+    stop_recording,
+    aggregate,
+    NO_ROUTE
+)
+
+log = logging.getLogger(__name__)
+
+
+def instrumentation_factory(handler, registry):
+    settings = registry.settings
+    threshold = int(settings.get("instrumentation.n_plus_one", 10))
+    slow_request = float(settings.get("instrumentation.slow_request", 500))
+    add_headers = settings.get("instrumentation.headers") == "true"
+
+    def instrumentation_tween(request):
+        if static_urls.match(request.path):
+            return handler(request)
+        stats = start_recording()
+        try:
+            response = handler(request)
+        finally:
+            stop_recording()
+        route = request.matched_route
+        name = route.name if route else NO_ROUTE
+        aggregate(name, stats, threshold)
+
+        db_time = stats.duration * 1000
+        repeated = stats.get_repeated(threshold)
+        msg = ("%s %s: %s queries in %.1f ms, cache %s hits / %s misses"
+               % (request.method, request.path, stats.queries, db_time,
+                  stats.cache_hits, stats.cache_misses))
+        if repeated or db_time > slow_request:
+            log.warning(msg)
+            for shape, count in repeated.iteritems():
+                log.warning("Possible N+1: %s times: %s" % (count, shape))
+            for duration, shape in stats.get_slowest():
+                log.warning("Slow query: %.1f ms: %s"
+                            % (duration * 1000, shape))
+        else:
+            log.debug(msg)
+
+        if add_headers:
+            response.headers["X-Ringo-Queries"] = str(stats.queries)
+            response.headers["X-Ringo-DB-Time"] = "%.1f" % db_time
+            response.headers["X-Ringo-Cache-Hits"] = str(stats.cache_hits)
+            response.headers["X-Ringo-Cache-Misses"] = \
+                str(stats.cache_misses)
+            response.headers["X-Ringo-Repeated-Queries"] = \
+                str(len(repeated))
+        return response
+    return instrumentation_tween
@@ -0,0 +1,29 @@
+import logging
+from ringo.config import static_urls
+from ringo.lib.profiling import (
+    HEADER,
+    get_profile_directory,
+    is_requested,
+    profile
+)
+
+log = logging.getLogger(__name__)
+
+
+def profiling_factory(handler, registry):
+    settings = registry.settings
+    secret = settings.get("profiling.secret")
+    mode = settings.get("profiling.mode", "cprofile")
+    interval = float(settings.get("profiling.interval", 5)) / 1000
+    directory = get_profile_directory(settings)
+
+    def profiling_tween(request):
+        if static_urls.match(request.path):
+            return handler(request)
+        if not is_requested(request, secret):
+            return handler(request)
+        response, filename = profile(request, handler, mode,
+                                     directory, interval)
+        response.headers[HEADER] = filename
+        return response
+    return profiling_tween
@@ -2,12 +2,14 @@
 functions usually called by the client"""
 import logging
 from pyramid.response import Response
+from pyramid.httpexceptions import HTTPForbidden
 from pyramid.view import view_config
 
 from formbar.form import Form
 from formbar.config import Config, parse
 from formbar.rules import Rule
 
+from ringo.lib.instrumentation import get_statistics, reset_statistics
 from ringo.views.response import JSONResponse
 from ringo.views.helpers import set_current_form_page as save_form_page
 
@@ -78,3 +80,29 @@ def set_current_form_page(request):
     if page and tablename and itemid:
         save_form_page(tablename, itemid, page, request)
     return Response(body='OK', content_type='text/plain')
+
+
+@view_config(route_name='instrumentation',
+             renderer='json',
+             request_method="GET")
+def instrumentation(request):
+    """Returns the aggregated number of SQL queries, time spent in the
+    database and cache hits per route. Only available for admins. See
+    :mod:`ringo.lib.instrumentation`."""
+    if not request.user or not request.user.has_role("admin"):
+        raise HTTPForbidden()
+    return JSONResponse(True, get_statistics())
+
+
+@view_config(route_name='instrumentation',
+             renderer='json',
+             request_method="POST")
+def reset_instrumentation(request):
+    """Resets the aggregated statistics of the instrumentation and
+    returns the statistics before the reset. Only available for
+    admins."""
+    if not request.user or not request.user.has_role("admin"):
+        raise HTTPForbidden()
+    statistics = get_statistics()
+    reset_statistics()
+    return JSONResponse(True, statistics)
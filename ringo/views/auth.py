@@ -114,6 +114,8 @@ def logout(request):
         log.info("Logout successfull '%s'" % (request.user.login))
         msg = _("Logout was successfull")
         headers = forget(request)
+        # The pages in the history are not accessible after the logout.
+        request.session.pop('history', None)
         request.session.flash(msg, 'success')
         return HTTPFound(location=target_url, headers=headers)
     return HTTPFound(location=target_url)
@@ -3,10 +3,19 @@ import sqlalchemy as sa
 import re
 from pyramid.httpexceptions import HTTPFound
 from ringo.lib.sql.cache import invalidate_cache
+from ringo.lib.sql.bulk import can_bulk_delete, bulk_delete
 from ringo.lib.renderer import ConfirmDialogRenderer, InfoDialogRenderer
 from ringo.lib.helpers import (
-    get_item_modul
+    get_item_modul,
+    dynamic_import
 )
+from ringo.lib.jobs import (
+    is_enabled,
+    get_threshold,
+    enqueue,
+    register_job_handler
+)
+from ringo.views.jobs import render_job_dialog
 from ringo.views.response import JSONResponse
 from ringo.views.request import (
     handle_callback,
@@ -74,14 +83,32 @@ def _handle_delete_request(request, items, callback):
     if request.method == 'POST' and request.ringo.params.confirmed:
         item_label = get_item_modul(request, clazz).get_label(plural=True)
         mapping = {'item_type': item_label, 'num': len(items)}
-        for item in items:
-            handle_callback(request, callback, item=item, mode="pre,default")
-            request.db.delete(item)
-            handle_callback(request, callback, item=item, mode="post")
-        # Invalidate cache
-        invalidate_cache()
+        settings = request.registry.settings
+        if (callback is None and is_enabled(settings)
+           and len(items) > get_threshold(settings)):
+            # Delete large number of items in a background job.
+            job = enqueue(request.db, "delete",
+                          {"clazzpath": get_item_modul(request,
+                                                       clazz).clazzpath,
+                           "ids": [item.id for item in items]},
+                          request.user)
+            return render_job_dialog(request, job)
         try:
-            request.db.flush()
+            if callback is None and can_bulk_delete(clazz):
+                # Nothing to do per item. Delete the items with set
+                # based statements.
+                request.db.flush()
+                bulk_delete(request.db, clazz, items)
+            else:
+                for item in items:
+                    handle_callback(request, callback, item=item,
+                                    mode="pre,default")
+                    request.db.delete(item)
+                    handle_callback(request, callback, item=item,
+                                    mode="post")
+                request.db.flush()
+            # Invalidate cache
+            invalidate_cache()
         except (sa.exc.CircularDependencyError, sa.exc.IntegrityError) as e:
             mapping["error"] = e.message.decode("utf-8")
             title = _("Can not delete ${item_type} items.",
@@ -100,8 +127,8 @@ def _handle_delete_request(request, items, callback):
             return rvalue
 
         msg = _('Deleted ${num} ${item_type} successfully.', mapping=mapping)
-        log_msg = u'User {user.login} deleted {item_label} {item.id}' \
-            .format(item_label=item_label, item=item, user=request.user)
+        log_msg = u'User {user.login} deleted {num} {item_label}' \
+            .format(item_label=item_label, num=len(items), user=request.user)
         log.info(log_msg)
         request.session.flash(msg, 'success')
         # Handle redirect after success.
@@ -115,6 +142,26 @@ def _handle_delete_request(request, items, callback):
         return rvalue
 
 
+def _delete_job(context):
+    """Job handler to delete the items with the given ids."""
+    db = context.request.db
+    clazz = dynamic_import(context.params["clazzpath"])
+    ids = context.params["ids"]
+    bulk = can_bulk_delete(clazz)
+    chunksize = 500
+    for start in range(0, len(ids), chunksize):
+        chunk = ids[start:start + chunksize]
+        items = db.query(clazz).filter(clazz.id.in_(chunk)).all()
+        if bulk:
+            bulk_delete(db, clazz, items)
+        else:
+            for item in items:
+                db.delete(item)
+            db.flush()
+        context.progress(start + len(chunk), len(ids))
+    invalidate_cache()
+
+
 def delete(request, callback=None):
     item = get_item_from_request(request)
     return _handle_delete_request(request, [item], callback)
@@ -134,3 +181,4 @@ def rest_delete(request, callback=None):
     return JSONResponse(True, item)
 
 set_bundle_action_handler("delete", _handle_delete_request)
+register_job_handler("delete", _delete_job)
@@ -1,12 +1,31 @@
+import random
 import logging
+import tempfile
+import functools
+from sqlalchemy.orm import sessionmaker
+from pyramid.response import FileIter
 from ringo.lib.imexport import (
     JSONExporter,
+    JSONLinesExporter,
     CSVExporter,
     XLSXExporter
 )
 from ringo.lib.renderer import (
     ExportDialogRenderer
 )
+from ringo.lib.sql.db import (
+    create_engine,
+    get_replica_urls,
+    use_replica
+)
+from ringo.lib.helpers import get_item_modul, dynamic_import
+from ringo.lib.jobs import (
+    is_enabled,
+    get_threshold,
+    enqueue,
+    register_job_handler
+)
+from ringo.views.jobs import render_job_dialog
 from ringo.views.helpers import get_item_from_request
 from ringo.views.base.list_ import set_bundle_action_handler
 
@@ -18,6 +37,72 @@ def export(request):
     return _handle_export_request(request, [item])
 
 
+def _get_exporter(clazz, ef):
+    if ef == "json":
+        return JSONExporter(clazz)
+    elif ef == "csv":
+        return CSVExporter(clazz)
+    elif ef == "jsonl":
+        return JSONLinesExporter(clazz)
+    elif ef == "xlsx":
+        return XLSXExporter(clazz)
+
+
+class _JobItems(object):
+    """Iterable over the items of an export job. The items are loaded
+    in chunks and the progress is reported to the job. The items can be
+    iterated more than once, which is needed by some exporters."""
+
+    def __init__(self, context, clazz, ids, chunksize):
+        self._context = context
+        self._clazz = clazz
+        self._ids = ids
+        self._chunksize = chunksize
+
+    def __iter__(self):
+        db = self._context.request.db
+        for start in range(0, len(self._ids), self._chunksize):
+            chunk = self._ids[start:start + self._chunksize]
+            for item in db.query(self._clazz)\
+                    .filter(self._clazz.id.in_(chunk)):
+                yield item
+            self._context.progress(start + len(chunk), len(self._ids))
+
+
+def _get_worker_session(settings):
+    # Workers read from one of the replicas if configured. Cache and
+    # blob storage are already set up in the forked worker process.
+    urls = get_replica_urls(settings)
+    url = random.choice(urls) if urls else None
+    return sessionmaker(bind=create_engine(settings, url))()
+
+
+def _export_job(context):
+    """Job handler to export the items with the given ids. Large
+    exports are done in parallel worker processes if configured."""
+    clazz = dynamic_import(context.params["clazzpath"])
+    ef = context.params["format"]
+    ids = context.params["ids"]
+    exporter = _get_exporter(clazz, ef)
+    settings = context.settings
+    processes = int(settings.get("export.processes", 1))
+    chunksize = int(settings.get("export.chunksize", 1000))
+    with context.open_result("export.%s" % ef,
+                             "application/%s" % ef) as outfile:
+        if processes > 1 and len(ids) > chunksize and ef != "xlsx":
+            # The job worker runs outside of the web server so it is
+            # safe to fork the worker processes here.
+            session_factory = functools.partial(_get_worker_session,
+                                                dict(settings))
+            for chunk in exporter.stream_parallel(ids, session_factory,
+                                                  processes, chunksize):
+                outfile.write(chunk)
+            context.progress(len(ids), len(ids))
+        else:
+            items = _JobItems(context, clazz, ids, 500)
+            exporter.dump(items, outfile, chunksize)
+
+
 def _handle_export_request(request, items, callback=None):
     """Helper function to handle the export request. This function
     provides the required logic to show the export configuration dialog
@@ -31,18 +116,35 @@ def _handle_export_request(request, items, callback=None):
        and form.validate(request.params)):
         # Setup exporter
         ef = form.data.get('format')
-        if ef == "json":
-            exporter = JSONExporter(clazz)
-        elif ef == "csv":
-            exporter = CSVExporter(clazz)
-        elif ef == "xlsx":
-            exporter = XLSXExporter(clazz)
-        export = exporter.perform(items)
+        settings = request.registry.settings
+        if is_enabled(settings) and len(items) > get_threshold(settings):
+            # Export large number of items in a background job.
+            job = enqueue(request.db, "export",
+                          {"clazzpath": get_item_modul(request,
+                                                       clazz).clazzpath,
+                           "ids": [i.id for i in items],
+                           "format": ef},
+                          request.user)
+            return render_job_dialog(request, job)
+        exporter = _get_exporter(clazz, ef)
+        # The export is streamed into a temporary file and not held in
+        # memory. The response can not be streamed directly from the
+        # database as the transaction is already finished when the
+        # response is sent.
+        # Worker processes are not forked within the web server. Large
+        # exports are done in parallel only in background jobs.
+        export = tempfile.TemporaryFile()
+        chunksize = int(settings.get("export.chunksize", 1000))
+        with use_replica(request.db):
+            exporter.dump(items, export, chunksize)
+        size = export.tell()
+        export.seek(0)
         # Build response
         resp = request.response
         resp.content_type = str('application/%s' % ef)
         resp.content_disposition = 'attachment; filename=export.%s' % ef
-        resp.body = export
+        resp.app_iter = FileIter(export)
+        resp.content_length = size
         return resp
     else:
         # FIXME: Get the ActionItem here and provide this in the Dialog to get
@@ -52,3 +154,4 @@ def _handle_export_request(request, items, callback=None):
         return rvalue
 
 set_bundle_action_handler("export", _handle_export_request)
+register_job_handler("export", _export_job)
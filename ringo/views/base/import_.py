@@ -1,4 +1,8 @@
+import os
+import shutil
 import logging
+import tempfile
+import transaction
 from pyramid.httpexceptions import HTTPFound
 
 from ringo.lib.imexport import (
@@ -10,6 +14,14 @@ from ringo.lib.renderer import (
     ErrorDialogRenderer
 )
 from ringo.lib.sql.cache import invalidate_cache
+from ringo.lib.helpers import get_item_modul, dynamic_import
+from ringo.lib.jobs import (
+    is_enabled,
+    enqueue,
+    get_job_directory,
+    register_job_handler
+)
+from ringo.views.jobs import render_job_dialog
 from ringo.views.request import (
     handle_event
 )
@@ -19,14 +31,14 @@ log = logging.getLogger(__name__)
 
 def _import(request):
     """Will read the import file from the request and create or update
-    the items in the import file. Finally a list of items will be
-    returned. The returned list is a list of tuples. The first element
-    in the tuple is the item, the second element is a string with the
-    operation (create, update) which was done during import for the
-    item.
+    the items in the import file. Finally an iterator of the items will
+    be returned. The file is read and imported in chunks while iterating.
+    The items are tuples. The first element in the tuple is the item,
+    the second element is a string with the operation (create, update)
+    which was done during import for the item.
 
     :request: Request with importfile and importformat
-    :returns: List of items.
+    :returns: Iterator of items.
 
     """
     clazz = request.context.__model__
@@ -35,16 +47,88 @@ def _import(request):
     except AttributeError:
         # This is triggered when no file has been selected for import
         raise AttributeError
-    importfile = request.POST.get('file').file.read()
+    # The file is read incrementally by the importer.
+    importfile = request.POST.get('file').file
+    settings = request.registry.settings
+    chunksize = int(settings.get("import.chunksize", 1000))
     if request.POST.get('format') == 'json':
-        importer = JSONImporter(clazz, request.db)
+        importer = JSONImporter(clazz, request.db, chunksize=chunksize)
     elif request.POST.get('format') == 'csv':
-        importer = CSVImporter(clazz, request.db)
+        importer = CSVImporter(clazz, request.db, chunksize=chunksize)
+
+    def progress(count):
+        log.debug("Imported %s items of %s" % (count, clazz))
 
     # Decide by which key to identify the items
+    load_key = settings.get("import.importer_load_key", 'uuid')
+    skip_unchanged = settings.get("import.skip_unchanged") == "true"
+    return importer.iter_perform(importfile, request.user,
+                                 request.translate, load_key=load_key,
+                                 progress=progress,
+                                 skip_unchanged=skip_unchanged)
+
+
+def _enqueue_import(request, callback):
+    """Will enqueue a job to import the uploaded file in the background
+    if jobs are enabled and the file is larger than the configured
+    `jobs.import.threshold`. Imports with a callback are always done
+    within the request. The uploaded file is copied into the job
+    directory.
+
+    :request: Current request
+    :callback: Callback function
+    :returns: :class:`.Job` or None
+    """
     settings = request.registry.settings
+    upload = getattr(request.POST.get('file'), 'file', None)
+    if callback or upload is None or not is_enabled(settings):
+        return None
+    upload.seek(0, 2)
+    size = upload.tell()
+    upload.seek(0)
+    if size <= int(settings.get("jobs.import.threshold", 1048576)):
+        return None
+    clazz = request.context.__model__
+    fd, path = tempfile.mkstemp(prefix="import-",
+                                dir=get_job_directory(settings))
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(upload, f)
+    params = {"clazzpath": get_item_modul(request, clazz).clazzpath,
+              "format": request.POST.get('format'),
+              "file": os.path.basename(path)}
+    return enqueue(request.db, "import", params, request.user)
+
+
+def _import_job(context):
+    """Job handler to import the uploaded file of an import job. The
+    imported items are saved in the same way as in the import view.
+    The number of items per operation is set as message of the job."""
+    request = context.request
+    settings = context.settings
+    clazz = dynamic_import(context.params["clazzpath"])
+    chunksize = int(settings.get("import.chunksize", 1000))
+    if context.params["format"] == 'csv':
+        importer = CSVImporter(clazz, request.db, chunksize=chunksize)
+    else:
+        importer = JSONImporter(clazz, request.db, chunksize=chunksize)
     load_key = settings.get("import.importer_load_key", 'uuid')
-    return importer.perform(importfile, request.user, request.translate, load_key=load_key)
+    skip_unchanged = settings.get("import.skip_unchanged") == "true"
+    path = os.path.join(get_job_directory(settings),
+                        context.params["file"])
+    summary = {}
+    with open(path, "rb") as importfile:
+        items = importer.iter_perform(importfile, request.user,
+                                      request.translate, load_key=load_key,
+                                      progress=context.progress,
+                                      skip_unchanged=skip_unchanged)
+        for item, operation, success in _handle_save(request, items, None):
+            if not success:
+                raise Exception(request.translate("Saving %s failed")
+                                % item)
+            summary[operation] = summary.get(operation, 0) + 1
+    invalidate_cache()
+    context.set_message(u", ".join(u"%s: %s" % (operation, num)
+                                   for operation, num in summary.items()))
 
 
 def _handle_save(request, items, callback):
@@ -61,14 +145,20 @@ def _handle_save(request, items, callback):
     if the saving has succeeded.
 
     :request: Current request
-    :items: List of imported items
+    :items: Iterator of imported items
     :callback: Callback function
     :returns: List of imported items
 
     """
     imported_items = []
+    unchanged = request.translate("UNCHANGED")
     for item in items:
         item, operation = item[0], item[1]
+        if operation == unchanged:
+            # Values of the item has not been changed in the import. No
+            # need to save the item.
+            imported_items.append((item, operation, True))
+            continue
         try:
             item.save(item.get_values(), request)
             if callback:
@@ -107,9 +197,16 @@ def import_(request, callback=None):
     if (request.method == 'POST'
        and request.ringo.params.confirmed
        and form.validate(request.params)):
+        job = _enqueue_import(request, callback)
+        if job:
+            return render_job_dialog(request, job)
         try:
             items = _import(request)
+            imported_items = _handle_save(request, items, callback)
         except (ValueError, AttributeError) as e:
+            # The file is imported while it is read. Items of the file
+            # before the error may already be saved.
+            transaction.doom()
             err_title = _("Import failed")
             err_msg = _("Bad news! The import could not be finished and "
                         "returns with an error."
@@ -123,8 +220,6 @@ def import_(request, callback=None):
             rvalue['dialog'] = renderer.render(ok_url)
             rvalue['clazz'] = clazz
             return rvalue
-
-        imported_items = _handle_save(request, items, callback)
         invalidate_cache()
         redirect = _handle_redirect(request)
         if redirect:
@@ -133,3 +228,5 @@ def import_(request, callback=None):
     rvalue['dialog'] = renderer.render(imported_items)
     rvalue['clazz'] = clazz
     return rvalue
+
+register_job_handler("import", _import_job)
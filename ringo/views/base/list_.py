@@ -1,13 +1,21 @@
 import uuid
 import logging
-from sqlalchemy import or_
-from ringo.model.base import BaseFactory, get_item_list
+from sqlalchemy import or_, and_
+from ringo.model.base import BaseItem, BaseFactory, get_item_list
 from ringo.model.user import User
+from ringo.model.statemachine import has_unshared_statemachines
 from ringo.lib.alchemy import is_relation
 from ringo.lib.table import get_table_config
 from ringo.lib.helpers.misc import get_item_modul
 from ringo.lib.helpers import literal
 from ringo.lib.security import has_permission
+from ringo.lib.sql.db import reads_from_replica
+from ringo.lib.sql.blob import (
+    is_blob_field,
+    get_blob_field_expression,
+    get_blob_search_expression,
+    has_blob_container_values
+)
 from ringo.lib.renderer import (
     ListRenderer,
     DTListRenderer
@@ -210,10 +218,59 @@ def get_search(clazz, request):
     return saved_search
 
 
+def _get_state_condition(clazz, role_actions):
+    """Returns a SQL condition which is true for all items which are
+    in a state which does not disable the action for at least one of
+    the given pairs of role and action. Returns None if no state
+    disables the actions. Like in :func:`.get_permissions` the states
+    disable actions by the name of the action, not by its permission.
+
+    :clazz: Class of the items
+    :role_actions: List of tuples of a role and the name of an action
+    :returns: SQL expression or None
+    """
+    conditions = []
+    restricted = False
+    for role, action in role_actions:
+        role_conditions = []
+        for key, statemachine in getattr(clazz, "_statemachines",
+                                         {}).iteritems():
+            states = statemachine.get_disabling_states(action, role.name)
+            if not states:
+                continue
+            column = getattr(clazz, key)
+            condition = ~column.in_(states)
+            root = statemachine.get_definition()[0]
+            if root is not None and root._id not in states:
+                # Items without a state are in the root state.
+                condition = or_(column.is_(None), condition)
+            role_conditions.append(condition)
+        if not role_conditions:
+            # The action is not disabled in any state for this role.
+            return None
+        restricted = True
+        conditions.append(and_(*role_conditions))
+    if not restricted:
+        return None
+    return or_(*conditions)
+
+
+def _query_add_state_filter(query, clazz, roles, action="read"):
+    """Will add a filter to the query which excludes all items which
+    are in a state which disables the given action for all of the given
+    roles."""
+    condition = _get_state_condition(clazz,
+                                     [(role, action) for role in roles])
+    if condition is not None:
+        query = query.filter(condition)
+    return query
+
+
 def _query_add_permission_filter(query, request, clazz):
     modul = get_item_modul(request, clazz)
     is_admin = False
     is_allowed = True
+    read_roles = []
     for role in request.user.roles:
         if role.name == "admin":
             is_admin = True
@@ -226,6 +283,7 @@ def _query_add_permission_filter(query, request, clazz):
                 break
             else:
                 is_allowed = True
+                read_roles.append(role)
     if is_admin:
         # User is allowd to read all items
         return query
@@ -233,12 +291,101 @@ def _query_add_permission_filter(query, request, clazz):
         # User is not allowd to read items based on the uid and groups
         usergroups = [g.id for g in request.user.groups]
         query = query.filter(or_(clazz.uid == request.user.id, clazz.gid.in_(usergroups)))
+        # Exclude items in states which disable reading for all roles
+        # of the user.
+        if read_roles:
+            query = _query_add_state_filter(query, clazz, read_roles)
         return query
     else:
         # User is not allowd to read anything
         return None
 
 
+def _query_add_action_filter(query, request, clazz, action):
+    """Will add a filter to the query which restricts the result to the
+    items on which the current user has the permission for the given
+    action. The filter is built from the same rules as the ACL of the
+    items in :func:`ringo.lib.security.get_permissions`, so the result
+    is the same as calling :func:`ringo.lib.security.has_permission`
+    for every single item. Returns None if the user is not allowed to
+    call the action on any item."""
+    user = request.user
+    if user.has_role("admin"):
+        return query
+    modul = get_item_modul(request, clazz)
+    user_roles = set(role.name for role in user.roles)
+    admin_roles = []
+    owner_roles = []
+    for modul_action in modul.actions:
+        if modul_action.get_permission() != action:
+            continue
+        # The states disable the actions by their name.
+        action_name = modul_action.name.lower()
+        for role in modul_action.roles:
+            if role.name not in user_roles:
+                continue
+            elif role.admin or modul_action.admin:
+                admin_roles.append((role, action_name))
+            elif action in ["create", "list"]:
+                # Modul level permissions. No checks on the items.
+                return query
+            else:
+                owner_roles.append((role, action_name))
+
+    conditions = []
+    if admin_roles:
+        condition = _get_state_condition(clazz, admin_roles)
+        if condition is None:
+            return query
+        conditions.append(condition)
+    if owner_roles:
+        usergroups = [g.id for g in user.groups]
+        condition = or_(clazz.uid == user.id, clazz.gid.in_(usergroups))
+        state_condition = _get_state_condition(clazz, owner_roles)
+        if state_condition is not None:
+            condition = and_(condition, state_condition)
+        conditions.append(condition)
+    if not conditions:
+        return None
+    return query.filter(or_(*conditions))
+
+
+def _query_add_search_filter(query, request, clazz, search, table):
+    """Will add the filters of the given search stack to the query.
+    Currently only searches in fields of blobform items are translated
+    into SQL. Returns None if the search can not be done in SQL. In
+    this case the search must be done in the application using the
+    :func:`.BaseList.filter` method. Like in this method only the
+    searchable columns of the table are searched."""
+    table_config = get_table_config(clazz, table)
+    table_columns = {}
+    for col in [col for col in table_config.get_columns()
+                if col.get("searchable", True)]:
+        table_columns[col.get('name')] = col
+    dialect_name = request.db.bind.dialect.name
+    for expression, search_field, regexpr in search:
+        # Searches over all fields, on expanded values or values which
+        # are rendered by a custom renderer can not be done in SQL.
+        col = table_columns.get(search_field)
+        if (col is None
+           or col.get('expand')
+           or table_config.get_renderer(col)
+           or not is_blob_field(clazz, search_field)):
+            return None
+        # Lists and objects are joined in the application and can not
+        # be compared in the same way in SQL.
+        if has_blob_container_values(request.db, clazz, search_field,
+                                     dialect_name):
+            return None
+        expr = get_blob_search_expression(clazz, search_field, expression,
+                                          regexpr, dialect_name)
+        if expr is None:
+            return None
+        query = query.filter(expr)
+    return query
+
+
+@reads_from_replica
 def load_items(request, clazz, list_params):
     """
     Return a list of items which can be used as input for the
@@ -259,12 +406,6 @@ def load_items(request, clazz, list_params):
     :returns: List of class:BaseItem objects.
     """
 
-    if list_params["search"]:
-        # Search is currently not supported in optimized loading. So
-        # return None and do the work on application side using the
-        # Baselist methods.
-        return None, 0
-
     #################################
     #  Filter query on permissions  #
     #################################
@@ -273,19 +414,42 @@ def load_items(request, clazz, list_params):
     if query is None:
         return [], 0
 
+    ###############
+    #  Searching  #
+    ###############
+    if list_params["search"]:
+        # Search is currently only supported for fields of blobform
+        # items in optimized loading. For all other searches return
+        # None and do the work on application side using the Baselist
+        # methods.
+        query = _query_add_search_filter(query, request, clazz,
+                                         list_params["search"],
+                                         list_params.get("table"))
+        if query is None:
+            return None, 0
+
     ############################
     #  Sorting and paginating  #
     ############################
     if list_params["sorting"]:
+        sort_field = list_params["sorting"][0]
         try:
-            sort_column = getattr(clazz, list_params["sorting"][0])
+            sort_column = getattr(clazz, sort_field)
         except AttributeError:
-            return None, 0
+            # Fields of blobform items are sorted on the value in the
+            # JSON data.
+            sort_column = None
+            if is_blob_field(clazz, sort_field):
+                dialect_name = request.db.bind.dialect.name
+                sort_column = get_blob_field_expression(clazz, sort_field,
+                                                        dialect_name)
+            if sort_column is None:
+                return None, 0
 
         # Sorting is only supported on a few attributes.
         if isinstance(sort_column, property):
             return None, 0
-        if is_relation(clazz, list_params["sorting"][0]):
+        if is_relation(clazz, sort_field):
             return None, 0
 
         sort_order = list_params["sorting"][1]
@@ -308,6 +472,43 @@ def load_items(request, clazz, list_params):
     return items, total
 
 
+def load_bundle_items(request, clazz, ids, action, chunksize=500):
+    """Returns the items with the given ids on which the current user
+    is allowed to call the given action. The items are loaded with a
+    few queries (one per `chunksize` ids) and the permissions are
+    checked within the query. Items of classes with a custom
+    implementation of the permission checks (overwritten
+    `_get_permissions` method), with statemachines which are not shared
+    or which are not owned by a user are checked one by one after
+    loading.
+
+    :request: Current request
+    :clazz: Class of the items
+    :ids: List of ids of the items
+    :action: Name of the action (lowercase)
+    :chunksize: Maximum number of ids in a single query
+    :returns: List of items in the order of the given ids
+    """
+    ids = [int(id) for id in ids]
+    check_items = (clazz._get_permissions.__func__
+                   is not BaseItem._get_permissions.__func__
+                   or has_unshared_statemachines(clazz)
+                   or not hasattr(clazz, "uid"))
+    loaded = {}
+    for start in range(0, len(ids), chunksize):
+        query = request.db.query(clazz)
+        query = query.filter(clazz.id.in_(ids[start:start + chunksize]))
+        if not check_items:
+            query = _query_add_action_filter(query, request, clazz, action)
+            if query is None:
+                return []
+        for item in query:
+            if check_items and not has_permission(action, item, request):
+                continue
+            loaded[item.id] = item
+    return [loaded[id] for id in ids if id in loaded]
+
+
 def bundle_(request):
     clazz = request.context.__model__
     module = get_item_modul(request, clazz)
@@ -344,18 +545,8 @@ def bundle_(request):
     if not isinstance(ids, list):
         ids = [ids]
 
-    factory = clazz.get_item_factory()
-    items = []
-    ignored_items = []
-    for id in ids:
-        # Check if the user is allowed to call the requested action on
-        # the loaded item. If so append it the the bundle, if not ignore
-        # it.
-        item = factory.load(id)
-        if has_permission(bundle_action.lower(), item, request):
-            items.append(item)
-        else:
-            ignored_items.append(item)
+    items = load_bundle_items(request, clazz, ids, bundle_action.lower())
+    ignored_items = len(ids) - len(items)
 
     # After checking the permissions the list of items might be empty.
     # If so show a warning to the user to inform him that the selected
@@ -367,7 +558,7 @@ def bundle_(request):
                  "for which an '${action}' can be performed. "
                  "(${num} items were filtered out.)",
                  mapping={"action": bundle_action,
-                          "num": len(ignored_items)})
+                          "num": ignored_items})
         renderer = WarningDialogRenderer(request, title, body)
         rvalue = {}
         rvalue['dialog'] = literal(renderer.render(url=request.referrer))
@@ -423,6 +614,7 @@ def get_base_list(clazz, request, user, table):
     list_params["search"] = search
     list_params["sorting"] = sorting
     list_params["pagination"] = (pagination_page, pagination_size)
+    list_params["table"] = table
 
     # Try to do an optimized loading of items. If the loading succeeds
     # the loaded items will be used to build an item list. If for some
@@ -436,6 +628,9 @@ def get_base_list(clazz, request, user, table):
         if items is None:
             listing.sort(sorting[0], sorting[1])
             listing.filter(search, request, table)
+        else:
+            # Search has already been done in the DB.
+            listing.search_filter = search
     else:
         listing = get_item_list(request, clazz, user=user)
         listing.sort(sorting[0], sorting[1])
@@ -493,6 +688,7 @@ def list_(request):
     return rvalue
 
 
+@reads_from_replica
 def rest_list(request):
     """Returns a JSON objcet with all item of a clazz. The list does not
     have any capabilities for sorting or filtering
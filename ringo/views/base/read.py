@@ -1,4 +1,5 @@
 import logging
+from ringo.lib.sql.db import reads_from_replica
 from ringo.views.helpers import (
     get_item_form,
     render_item_form
@@ -14,6 +15,7 @@ from ringo.views.request import (
 log = logging.getLogger(__name__)
 
 
+@reads_from_replica
 def read(request, callback=None, renderers=None):
     """Base method to handle read requests. Returns a dictionary of
     values used available in the rendererd template The template to
@@ -33,6 +35,7 @@ def read(request, callback=None, renderers=None):
     return rvalues
 
 
+@reads_from_replica
 def rest_read(request, callback=None):
     """Base method to handle read requests on the REST interface.
     Returns a JSON object of a specific item.
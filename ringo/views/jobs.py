@@ -0,0 +1,68 @@
+"""Views to poll the status of background jobs and to download their
+results. See :mod:`ringo.lib.jobs` for more details."""
+import os
+import logging
+from pyramid.view import view_config
+from pyramid.response import FileResponse
+from pyramid.httpexceptions import HTTPNotFound
+
+from ringo.lib.helpers import literal
+from ringo.lib.jobs import get_job, get_job_directory
+from ringo.lib.renderer import InfoDialogRenderer
+from ringo.model.job import FINISHED
+from ringo.views.response import JSONResponse
+
+log = logging.getLogger(__name__)
+
+
+def render_job_dialog(request, job):
+    """Returns the values for a dialog informing the user that the
+    action is done in the background by the given job. Used by views
+    which enqueue a job instead of doing the work in the request."""
+    _ = request.translate
+    mapping = {"status_url": request.route_path("jobs-status", id=job.id),
+               "download_url": request.route_path("jobs-download",
+                                                  id=job.id)}
+    title = _("Job started")
+    body = _("The action has been started in the background. "
+             "You can check the <a href=\"${status_url}\">status</a> "
+             "of the job and <a href=\"${download_url}\">download</a> "
+             "the result (if any) when the job is finished.",
+             mapping=mapping)
+    renderer = InfoDialogRenderer(request, title, literal(body))
+    rvalue = {}
+    rvalue['dialog'] = literal(renderer.render(url=request.referrer))
+    return rvalue
+
+
+@view_config(route_name='jobs-status',
+             renderer='json',
+             request_method="GET")
+def status(request):
+    """Returns the status and progress of the job as JSONResponse."""
+    job = get_job(request, request.matchdict.get('id'))
+    if job is None:
+        raise HTTPNotFound()
+    return JSONResponse(True, job.get_status())
+
+
+@view_config(route_name='jobs-download',
+             renderer='json',
+             request_method="GET")
+def download(request):
+    """Returns the result file of a finished job. If the job is not
+    finished yet its status is returned as JSONResponse."""
+    job = get_job(request, request.matchdict.get('id'))
+    if job is None:
+        raise HTTPNotFound()
+    if job.status != FINISHED or not job.result:
+        return JSONResponse(False, job.get_status())
+    path = os.path.join(get_job_directory(request.registry.settings),
+                        job.result)
+    if not os.path.exists(path):
+        raise HTTPNotFound()
+    response = FileResponse(path, request,
+                            content_type=str(job.result_type))
+    response.content_disposition = ('attachment; filename=%s'
+                                    % job.result_name)
+    return response
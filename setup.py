@@ -69,6 +69,9 @@ setup(name='ringo',
       [babel.extractors]
       tableconfig = ringo.lib.i18n:extract_i18n_tableconfig
       formconfig = formbar.i18n:extract_i18n_formconfig
+      [beaker.backends]
+      ringo_sql = ringo.lib.sessionstore:SQLNamespaceManager
+      ringo_memory = ringo.lib.sessionstore:MemoryNamespaceManager
       [pyramid.scaffold]
       ringo=ringo.scaffolds:BasicRingoTemplate
       ringo_extension=ringo.scaffolds:RingoExtensionTemplate
@@ -27,3 +27,34 @@ def docs(doctype="html", zip=False, show=False):
 def test():
     run("ringo-admin db init --config=test.ini")
     run("python setup.py test")
+
+
+@task
+def bench_lists(config="test.ini", rows="10k", report=None):
+    """Will run the benchmark of the overview pipeline"""
+    cmd = "python -m ringo.benchmarks.lists --config=%s --rows=%s" % (config,
+                                                                     rows)
+    if report:
+        cmd += " --report=%s" % report
+    run(cmd)
+
+
+@task
+def bench_security(config="test.ini", roles=20, groups=50, report=None):
+    """Will run the benchmark of the permission checks"""
+    cmd = ("python -m ringo.benchmarks.security --config=%s --roles=%s "
+           "--groups=%s" % (config, roles, groups))
+    if report:
+        cmd += " --report=%s" % report
+    run(cmd)
+
+
+@task
+def bench_imexport(config="test.ini", modul="profiles", rows="1k,10k",
+                   report=None):
+    """Will run the benchmark of the import and export"""
+    cmd = ("python -m ringo.benchmarks.imexport --config=%s --modul=%s "
+           "--rows=%s" % (config, modul, rows))
+    if report:
+        cmd += " --report=%s" % report
+    run(cmd)